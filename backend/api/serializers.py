@@ -1,4 +1,5 @@
 import orjson
+from celery import states
 from django.contrib.auth.models import Group
 from django_celery_beat.models import CrontabSchedule
 from django_celery_results.models import TaskResult
@@ -40,6 +41,8 @@ from app.models.workflows import (
     TaskArtifact,
     WorkflowType,
 )
+from app.utils.task_logs import TaskLog
+from app.workflows.orchestration import get_command_waves
 from vinyl.lib.dbt_methods import DBTVersion
 
 Invitation = get_invitation_model()
@@ -394,7 +397,6 @@ class PowerBIDetailsSerializer(ResourceDetailsSerializer):
 
 
 class ClickHouseDetailsSerializer(ResourceDetailsSerializer):
-
     class Meta:
         model = ClickhouseDetails
         fields = [
@@ -617,6 +619,11 @@ class DBTOrchestratorSerializer(CrontabWorkflowSerializer):
         queryset=DBTCoreDetails.objects.all(), source="dbtresource"
     )
     commands = serializers.ListField(child=serializers.CharField())
+    dependencies = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField(min_value=0)),
+        allow_null=True,
+        required=False,
+    )
     hmac_secret_key = serializers.CharField(required=False)
     workflow_type = serializers.ChoiceField(
         choices=WorkflowType.choices, default=WorkflowType.CRON
@@ -636,6 +643,7 @@ class DBTOrchestratorSerializer(CrontabWorkflowSerializer):
             "workflow_type",
             "save_artifacts",
             "commands",
+            "dependencies",
             "hmac_secret_key",
             "name",
             "latest_run",
@@ -647,6 +655,24 @@ class DBTOrchestratorSerializer(CrontabWorkflowSerializer):
             raise serializers.ValidationError("All commands must start with 'dbt'")
         return value
 
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        # partial updates are checked against the saved commands and dependencies
+        dependencies = attrs.get(
+            "dependencies", getattr(self.instance, "dependencies", None)
+        )
+        if dependencies is not None:
+            commands = attrs.get("commands", getattr(self.instance, "commands", []))
+            if len(dependencies) != len(commands):
+                raise serializers.ValidationError(
+                    {"dependencies": "Must have one entry per command"}
+                )
+            try:
+                get_command_waves(dependencies)
+            except ValueError as e:
+                raise serializers.ValidationError({"dependencies": str(e)})
+        return attrs
+
     def create(self, validated_data):
         if "cron_str" in validated_data:
             cron_str = validated_data.pop("cron_str")
@@ -702,7 +728,15 @@ class TaskResultSerializer(serializers.ModelSerializer):
         return self._parse_json(instance.meta)
 
     def get_result(self, obj):
-        return self._parse_json(obj.result)
+        result = self._parse_json(obj.result)
+        if (
+            obj.status == states.STARTED
+            and isinstance(result, dict)
+            and "log_offset" in result
+        ):
+            # streamed output so far is read back from the task log
+            result["stdout"] = TaskLog(obj.task_id).read_all()
+        return result
 
     def get_task_args(self, obj):
         return self._parse_json(obj.task_args)
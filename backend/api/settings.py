@@ -337,6 +337,10 @@ CACHES = {
     }
 }
 
+## streamed task logs are kept in redis streams alongside the cache
+TASK_LOG_REDIS_URL = redis_url + CACHE_REDIS_CHANNEL
+TASK_LOG_TTL = int(os.getenv("TASK_LOG_TTL", 7 * 24 * 60 * 60))
+
 ## Celery settings
 CELERY_BROKER_URL = redis_url + CELERY_REDIS_CHANNEL
 # CELERY_CACHE_BACKEND = "django-cache"
@@ -45,6 +45,7 @@ from app.views.query_views import (
     DbtQueryValidateView,
     QueryFormatView,
     QueryPreviewView,
+    QueryResultPageView,
     QueryValidateView,
 )
 from app.views.settings_view import SettingsView
@@ -85,6 +86,11 @@ urlpatterns = [
         name="query_preview",
     ),
     path("query/format/", QueryFormatView.as_view(), name="query_format"),
+    path(
+        "query/<str:query_id>/pages/<int:page>/",
+        QueryResultPageView.as_view(),
+        name="query_result_page",
+    ),
     path(
         "validate/sql/",
         QueryValidateView.as_view(),
@@ -1,8 +1,11 @@
 import json
 import logging
 
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from app.utils.task_logs import START_OFFSET, TaskLog, parse_offset
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,6 +15,8 @@ class TaskResultConsumer(AsyncWebsocketConsumer):
         self.group_name = f"workspace_{self.workspace_id}"
         logger.info(f"Connecting to WebSocket for workspace: {self.workspace_id}")
         await self.channel_layer.group_add(self.group_name, self.channel_name)
+        # last log offset sent per task, so replayed chunks aren't sent twice
+        self.log_offsets = {}
 
         await self.accept()
 
@@ -21,6 +26,64 @@ class TaskResultConsumer(AsyncWebsocketConsumer):
         )
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            data = json.loads(text_data or "")
+        except json.JSONDecodeError:
+            logger.warning(
+                f"Ignoring malformed message for workspace: {self.workspace_id}"
+            )
+            return
+        if not isinstance(data, dict) or data.get("action") != "resume_log":
+            return
+        task_id = data.get("task_id")
+        offset = data.get("offset") or START_OFFSET
+        try:
+            if not isinstance(task_id, str) or not isinstance(offset, str):
+                raise ValueError
+            parse_offset(offset)
+        except ValueError:
+            logger.warning(
+                f"Ignoring malformed resume_log for workspace: {self.workspace_id}"
+            )
+            return
+        await self.resume_log(task_id, offset)
+
+    async def resume_log(self, task_id: str, offset: str):
+        logger.info(f"Resuming log for task: {task_id} from offset: {offset}")
+        task_log = TaskLog(task_id)
+        workspace_id = await sync_to_async(task_log.get_workspace_id)()
+        if workspace_id != str(self.workspace_id):
+            logger.warning(
+                f"Refusing to resume log for task: {task_id} outside workspace: {self.workspace_id}"
+            )
+            return
+        self.log_offsets[task_id] = offset
+        entries = await sync_to_async(task_log.read)(after=offset)
+        for entry_offset, data in entries:
+            await self.send_log_chunk(task_id, entry_offset, data)
+
+    async def send_log_chunk(self, task_id: str, offset: str, data: str):
+        last_offset = self.log_offsets.get(task_id)
+        if last_offset is not None and parse_offset(offset) <= parse_offset(
+            last_offset
+        ):
+            return
+        self.log_offsets[task_id] = offset
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "status": "TASK_LOG",
+                    "task_id": task_id,
+                    "offset": offset,
+                    "data": data,
+                }
+            )
+        )
+
+    async def task_log(self, event):
+        await self.send_log_chunk(event["task_id"], event["offset"], event["data"])
+
     async def workflow_status_update(self, event):
         logger.info(
             f"Sending status update for workflow: {event['task_id']} with status: {event['status']}"
@@ -34,3 +97,17 @@ class TaskResultConsumer(AsyncWebsocketConsumer):
                 }
             )
         )
+
+    async def query_page_ready(self, event):
+        logger.info(f"Sending first page of query: {event['query_id']}")
+        await self.send(
+            text_data=json.dumps(
+                {
+                    "status": "QUERY_PAGE_READY",
+                    "task_id": event["task_id"],
+                    "query_id": event["query_id"],
+                    "signed_url": event["signed_url"],
+                    "num_rows": event["num_rows"],
+                }
+            )
+        )
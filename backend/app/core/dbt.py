@@ -1,3 +1,5 @@
+import os
+
 import networkx as nx
 
 from app.core.e2e import DataHubDBParser
@@ -5,6 +7,8 @@ from app.models import Asset, AssetError, Column, ColumnLink, Resource
 from app.services.lineage_service import Lineage
 from vinyl.lib.dbt import DBTProject, DBTTransition
 
+DBT_CATALOG_INCREMENTAL = os.getenv("DBT_CATALOG_INCREMENTAL", "true") == "true"
+
 
 class LiveDBTParser:
     resource: Resource
@@ -30,35 +34,17 @@ class LiveDBTParser:
 
     @classmethod
     def get_manifest_node(cls, proj: DBTProject, node_id: str, defer: bool = False):
-        proj.mount_manifest(defer=defer)
-        if node_id in proj.manifest["nodes"]:
-            manifest_node = proj.manifest["nodes"][node_id]
-        elif node_id in proj.manifest["sources"]:
-            manifest_node = proj.manifest["sources"][node_id]
-        else:
-            manifest_node = None
-        return manifest_node
+        return proj.get_manifest_node(node_id, defer=defer)
 
     @classmethod
     def get_catalog_node(cls, proj: DBTProject, node_id: str, defer: bool = False):
-        proj.mount_catalog(defer=defer)
-        if node_id in proj.catalog["nodes"]:
-            catalog_node = proj.catalog["nodes"][node_id]
-        elif node_id in proj.catalog["sources"]:
-            catalog_node = proj.catalog["sources"][node_id]
-        else:
-            catalog_node = None
-        return catalog_node
+        return proj.get_catalog_node(node_id, defer=defer)
 
     @classmethod
     def get_node_id_from_filepath(
         cls, proj: DBTProject, filepath: str, defer: bool = False
     ):
-        proj.mount_manifest(defer=defer)
-        for node_id, node in proj.manifest["nodes"].items():
-            if node["original_file_path"] == filepath:
-                return node_id
-        return None
+        return proj.get_node_id_from_filepath(filepath, defer=defer)
 
     @classmethod
     def parse_project(
@@ -110,6 +96,9 @@ class LiveDBTParser:
                     partial=True,
                     partial_nodes=[n.split(".")[-1] for n in out.catalog_nodes],
                     force_run=True,
+                    incremental_nodes=out.catalog_nodes
+                    if DBT_CATALOG_INCREMENTAL
+                    else None,
                 )
             else:
                 combined_proj_object.mount_catalog(defer=defer)
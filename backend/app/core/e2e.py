@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-import copy
+import hashlib
 import os
 import re
 import traceback
@@ -19,7 +19,9 @@ from datahub.metadata.urns import ChartUrn, DashboardUrn, DatasetUrn, SchemaFiel
 from datahub.utilities import urn_encoder
 from datahub.utilities.urns.error import InvalidUrnError
 from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet
 from django.forms.models import model_to_dict
+from mpire import WorkerPool
 from sqlglot import Expression, exp
 from sqlglot.errors import ParseError
 
@@ -35,13 +37,17 @@ from app.models import (
     ResourceSubtype,
     ResourceType,
 )
+from app.services.lineage_service import LineageService
 from app.utils.database import pg_delete_and_upsert
+from app.utils.urn import UrnAdjuster
 from vinyl.lib.errors import VinylError, VinylErrorType
 from vinyl.lib.schema import VinylSchema
 from vinyl.lib.sqlast import DIALECTS_ALLOWING_IMPLICIT_CATALOG, SQLAstNode
+from vinyl.lib.utils.cache import get_sqlast_cache
 from vinyl.lib.utils.graph import nx_remove_node_and_reconnect
 
 _STR_JOIN_HELPER = "_____"
+INDIRECT_CLEANUP_BATCH_SIZE = int(os.getenv("INDIRECT_CLEANUP_BATCH_SIZE", 5000))
 
 # Allow columns with parentheses in their names, normally reserved by DataHub because of their frontend.
 urn_encoder.RESERVED_CHARS = {}
@@ -153,6 +159,9 @@ def adjust_casing_schema_field(id: str, dialect: str):
 
 
 class DataHubDBParserBase:
+    # aspects read from `row_dict`. Only these are decoded from the datahub db.
+    aspects: tuple[str, ...] = ()
+
     def __init__(
         self,
         resource_id: str,
@@ -210,6 +219,8 @@ class DataHubDBParserBase:
 
 
 class ContainerParser(DataHubDBParserBase):
+    aspects = ("containerProperties", "subTypes")
+
     def parse(self):
         # get core info
         for k, v in self.row_dict.items():
@@ -244,6 +255,8 @@ class ContainerParser(DataHubDBParserBase):
 
 
 class ContainerMembershipParser(DataHubDBParserBase):
+    aspects = ("container",)
+
     def parse(self):
         # get parent graph
         container_graph = nx.DiGraph()
@@ -266,6 +279,8 @@ class ContainerMembershipParser(DataHubDBParserBase):
 
 # order of these parsers is important, do not reorder.
 class OwnershipParser(DataHubDBParserBase):
+    aspects = ("ownership",)
+
     def parse(self):
         for k, v in self.row_dict.items():
             if "ownership" in v and k in self.asset_dict:
@@ -280,6 +295,8 @@ class OwnershipParser(DataHubDBParserBase):
 
 
 class ViewsParser(DataHubDBParserBase):
+    aspects = ("chartUsageStatistics", "dashboardUsageStatistics")
+
     def parse(self):
         for k, v in self.row_dict.items():
             if "chartUsageStatistics" in v and k in self.asset_dict:
@@ -293,6 +310,8 @@ class ViewsParser(DataHubDBParserBase):
 
 
 class ChartInfoParser(DataHubDBParserBase):
+    aspects = ("chartInfo",)
+
     def parse(self):
         for k, v in self.row_dict.items():
             if "chartInfo" in v and k in self.asset_dict:
@@ -316,6 +335,8 @@ class ChartInfoParser(DataHubDBParserBase):
 
 
 class DashboardInfoParser(DataHubDBParserBase):
+    aspects = ("dashboardInfo",)
+
     def parse(self):
         for k, v in self.row_dict.items():
             if "dashboardInfo" in v and k in self.asset_dict:
@@ -339,6 +360,8 @@ class DashboardInfoParser(DataHubDBParserBase):
 
 
 class DatasetInfoParser(DataHubDBParserBase):
+    aspects = ("datasetProperties", "viewProperties")
+
     def parse(self):
         for k, v in self.asset_dict.items():
             if "urn:li:dataset:" in k:
@@ -495,6 +518,8 @@ class DatasetInfoParser(DataHubDBParserBase):
 
 
 class SchemaParser(DataHubDBParserBase):
+    aspects = ("schemaMetadata",)
+
     def parse(self):
         for k, v in self.asset_dict.items():
             if "urn:li:dataset:" in k:
@@ -567,6 +592,8 @@ class SchemaParser(DataHubDBParserBase):
 
 
 class LineageParser(DataHubDBParserBase):
+    aspects = ("upstreamLineage",)
+
     def parse(self):
         for k, v in self.row_dict.items():
             if "upstreamLineage" in v:
@@ -654,6 +681,8 @@ class LineageParser(DataHubDBParserBase):
 
 class AssertionParser(DataHubDBParserBase):
     # NOTE:dbt specific logic -- will need to be updated if we expand to other assertion types
+    aspects = ("assertionInfo",)
+
     def parse(self):
         for k, v in self.row_dict.items():
             if "assertionInfo" in v:
@@ -695,8 +724,27 @@ class AssertionParser(DataHubDBParserBase):
             self.asset_dict[adj_dataset].tests.append(test_name)
 
 
+def _init_cll_worker(parser: DataHubDBParser):
+    # the sqlast cache's sqlite connection can't be shared across a fork, so each worker opens its own
+    get_sqlast_cache.cache_clear()
+
+
+def _get_asset_cll_worker(parser: DataHubDBParser, k: str) -> dict[str, Any]:
+    return parser.get_asset_cll(k, parser.asset_dict[k])
+
+
 class DataHubDBParser:
-    query: str = "select * from metadata_aspect_v2 where version = 1"
+    query: str = """
+select
+    urn,
+    aspect_name,
+    case when list_contains($aspects, aspect_name) then metadata end as metadata
+from metadata_aspect_v2
+where version = 1
+    and urn not like '%urn:li:tag%'
+    and urn not like '%urn:li:assertion%'
+"""
+    batch_size: int = int(os.getenv("DATAHUB_READ_BATCH_SIZE", 10000))
     input_dict: dict[str, Any]
     asset_dict: dict[str, Asset]
     container_dict: dict[str, AssetContainer]
@@ -712,8 +760,11 @@ class DataHubDBParser:
         self,
         resource: Resource,
         path: str | None = os.path.expanduser("~/.datahub/lite/datahub.duckdb"),
+        n_jobs: int | None = None,
     ):
         self.path = path
+        # number of worker processes used for column lineage. 1 runs serially.
+        self.n_jobs = n_jobs if n_jobs is not None else int(os.getenv("CLL_N_JOBS", 1))
         self.resource_id = resource.id
         self.workspace_id = resource.workspace.id
         self.dialect = resource.details.subtype
@@ -731,22 +782,41 @@ class DataHubDBParser:
         self.asset_errors = []
         self.column_links = []
         self.id_adjustments = {}
+        self.fingerprints = {}
+
+    @classmethod
+    def get_consumed_aspects(cls) -> list[str]:
+        return sorted(
+            {
+                a
+                for parser in DataHubDBParserBase.__subclasses__()
+                for a in parser.aspects
+            }
+        )
 
     def get_data(self):
+        """
+        Streams `(urn, aspect_name, metadata)` rows from the datahub db in arrow batches. Tag and assertion urns are filtered out in the query, and metadata is only returned for aspects the parsers consume.
+        """
         if self.path is None:
             raise ValueError("Path not set")
 
-        return duckdb.connect(self.path, read_only=True).execute(self.query).fetchall()
+        with duckdb.connect(self.path, read_only=True) as con:
+            reader = con.execute(
+                self.query, {"aspects": self.get_consumed_aspects()}
+            ).fetch_record_batch(self.batch_size)
+            for batch in reader:
+                yield from zip(*(col.to_pylist() for col in batch.columns))
 
     def get_row_dict(self):
         base_asset_dict = {}
-        for row in self.get_data():
-            id = adjust_casing_dataset(row[0], self.dialect)
+        for urn, aspect_name, metadata in self.get_data():
+            id = adjust_casing_dataset(urn, self.dialect)
             if self.exclude_node(id, full_exclusion=False):
                 continue
-            self.input_dict.setdefault(id, {}).setdefault(row[1], []).append(
-                orjson.loads(row[3])
-            )
+            aspects = self.input_dict.setdefault(id, {})
+            if metadata is not None:
+                aspects.setdefault(aspect_name, []).append(orjson.loads(metadata))
             if self.exclude_node(id):
                 continue
             base_asset_dict.setdefault(
@@ -977,100 +1047,226 @@ class DataHubDBParser:
                     )
         node.optimize()
 
-        nodes = []
-        for ltype in lineage_types:
-            node_it = copy.deepcopy(node)
-            node_it.get_lineage(lineage_filters=ltype.connection_types())
-            nodes.append(node_it)
-
-        return nodes
+        # walk the ast once and filter the edges for each lineage type
+        return node.get_lineages([ltype.connection_types() for ltype in lineage_types])
 
-    def get_db_cll(self, ignore_ids: list[str] = []):
-        self.get_asset_column_dict()
-        asset_dict_items = self.asset_dict.items()
-        graphs = []
-        for j, (k, asset) in enumerate(asset_dict_items):
-            if not asset.sql or k in ignore_ids:
-                continue
+    def get_asset_cll(self, k: str, asset: Asset) -> dict[str, Any]:
+        """
+        Computes the column lineage for a single asset. Output only contains picklable values so it can be computed in a worker process and merged in the parent.
+        """
+        ltypes = [ltype for ltype in ColumnLink.LineageType]
+        nodes = self.get_ast_nodes(k, asset, ltypes)
+        graph_it = nx.MultiDiGraph()
+        errors = []
+        uncaught_errors = []
+        for i, node in enumerate(nodes):
+            if node.errors:
+                for error in node.errors:
+                    error_dict = error.to_dict()
+                    if error_dict not in errors:
+                        errors.append(error_dict)
+            lineage = node.lineage.to_networkx()
+            nx.set_edge_attributes(
+                lineage,
+                {e: {"lineage_type": ltypes[i].value} for e in lineage.edges},
+            )
+            lineage = nx.MultiDiGraph(lineage)
+            if i == 0:
+                graph_it = lineage
+            else:
+                # can't use compose because it doesn't allow for multiple edge types
+                graph_it.add_nodes_from(lineage.nodes)
+                graph_it.add_edges_from(lineage.edges(data=True))
 
-            if os.getenv("DEV") == "true":
-                print(j, k)
+            # make sure no silent lineage failures
+            if len(lineage.edges) == 0 and len(node.deps) > 0 and len(node.errors) == 0:
+                vinylerror = VinylError(
+                    node_id=k,
+                    type=VinylErrorType.NO_LINEAGE_ERROR,
+                    msg="No lineage found for asset despite node having dependencies and lack of explicit lineage errors",
+                    dialect=self.dialect,
+                    context=node.original_ast.sql(dialect=self.dialect),
+                )
+                error_dict = vinylerror.to_dict()
+                if error_dict not in uncaught_errors:
+                    uncaught_errors.append(error_dict)
+        malformed_errors = []
+        for node in graph_it.copy():
+            try:
+                get_schema_field_urn(node)
+            except (InvalidUrnError, AssertionError):
+                nx_remove_node_and_reconnect(graph_it, node, preserve_ntype=True)
+                malformed_errors.append(
+                    VinylError(
+                        node_id=node,
+                        type=VinylErrorType.PARSE_ERROR,
+                        msg=f"Malformed column name: {node}",
+                    ).to_dict()
+                )
 
-            ltypes = [ltype for ltype in ColumnLink.LineageType]
+        return {
+            "id": k,
+            "sql": asset.sql,
+            "graph": graph_it,
+            "errors": errors,
+            "uncaught_errors": uncaught_errors,
+            "malformed_errors": malformed_errors,
+        }
 
-            nodes = self.get_ast_nodes(k, asset, ltypes)
-            graph_it = nx.MultiDiGraph()
-            for i, node in enumerate(nodes):
-                if node.errors:
-                    for error in node.errors:
-                        error = AssetError(
-                            asset=asset,
-                            error=error.to_dict(),
-                            workspace_id=self.workspace_id,
+    def _add_asset_cll_errors(self, asset: Asset, result: dict[str, Any]):
+        for error_dict in result["errors"]:
+            error = AssetError(
+                asset=asset,
+                error=error_dict,
+                workspace_id=self.workspace_id,
+            )
+            if error not in self.asset_errors:
+                if os.getenv("DEV") == "true":
+                    to_print = error.error.copy()
+                    if to_print.get("context"):
+                        to_print["context"] = "\n".join(
+                            to_print["context"].splitlines()[:100]
                         )
-                        if error not in self.asset_errors:
-                            if os.getenv("DEV") == "true":
-                                to_print = error.error.copy()
-                                if to_print.get("context"):
-                                    to_print["context"] = "\n".join(
-                                        to_print["context"].splitlines()[:100]
-                                    )
-                                print("error", to_print)
-                            self.asset_errors.append(error)
-                lineage = node.lineage.to_networkx()
-                nx.set_edge_attributes(
-                    lineage,
-                    {e: {"lineage_type": ltypes[i].value} for e in lineage.edges},
+                    print("error", to_print)
+                self.asset_errors.append(error)
+        for error_dict in result["uncaught_errors"]:
+            error = AssetError(
+                asset=asset,
+                error=error_dict,
+                workspace_id=self.workspace_id,
+            )
+            if error not in self.asset_errors:
+                self.asset_errors.append(error)
+                print("uncaught error", error)
+        for error_dict in result["malformed_errors"]:
+            self.asset_errors.append(
+                AssetError(
+                    asset=asset,
+                    error=error_dict,
+                    workspace_id=self.workspace_id,
                 )
-                lineage = nx.MultiDiGraph(lineage)
-                if i == 0:
-                    graph_it = lineage
-                else:
-                    # can't use compose because it doesn't allow for multiple edge types
-                    graph_it.add_nodes_from(lineage.nodes)
-                    graph_it.add_edges_from(lineage.edges(data=True))
-
-                # make sure no silent lineage failures
-                if (
-                    len(lineage.edges) == 0
-                    and len(node.deps) > 0
-                    and len(node.errors) == 0
-                ):
-                    vinylerror = VinylError(
-                        node_id=k,
-                        type=VinylErrorType.NO_LINEAGE_ERROR,
-                        msg="No lineage found for asset despite node having dependencies and lack of explicit lineage errors",
-                        dialect=self.dialect,
-                        context=node.original_ast.sql(dialect=self.dialect),
-                    )
-                    error = AssetError(
-                        asset=asset,
-                        error=vinylerror.to_dict(),
-                        workspace_id=self.workspace_id,
-                    )
-                    if error not in self.asset_errors:
-                        self.asset_errors.append(error)
-                        print("uncaught error", error)
-            for node in graph_it.copy():
-                try:
-                    get_schema_field_urn(node)
-                except (InvalidUrnError, AssertionError):
-                    nx_remove_node_and_reconnect(graph_it, node, preserve_ntype=True)
-                    error = AssetError(
-                        asset=asset,
-                        error=VinylError(
-                            node_id=node,
-                            type=VinylErrorType.PARSE_ERROR,
-                            msg=f"Malformed column name: {node}",
-                        ).to_dict(),
-                        workspace_id=self.workspace_id,
-                    )
-                    self.asset_errors.append(error)
-            graphs.append(graph_it)
+            )
+
+    def get_db_cll(self, ignore_ids: list[str] = [], n_jobs: int | None = None):
+        self.get_asset_column_dict()
+        n_jobs = n_jobs if n_jobs is not None else self.n_jobs
+        to_process = [
+            k
+            for k, asset in self.asset_dict.items()
+            if asset.sql and k not in ignore_ids
+        ]
+
+        if n_jobs > 1 and len(to_process) > 1:
+            # workers are forked, so the parser is shared copy-on-write rather than pickled per task. Results come back in input order, which keeps the merge deterministic.
+            with WorkerPool(
+                n_jobs=min(n_jobs, len(to_process)),
+                shared_objects=self,
+                start_method="fork",
+            ) as pool:
+                results = pool.map(
+                    _get_asset_cll_worker,
+                    to_process,
+                    worker_init=_init_cll_worker,
+                    chunk_size=max(1, len(to_process) // (n_jobs * 4)),
+                    progress_bar=os.getenv("DEV") == "true",
+                )
+        else:
+            results = []
+            for j, k in enumerate(to_process):
+                if os.getenv("DEV") == "true":
+                    print(j, k)
+                results.append(self.get_asset_cll(k, self.asset_dict[k]))
+
+        graphs = []
+        for result in results:
+            asset = self.asset_dict[result["id"]]
+            asset.sql = result["sql"]
+            self._add_asset_cll_errors(asset, result)
+            graphs.append(result["graph"])
 
         self.column_graph = nx.compose_all([self.column_graph, *graphs])
 
-    def parse(self):
+    def get_fingerprints(self) -> dict[str, str]:
+        """
+        Hashes the aspects that determine an asset's column lineage: its sql, its schema and its set of upstreams.
+        """
+        asset_columns = {}
+        for col in self.column_dict.values():
+            asset_columns.setdefault(col.asset_id, []).append([col.name, col.type])
+
+        fingerprints = {}
+        for k, asset in self.asset_dict.items():
+            upstreams = (
+                sorted(self.asset_graph.predecessors(k))
+                if k in self.asset_graph
+                else []
+            )
+            payload = orjson.dumps(
+                {
+                    "dialect": self.dialect,
+                    "sql": asset.sql,
+                    "columns": sorted(asset_columns.get(k, [])),
+                    "upstreams": upstreams,
+                },
+                option=orjson.OPT_SORT_KEYS,
+            )
+            fingerprints[k] = hashlib.sha256(payload).hexdigest()
+        return fingerprints
+
+    def get_changed_asset_ids(self, previous_fingerprints: dict[str, str]) -> set[str]:
+        changed = {
+            k
+            for k, fingerprint in self.fingerprints.items()
+            if previous_fingerprints.get(k) != fingerprint
+        }
+        # lineage of direct dependents depends on the schema of their upstreams
+        dependents = {
+            successor
+            for k in changed
+            if k in self.asset_graph
+            for successor in self.asset_graph.successors(k)
+        }
+        return changed | dependents
+
+    def get_db_cll_incremental(self, previous_fingerprints: dict[str, str]):
+        changed = self.get_changed_asset_ids(previous_fingerprints)
+        unchanged = [
+            k for k, asset in self.asset_dict.items() if asset.sql and k not in changed
+        ]
+        self.get_db_cll(ignore_ids=unchanged)
+
+        # reuse column links and errors of unchanged assets from the last sync
+        for k in unchanged:
+            asset = self.asset_dict[k]
+            asset.sql = self.adjust_casing_lineage(asset.sql)
+        adjuster = UrnAdjuster(self.workspace_id)
+        adjusted_ids = [adjuster.adjust(k) for k in unchanged]
+        for link in ColumnLink.objects.filter(
+            workspace_id=self.workspace_id, target__asset_id__in=adjusted_ids
+        ):
+            self.column_graph.add_edge(
+                adjuster.unadjust(link.source_id),
+                adjuster.unadjust(link.target_id),
+                lineage_type=link.lineage_type,
+                ntype=set(link.connection_types or []),
+            )
+        # rebuilt unsaved with unadjusted ids, like the links, so they go through the same adjust and upsert as fresh errors
+        for asset_id, error, lineage_type in AssetError.objects.filter(
+            workspace_id=self.workspace_id, asset_id__in=adjusted_ids
+        ).values_list("asset_id", "error", "lineage_type"):
+            self.asset_errors.append(
+                AssetError(
+                    asset_id=adjuster.unadjust(asset_id),
+                    error=error,
+                    lineage_type=lineage_type,
+                    workspace_id=self.workspace_id,
+                )
+            )
+
+    def parse(self, previous_fingerprints: dict[str, str] | None = None):
+        """
+        Parses the datahub db. If `previous_fingerprints` from a prior sync are passed, column lineage is only recomputed for assets that changed and their direct dependents.
+        """
         self.get_row_dict()
         for i, cls in enumerate(DataHubDBParserBase.__subclasses__()):
             if i == 0:
@@ -1100,7 +1296,11 @@ class DataHubDBParser:
         self.adjust_asset_graphs_and_dicts()
         self.adjust_column_graphs_and_dicts()
         if self.is_db:
-            self.get_db_cll()
+            self.fingerprints = self.get_fingerprints()
+            if previous_fingerprints is None:
+                self.get_db_cll()
+            else:
+                self.get_db_cll_incremental(previous_fingerprints)
 
     @classmethod
     def combine(cls, parsers: list[DataHubDBParser], resource: Resource):
@@ -1158,19 +1358,46 @@ class DataHubDBParser:
         )
 
     @classmethod
-    def _delete_unused_indirect_instances(cls, type: Literal["asset", "column"]):
+    def get_unused_indirect_instances(
+        cls, type: Literal["asset", "column"], workspace_id: str
+    ) -> QuerySet:
         root_table = Asset if type == "asset" else Column
         link_table = AssetLink if type == "asset" else ColumnLink
-        to_delete = []
-        source_ids = set()
-        target_ids = set()
-        for assetlink in link_table.objects.all():
-            source_ids.add(assetlink.source_id)
-            target_ids.add(assetlink.target_id)
-        for asset in root_table.objects.filter(is_indirect=True):
-            if asset.id not in source_ids and asset.id not in target_ids:
-                to_delete.append(asset.id)
-        root_table.objects.filter(id__in=to_delete).delete()
+        return root_table.objects.filter(
+            ~Exists(link_table.objects.filter(source_id=OuterRef("pk"))),
+            ~Exists(link_table.objects.filter(target_id=OuterRef("pk"))),
+            workspace_id=workspace_id,
+            is_indirect=True,
+        )
+
+    @classmethod
+    def delete_unused_indirect_instances(
+        cls,
+        type: Literal["asset", "column"],
+        workspace_id: str,
+        batch_size: int = INDIRECT_CLEANUP_BATCH_SIZE,
+        progress_callback: Callable[[str, int], None] | None = None,
+    ) -> int:
+        """
+        Deletes indirect instances in the workspace that are no longer linked to anything, `batch_size` at a time. Each batch is deleted in its own transaction through the orm so cascades are applied.
+        """
+        root_table = Asset if type == "asset" else Column
+        num_deleted = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    cls.get_unused_indirect_instances(type, workspace_id).values_list(
+                        "pk", flat=True
+                    )[:batch_size]
+                )
+                if len(batch) == 0:
+                    break
+                root_table.objects.filter(pk__in=batch).delete()
+            num_deleted += len(batch)
+            LineageService.invalidate(workspace_id)
+            if progress_callback is not None:
+                progress_callback(type, num_deleted)
+        return num_deleted
 
     @classmethod
     def cleanup_container_memberships(
@@ -1257,6 +1484,8 @@ class DataHubDBParser:
         # cleanup unconnected asset containers
         AssetContainer.objects.filter(containermembership__isnull=True).delete()
 
-        # cleanup unconnected indirects
-        cls._delete_unused_indirect_instances("asset")
-        cls._delete_unused_indirect_instances("column")
+        # unconnected indirects are cleaned up afterwards by the `cleanup_indirect_instances` task
+
+        # drop cached lineage graphs once the new links are visible
+        workspace_id = resource.workspace.id
+        transaction.on_commit(lambda: LineageService.invalidate(workspace_id))
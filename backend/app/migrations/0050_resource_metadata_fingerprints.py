@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0049_clickhousedetails"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="resource",
+            name="metadata_fingerprints",
+            field=models.JSONField(null=True),
+        ),
+    ]
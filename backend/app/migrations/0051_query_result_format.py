@@ -0,0 +1,40 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0050_resource_metadata_fingerprints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dbtquery",
+            name="result_format",
+            field=models.CharField(
+                choices=[("json", "Json"), ("arrow", "Arrow"), ("parquet", "Parquet")],
+                default="json",
+                max_length=255,
+            ),
+        ),
+        migrations.AddField(
+            model_name="dbtquery",
+            name="result_metadata",
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name="query",
+            name="result_format",
+            field=models.CharField(
+                choices=[("json", "Json"), ("arrow", "Arrow"), ("parquet", "Parquet")],
+                default="json",
+                max_length=255,
+            ),
+        ),
+        migrations.AddField(
+            model_name="query",
+            name="result_metadata",
+            field=models.JSONField(null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0051_query_result_format"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dbtorchestrator",
+            name="dependencies",
+            field=models.JSONField(
+                db_comment="For each command, the indices of the commands it depends on. Commands run one after another if not set.",
+                null=True,
+            ),
+        ),
+    ]
@@ -11,6 +11,7 @@ from git.exc import GitCommandError
 from app.models.repository import Repository
 from app.models.user import User
 from app.models.workspace import Workspace
+from app.utils.git_mirror import clone_repository
 
 
 class Project(models.Model):
@@ -58,7 +59,7 @@ class Project(models.Model):
                 raise Exception("Repository already cloned")
 
             with self.repository.with_ssh_env() as env:
-                repo = GitRepo.clone_from(self.repository.git_repo_url, path, env=env)
+                repo = self._clone_to(path, env, isolate)
 
                 # Fetch the latest changes from the remote
                 repo.remotes.origin.fetch(env=env)
@@ -127,6 +128,22 @@ class Project(models.Model):
 
         return True
 
+    def _clone_to(self, path: str, env: dict[str, str], isolate: bool) -> GitRepo:
+        # isolated clones live in a temp dir, so they can keep borrowing objects from the mirror
+        return clone_repository(
+            self.repository_id,
+            self.repository.git_repo_url,
+            path,
+            env=env,
+            dissociate=not self._is_isolated(isolate),
+        )
+
+    @staticmethod
+    def _is_isolated(isolate: bool) -> bool:
+        if os.getenv("FORCE_NO_ISOLATE") == "true":
+            return False
+        return isolate or os.getenv("FORCE_ISOLATE") == "true"
+
     @contextmanager
     def _code_repo_path(
         self, isolate: bool = False, separation_id: uuid.UUID | None = None
@@ -139,14 +156,23 @@ class Project(models.Model):
             str(separation_id) if separation_id is not None else str(self.id),
             self.repository.repo_name,
         )
-        if os.getenv("FORCE_NO_ISOLATE") == "true":
-            yield os.path.join(settings.MEDIA_ROOT, path)
-        elif isolate or os.getenv("FORCE_ISOLATE") == "true":
+        if self._is_isolated(isolate):
             with tempfile.TemporaryDirectory() as temp_dir:
                 yield os.path.join(temp_dir, path)
         else:
             yield os.path.join(settings.MEDIA_ROOT, path)
 
+    def get_local_repo_path(self) -> str | None:
+        """
+        The persistent working tree `repo_context` would use, or None if repos are isolated or it hasn't been cloned yet.
+        """
+        if self._is_isolated(False):
+            return None
+        with self._code_repo_path() as path:
+            if os.path.exists(os.path.join(path, ".git")):
+                return path
+        return None
+
     @contextmanager
     def repo_context(
         self,
@@ -171,7 +197,7 @@ class Project(models.Model):
                     return
 
             with self.repository.with_ssh_env(env_override) as env:
-                repo = GitRepo.clone_from(self.repository.git_repo_url, path, env=env)
+                repo = self._clone_to(path, env, isolate)
 
                 # Fetch the latest changes from the remote
                 repo.remotes.origin.fetch(env=env)
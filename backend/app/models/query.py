@@ -1,12 +1,26 @@
 import json
+import os
+import tempfile
 import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Iterator
 
 import pandas as pd
-from django.core.files.base import ContentFile
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.core.files.base import ContentFile, File
 from django.db import models
 from django.utils import timezone
 
 from app.models.settings import StorageSettings
+from app.services.query_cache import (
+    PREVIEW_CACHE_ENABLED,
+    PREVIEW_RESULT_CACHE_MAX_ROWS,
+    compiled_sql_cache,
+    get_compiled_sql_key,
+    get_preview_result_key,
+    preview_result_cache,
+)
 from app.services.storage_backends import CustomFileField
 from vinyl.lib.utils.query import _QUERY_LIMIT
 
@@ -14,13 +28,282 @@ from .project import Project
 from .resources import DBTResource, Resource
 from .workspace import Workspace
 
+QUERY_RESULT_PAGE_SIZE = int(os.getenv("QUERY_RESULT_PAGE_SIZE", 5000))
+QUERY_RESULT_COMPRESSION = os.getenv("QUERY_RESULT_COMPRESSION", "zstd")
+# matches the lifetime of the signed url sent for it
+QUERY_FIRST_PAGE_TTL = int(os.getenv("QUERY_FIRST_PAGE_TTL", 3600))
+
+
+class ResultFormat(models.TextChoices):
+    JSON = "json"
+    ARROW = "arrow"
+    PARQUET = "parquet"
+
+
+def get_default_result_format() -> str:
+    return os.getenv("QUERY_RESULT_FORMAT", ResultFormat.JSON)
+
 
 def query_to_json(df: pd.DataFrame, columns: dict[str, str]) -> str:
     data = df.to_json(orient="records")
     return f'{{"data": {data}, "column_types": {json.dumps(columns)}}}'
 
 
-class Query(models.Model):
+def iter_pages(
+    batches: Iterator[pa.RecordBatch], page_size: int = QUERY_RESULT_PAGE_SIZE
+) -> Iterator[pa.Table]:
+    """
+    Regroups a stream of record batches into tables of `page_size` rows, holding at most one page in memory.
+    """
+    pending = []
+    num_pending = 0
+    num_rows = 0
+    for batch in batches:
+        pending.append(pa.Table.from_batches([batch]))
+        num_pending += batch.num_rows
+        num_rows += batch.num_rows
+        while num_pending >= page_size:
+            # batches from different fetches may infer different types, e.g. all nulls
+            table = pa.concat_tables(pending, promote_options="permissive")
+            yield table.slice(0, page_size)
+            pending = [table.slice(page_size)]
+            num_pending = table.num_rows - page_size
+    # an empty result is still yielded, as it carries the schema of its batches
+    if num_pending > 0 or (pending and num_rows == 0):
+        yield pa.concat_tables(pending, promote_options="permissive")
+
+
+def _empty_table(columns: dict[str, str]) -> pa.Table:
+    return pa.table({name: pa.array([], pa.null()) for name in columns})
+
+
+class _ResultWriter(ABC):
+    def __init__(self, f, columns: dict[str, str], page_size: int):
+        self.f = f
+        self.columns = columns
+        self.page_size = page_size
+        self.pages = []
+
+    @abstractmethod
+    def write_page(self, page: pa.Table):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+
+class _JSONResultWriter(_ResultWriter):
+    def __init__(self, f, columns: dict[str, str], page_size: int):
+        super().__init__(f, columns, page_size)
+        self.f.write(b'{"data": [')
+
+    def write_page(self, page: pd.DataFrame):
+        records = page.to_json(orient="records")[1:-1]
+        if records:
+            self.f.write((b"," if self.pages else b"") + records.encode())
+            self.pages.append({"num_rows": len(page)})
+
+    def close(self):
+        self.f.write(f'], "column_types": {json.dumps(self.columns)}}}'.encode())
+        # json results are downloaded whole, so no page index is kept
+        self.pages = None
+
+
+class _ArrowResultWriter(_ResultWriter):
+    """
+    Writes each page as a self-contained, compressed arrow ipc stream so a single page can be decoded from its byte range alone.
+    """
+
+    def write_page(self, page: pa.Table):
+        options = pa.ipc.IpcWriteOptions(compression=QUERY_RESULT_COMPRESSION)
+        offset = self.f.tell()
+        with pa.ipc.new_stream(self.f, page.schema, options=options) as writer:
+            writer.write_table(page)
+        self.pages.append(
+            {
+                "offset": offset,
+                "length": self.f.tell() - offset,
+                "num_rows": page.num_rows,
+            }
+        )
+
+    def close(self):
+        if not self.pages:
+            # a single empty page, so the schema can still be read
+            self.write_page(_empty_table(self.columns))
+
+
+class _ParquetResultWriter(_ResultWriter):
+    # pages are parquet row groups
+    writer: pq.ParquetWriter | None = None
+
+    def _open(self, schema: pa.Schema):
+        # all null columns in the first page are widened so later pages still fit
+        schema = pa.schema(
+            [
+                f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                for f in schema
+            ]
+        )
+        self.writer = pq.ParquetWriter(
+            self.f, schema, compression=QUERY_RESULT_COMPRESSION
+        )
+
+    def write_page(self, page: pa.Table):
+        if self.writer is None:
+            self._open(page.schema)
+        if page.num_rows == 0:
+            return
+        self.writer.write_table(
+            page.cast(self.writer.schema_arrow), row_group_size=self.page_size
+        )
+        self.pages.append({"row_group": len(self.pages), "num_rows": page.num_rows})
+
+    def close(self):
+        if self.writer is None:
+            # without any row groups the footer still records the schema
+            self._open(_empty_table(self.columns).schema)
+        self.writer.close()
+
+
+_RESULT_WRITERS = {
+    ResultFormat.JSON: _JSONResultWriter,
+    ResultFormat.ARROW: _ArrowResultWriter,
+    ResultFormat.PARQUET: _ParquetResultWriter,
+}
+
+
+class QueryResultsMixin:
+    """
+    Shared result storage for `Query` and `DBTQuery`. Json results are stored as a single records document. Arrow and parquet results are stored in pages whose index is kept in `result_metadata`.
+    """
+
+    def _save_first_page(
+        self, page: pa.Table | pd.DataFrame, columns: dict[str, str]
+    ) -> str:
+        df = page if isinstance(page, pd.DataFrame) else page.to_pandas()
+        name = self.results.field.generate_filename(self, f"{self.id}.first_page.json")
+        return self.results.storage.save(name, ContentFile(query_to_json(df, columns)))
+
+    def _expire_first_page(self, name: str):
+        # the task module imports this one
+        from app.workflows.query import delete_query_file
+
+        delete_query_file.si(
+            workspace_id=str(self.workspace_id), name=name
+        ).apply_async(countdown=QUERY_FIRST_PAGE_TTL)
+
+    def run_connector_query(
+        self,
+        connector,
+        sql: str,
+        limit: int | None,
+        result_format: str | None,
+        on_first_page: Callable[[dict], None] | None = None,
+    ) -> dict:
+        result_format = ResultFormat(result_format or get_default_result_format())
+        if result_format == ResultFormat.JSON:
+            # json is written from the driver's dataframes, so values arrow can't type (e.g. json objects) keep their pandas serialization
+            pages, columns = connector.run_query_frames(
+                sql, limit=limit, batch_size=QUERY_RESULT_PAGE_SIZE
+            )
+        else:
+            batches, columns = connector.run_query_iter(sql, limit=limit)
+            pages = iter_pages(batches, QUERY_RESULT_PAGE_SIZE)
+        return self.save_results(pages, columns, result_format, on_first_page)
+
+    def save_results(
+        self,
+        pages: Iterator[pa.Table | pd.DataFrame],
+        columns: dict[str, str],
+        result_format: str | None,
+        on_first_page: Callable[[dict], None] | None = None,
+    ) -> dict:
+        """
+        Writes the pages to a local spool file one by one and streams it to storage, so memory use is bounded by a page rather than the whole result. Json results take dataframes, arrow and parquet results take arrow tables.
+
+        For results of more than one page, `on_first_page` is called with a signed url to the first page once the second page arrives. The first page is only there to bridge the wait for the full result, so it is deleted once its signed url has expired.
+        """
+        result_format = ResultFormat(result_format or get_default_result_format())
+        num_rows = 0
+        first_page = None
+        first_page_name = None
+        try:
+            with tempfile.TemporaryFile() as f:
+                writer = _RESULT_WRITERS[result_format](
+                    f, columns, QUERY_RESULT_PAGE_SIZE
+                )
+                for i, page in enumerate(pages):
+                    writer.write_page(page)
+                    num_rows += len(page)
+                    if on_first_page is None:
+                        continue
+                    if i == 0:
+                        first_page = page
+                    elif i == 1:
+                        first_page_name = self._save_first_page(first_page, columns)
+                        on_first_page(
+                            {
+                                "query_id": str(self.id),
+                                "signed_url": self.results.storage.url(first_page_name),
+                                "num_rows": len(first_page),
+                            }
+                        )
+                        first_page = None
+                writer.close()
+
+                self.result_format = result_format
+                self.result_metadata = {"column_types": columns, "num_rows": num_rows}
+                if writer.pages is not None:
+                    self.result_metadata["pages"] = writer.pages
+                f.seek(0)
+                self.results.save(f"{self.id}.{result_format}", File(f), save=True)
+        finally:
+            if first_page_name is not None:
+                self._expire_first_page(first_page_name)
+
+        self.refresh_from_db()
+        return self.get_results_response()
+
+    def get_results_response(self) -> dict:
+        out = {
+            "status": "success",
+            "signed_url": self.results.url,
+            "query_id": str(self.id),
+            "result_format": self.result_format,
+        }
+        if self.result_format != ResultFormat.JSON:
+            out["num_rows"] = self.result_metadata["num_rows"]
+            out["pages"] = self.result_metadata["pages"]
+            out["column_types"] = self.result_metadata["column_types"]
+        return out
+
+    @property
+    def num_pages(self) -> int:
+        return len((self.result_metadata or {}).get("pages", []))
+
+    def read_page_bytes(self, page: int) -> bytes:
+        """
+        Returns the raw, standalone arrow ipc stream for a page.
+        """
+        if self.result_format != ResultFormat.ARROW:
+            raise ValueError("Byte ranges are only available for arrow results")
+        page_info = self.result_metadata["pages"][page]
+        with self.results.open("rb") as f:
+            f.seek(page_info["offset"])
+            return f.read(page_info["length"])
+
+    def read_page(self, page: int) -> pd.DataFrame:
+        if self.result_format == ResultFormat.ARROW:
+            return pa.ipc.open_stream(self.read_page_bytes(page)).read_pandas()
+        if self.result_format == ResultFormat.PARQUET:
+            with self.results.open("rb") as f:
+                return pq.ParquetFile(f).read_row_group(page).to_pandas()
+        raise ValueError("Paging is only available for arrow and parquet results")
+
+
+class Query(QueryResultsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True, null=True)
@@ -30,6 +313,10 @@ class Query(models.Model):
         null=True,
         storage_category=StorageSettings.StorageCategories.DATA,
     )
+    result_format = models.CharField(
+        max_length=255, choices=ResultFormat.choices, default=ResultFormat.JSON
+    )
+    result_metadata = models.JSONField(null=True)
     resource = models.ForeignKey(
         Resource,
         on_delete=models.CASCADE,
@@ -39,18 +326,18 @@ class Query(models.Model):
     project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True)
     workspace = models.ForeignKey(Workspace, on_delete=models.CASCADE)
 
-    def run(self, limit: int | None = _QUERY_LIMIT):
+    def run(
+        self,
+        limit: int | None = _QUERY_LIMIT,
+        result_format: str | None = None,
+        on_first_page: Callable[[dict], None] | None = None,
+    ):
         if not self.sql:
             return {"status": "error", "message": "SQL is required"}
         connector = self.resource.details.get_connector()
-        df, columns = connector.run_query(self.sql, limit=limit)
-        query_results = query_to_json(df, columns)
-
-        query_results_file = ContentFile(query_results)
-        self.results.save(f"{self.id}.json", query_results_file, save=True)
-        self.refresh_from_db()
-        signed_url = self.results.url
-        return {"status": "success", "signed_url": signed_url}
+        return self.run_connector_query(
+            connector, self.sql, limit, result_format, on_first_page
+        )
 
     def validate(self):
         if not self.sql:
@@ -64,7 +351,7 @@ class Query(models.Model):
         }
 
 
-class DBTQuery(models.Model):
+class DBTQuery(QueryResultsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True, null=True)
@@ -74,6 +361,10 @@ class DBTQuery(models.Model):
         null=True,
         storage_category=StorageSettings.StorageCategories.DATA,
     )
+    result_format = models.CharField(
+        max_length=255, choices=ResultFormat.choices, default=ResultFormat.JSON
+    )
+    result_metadata = models.JSONField(null=True)
     dbtresource = models.ForeignKey(
         DBTResource,
         on_delete=models.CASCADE,
@@ -87,25 +378,90 @@ class DBTQuery(models.Model):
         self,
         use_fast_compile: bool = True,
         limit: int | None = _QUERY_LIMIT,
+        result_format: str | None = None,
+        on_first_page: Callable[[dict], None] | None = None,
     ):
         project_id = self.project.id if self.project else None
-        with self.dbtresource.dbt_repo_context(project_id) as (
-            dbtproj,
-            project_path,
-            _,
+        key = None
+        sql = None
+        if PREVIEW_CACHE_ENABLED:
+            # checked against the working tree in place, so a hit skips the repo context entirely
+            key = self._get_compiled_sql_key(
+                self.dbtresource.get_preview_fingerprint(project_id),
+                use_fast_compile,
+                limit,
+            )
+            if key is not None:
+                sql = compiled_sql_cache.get(key)
+        if sql is None:
+            with self.dbtresource.dbt_repo_context(project_id) as (
+                dbtproj,
+                project_path,
+                _,
+            ):
+                if PREVIEW_CACHE_ENABLED and key is None:
+                    # e.g. isolated repos, which are only checked out in the context
+                    key = self._get_compiled_sql_key(
+                        self.dbtresource.get_preview_fingerprint(
+                            project_id, project_path
+                        ),
+                        use_fast_compile,
+                        limit,
+                    )
+                sql = self.compile(dbtproj, use_fast_compile, limit)
+            if key is not None:
+                compiled_sql_cache.set(key, sql)
+
+        result_format = ResultFormat(result_format or get_default_result_format())
+        result_key = get_preview_result_key(
+            self.dbtresource.resource_id, sql, limit, result_format
+        )
+        if PREVIEW_CACHE_ENABLED:
+            cached = preview_result_cache.get(result_key)
+            if cached is not None:
+                # the same sql was just run against the same warehouse, so its results file is shared
+                self.results.name = cached["name"]
+                self.result_format = cached["result_format"]
+                self.result_metadata = cached["result_metadata"]
+                self.save()
+                return self.get_results_response()
+
+        connector = self.dbtresource.resource.details.get_connector()
+        out = self.run_connector_query(
+            connector, sql, limit, result_format, on_first_page
+        )
+        if (
+            PREVIEW_CACHE_ENABLED
+            and self.result_metadata["num_rows"] <= PREVIEW_RESULT_CACHE_MAX_ROWS
         ):
-            connector = self.dbtresource.resource.details.get_connector()
-            sql = None
-            if use_fast_compile:
-                sql = dbtproj.fast_compile(self.dbt_sql)
-            if sql is None:
-                sql = dbtproj.preview(self.dbt_sql, limit=limit, data=False)
-
-            df, columns = connector.run_query(sql, limit=limit)
-            query_results = query_to_json(df, columns)
-
-            query_results_file = ContentFile(query_results)
-            self.results.save(f"{self.id}.json", query_results_file, save=True)
-            self.refresh_from_db()
-            signed_url = self.results.url
-            return {"status": "success", "signed_url": signed_url}
+            preview_result_cache.set(
+                result_key,
+                {
+                    "name": self.results.name,
+                    "result_format": self.result_format,
+                    "result_metadata": self.result_metadata,
+                },
+            )
+        return out
+
+    def _get_compiled_sql_key(
+        self, fingerprint: str | None, use_fast_compile: bool, limit: int | None
+    ) -> str | None:
+        if fingerprint is None:
+            return None
+        return get_compiled_sql_key(
+            self.dbtresource_id,
+            self.project_id,
+            self.dbt_sql,
+            fingerprint,
+            use_fast_compile,
+            limit,
+        )
+
+    def compile(self, dbtproj, use_fast_compile: bool, limit: int | None) -> str:
+        sql = None
+        if use_fast_compile:
+            sql = dbtproj.fast_compile(self.dbt_sql)
+        if sql is None:
+            sql = dbtproj.preview(self.dbt_sql, limit=limit, data=False)
+        return sql
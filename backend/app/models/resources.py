@@ -1,9 +1,13 @@
+import hashlib
 import json
+import logging
 import os
 import re
 import shutil
 import tempfile
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from typing import Any, Generator
 
@@ -25,6 +29,12 @@ from app.services.storage_backends import (
     CustomFileField,
     CustomS3Boto3StorageDeprecated,
 )
+from app.utils.datahub import (
+    DATAHUB_INGEST_MAX_WORKERS,
+    get_datahub_command,
+    get_datahub_package,
+    merge_datahub_dbs,
+)
 from app.utils.fields import encrypt
 from vinyl.lib.connect import (
     BigQueryConnector,
@@ -35,10 +45,12 @@ from vinyl.lib.connect import (
     RedshiftConnector,
     SnowflakeConnector,
 )
-from vinyl.lib.dbt import DBTProject, DBTTransition
+from vinyl.lib.dbt import DBTProject, DBTTransition, get_tree_fingerprint
 from vinyl.lib.dbt_methods import DBTDialect, DBTVersion
 from vinyl.lib.utils.process import run_and_capture_subprocess
 
+logger = logging.getLogger(__name__)
+
 
 # Helper classes
 class ResourceType(models.TextChoices):
@@ -139,6 +151,8 @@ class Resource(models.Model):
         upload_to="datahub_dbs/",
         null=True,
     )
+    # per-asset hashes of the aspects column lineage depends on, used for incremental syncs
+    metadata_fingerprints = models.JSONField(null=True)
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
@@ -222,82 +236,125 @@ class ResourceDetails(PolymorphicModel):
         )
         return db_path, config_path
 
+    def _run_datahub_ingest_config(
+        self, base_command: list[str], path: str, workunits: int | None = None
+    ):
+        log_pattern = re.compile(
+            r"(?P<datetime>.+?)\s+(?P<level>\w+)\s+(?P<message>.+)"
+        )
+        connection_type = os.path.basename(path).split(".")[0]
+        errors = []
+        with tempfile.NamedTemporaryFile(suffix=".log", mode="r+") as log_file:
+            command = [
+                *base_command,
+                "--log-file",
+                log_file.name,
+                "ingest",
+                "-c",
+                path,
+            ]
+            if workunits is not None:
+                command.extend(
+                    [
+                        "--preview",
+                        "--preview-workunits",
+                        str(workunits),
+                    ]
+                )
+            start = time.perf_counter()
+            process = run_and_capture_subprocess(command)
+            duration = time.perf_counter() - start
+            if process.returncode != 0:
+                errors.append(
+                    {
+                        "connection_type": connection_type,
+                        "error_message": process.stderr,
+                    }
+                )
+            log_contents = log_file.read()
+            for line in log_contents.splitlines():
+                match = log_pattern.match(line)
+                if match and match.group("level") == "ERROR":
+                    errors.append(
+                        {
+                            "connection_type": connection_type,
+                            "error_message": match.group("message"),
+                        }
+                    )
+        logger.info(
+            f"Datahub ingest for {connection_type} on resource {self.resource.id} took {duration:.2f}s"
+        )
+        return command, connection_type, duration, errors
+
     def _run_datahub_ingest_base(
         self,
         test: bool = False,
         workunits: int | None = None,
         tolerate_errors: bool = True,
     ):
-        dh_packages = "acryl-datahub[datahub-lite"
-        for extra in self.datahub_extras:
-            dh_packages += f",{extra}"
-        dh_packages += "]"
+        dh_packages = get_datahub_package(self.datahub_extras)
+
+        timings = {}
+        start = time.perf_counter()
+        # hardcode spacy version to prevent docker build issues on arm linux
+        base_command = get_datahub_command([dh_packages, "spacy==3.7.5"])
+        timings["environment"] = time.perf_counter() - start
 
         # run ingest test
-        log_pattern = re.compile(
-            r"(?P<datetime>.+?)\s+(?P<level>\w+)\s+(?P<message>.+)"
-        )
         errors = []
+        command = base_command
         with self.datahub_yaml_path() as (config_paths, db_path):
-            for path in config_paths:
-                if test and os.path.basename(path) == "dbt.yml":
-                    # skip dbt config if testing
-                    continue
-                command = [
-                    "uvx",
-                    "--no-progress",
-                    "--isolated",
-                    "--from",
-                    dh_packages,
-                    "--with",
-                    "spacy==3.7.5",  # hardcode spacy version to prevent docker build issues on arm linux
-                    "datahub",
+            if test:
+                # skip dbt config if testing
+                config_paths = [
+                    path for path in config_paths if os.path.basename(path) != "dbt.yml"
                 ]
-                with tempfile.NamedTemporaryFile(suffix=".log", mode="r+") as log_file:
-                    command.extend(
-                        [
-                            "--log-file",
-                            log_file.name,
-                            "ingest",
-                            "-c",
-                            path,
-                        ]
+
+            # each config gets its own sink so they can ingest concurrently, merged afterwards in config order
+            part_paths = []
+            if len(config_paths) > 1:
+                for i, path in enumerate(config_paths):
+                    with open(path) as f:
+                        config = yaml.safe_load(f)
+                    part_path = f"{db_path}.{i}.duckdb"
+                    config["sink"] = get_sync_config(part_path)
+                    with open(path, "w") as f:
+                        yaml.dump(config, f)
+                    part_paths.append(part_path)
+
+            with ThreadPoolExecutor(
+                max_workers=max(1, min(DATAHUB_INGEST_MAX_WORKERS, len(config_paths)))
+            ) as executor:
+                results = list(
+                    executor.map(
+                        lambda path: self._run_datahub_ingest_config(
+                            base_command, path, workunits
+                        ),
+                        config_paths,
                     )
-                    if workunits is not None:
-                        command.extend(
-                            [
-                                "--preview",
-                                "--preview-workunits",
-                                str(workunits),
-                            ]
-                        )
-                    process = run_and_capture_subprocess(command)
-                    connection_type = os.path.basename(path).split(".")[0]
-                    if process.returncode != 0:
-                        errors.append(
-                            {
-                                "connection_type": connection_type,
-                                "error_message": process.stderr,
-                            }
-                        )
-                    log_contents = log_file.read()
-                    for line in log_contents.splitlines():
-                        match = log_pattern.match(line)
-                        if match and match.group("level") == "ERROR":
-                            errors.append(
-                                {
-                                    "connection_type": connection_type,
-                                    "error_message": match.group("message"),
-                                }
-                            )
+                )
+            for command, connection_type, duration, config_errors in results:
+                timings[connection_type] = timings.get(connection_type, 0) + duration
+                errors.extend(config_errors)
+
+            if part_paths:
+                start = time.perf_counter()
+                merge_datahub_dbs(db_path, part_paths)
+                timings["merge"] = time.perf_counter() - start
+
             if not test and (len(errors) == 0 or tolerate_errors):
                 with open(db_path, "rb") as f:
                     self.resource.datahub_db.save(
                         os.path.basename(db_path), File(f), save=True
                     )
         if len(errors) > 0:
-            return {"success": False, "command": command, "errors": errors}
-        return {"success": True, "command": command}
+            return {
+                "success": False,
+                "command": command,
+                "errors": errors,
+                "timings": timings,
+            }
+        return {"success": True, "command": command, "timings": timings}
 
     def run_datahub_ingest(
         self,
@@ -726,6 +783,39 @@ class DBTCoreDetails(DBTResource):
             self.version = self.version.value
         super().save(*args, **kwargs)
 
+    def get_preview_fingerprint(
+        self, project_id: str | None = None, project_path: str | None = None
+    ) -> str | None:
+        """
+        Hashes what a preview compiles against: the project's working tree, its dbt profile and env vars. Without `project_path` the persistent working tree is read in place, so caches can be checked before entering `dbt_repo_context`. Returns None if there is no such tree or it isn't a git repo.
+        """
+        schema = None
+        if project_id is not None:
+            schema = Project.objects.get(id=project_id).schema
+        if project_path is None:
+            if self.repository is None:
+                project_path = self.project_path
+            else:
+                local_repo_path = self.repository.get_project(
+                    project_id
+                ).get_local_repo_path()
+                if local_repo_path is None:
+                    return None
+                project_path = os.path.join(local_repo_path, self.project_path)
+        tree_fingerprint = get_tree_fingerprint(project_path)
+        if tree_fingerprint is None:
+            return None
+        profile_contents = self.resource.details.get_dbt_profile_contents(
+            self, schema=schema
+        )
+        return hashlib.sha256(
+            orjson.dumps(
+                [tree_fingerprint, profile_contents, self.env_vars or {}],
+                default=str,
+                option=orjson.OPT_SORT_KEYS,
+            )
+        ).hexdigest()
+
     @contextmanager
     def dbt_repo_context(
         self,
@@ -836,7 +926,13 @@ class DBTCoreDetails(DBTResource):
         artifact_source: ArtifactSource = ArtifactSource.ORCHESTRATION,
         exclude_introspective: bool = True,
         export: bool = False,
+        dbtproj: DBTProject | None = None,
     ):
+        # an already mounted project is used as is rather than checking out the repo again
+        if dbtproj is not None:
+            return self._upload_artifacts(
+                dbtproj, raise_exception, artifact_source, exclude_introspective, export
+            )
         with self.dbt_repo_context(
             isolate=True, project_id=project_id, repo_override=repo_override
         ) as (
@@ -844,40 +940,52 @@ class DBTCoreDetails(DBTResource):
             project_path,
             _,
         ):
-            stdout, stderr, success = dbtproj.dbt_compile(
-                models_only=True,
-                update_manifest=True,
-                exclude_introspective=exclude_introspective,
+            return self._upload_artifacts(
+                dbtproj, raise_exception, artifact_source, exclude_introspective, export
             )
-            if not success:
-                if raise_exception:
-                    raise Exception(
-                        f"Error compiling dbt code. Stderr: {stderr}. Stdout: {stdout}"
-                    )
-                else:
-                    return stdout, stderr, False
-            stdout, stderr, success = dbtproj.dbt_docs_generate()
-            if not success:
-                if raise_exception:
-                    raise Exception(
-                        f"Error generating docs. Stderr: {stderr}. Stdout: {stdout}"
-                    )
-                else:
-                    return stdout, stderr, False
-
-            # save artifacts to file
-            ## must have custom export storage bucket to export artifacts
-            with open(dbtproj.manifest_path, "r") as f:
-                self.manifest.save(self.manifest_filename, f)
-                if export and self.is_exportable:
-                    self.exported_manifest.save(self.manifest_filename, f)
-            with open(dbtproj.catalog_path, "r") as f:
-                self.catalog.save(self.catalog_filename, f)
-                if export and self.is_exportable:
-                    self.exported_catalog.save(self.catalog_filename, f)
-            self.artifact_source = artifact_source
-            self.save()
-            return stdout, stderr, success
+
+    def _upload_artifacts(
+        self,
+        dbtproj: DBTProject,
+        raise_exception: bool,
+        artifact_source: ArtifactSource,
+        exclude_introspective: bool,
+        export: bool,
+    ):
+        stdout, stderr, success = dbtproj.dbt_compile(
+            models_only=True,
+            update_manifest=True,
+            exclude_introspective=exclude_introspective,
+        )
+        if not success:
+            if raise_exception:
+                raise Exception(
+                    f"Error compiling dbt code. Stderr: {stderr}. Stdout: {stdout}"
+                )
+            else:
+                return stdout, stderr, False
+        stdout, stderr, success = dbtproj.dbt_docs_generate()
+        if not success:
+            if raise_exception:
+                raise Exception(
+                    f"Error generating docs. Stderr: {stderr}. Stdout: {stdout}"
+                )
+            else:
+                return stdout, stderr, False
+
+        # save artifacts to file
+        ## must have custom export storage bucket to export artifacts
+        with open(dbtproj.manifest_path, "r") as f:
+            self.manifest.save(self.manifest_filename, f)
+            if export and self.is_exportable:
+                self.exported_manifest.save(self.manifest_filename, f)
+        with open(dbtproj.catalog_path, "r") as f:
+            self.catalog.save(self.catalog_filename, f)
+            if export and self.is_exportable:
+                self.exported_catalog.save(self.catalog_filename, f)
+        self.artifact_source = artifact_source
+        self.save()
+        return stdout, stderr, success
 
     @contextmanager
     def datahub_yaml_path(self, db_path):
@@ -324,6 +324,10 @@ class DBTOrchestrator(ScheduledWorkflow):
     )
     project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True)
     commands = ArrayField(models.TextField())
+    dependencies = models.JSONField(
+        null=True,
+        db_comment="For each command, the indices of the commands it depends on. Commands run one after another if not set.",
+    )
     save_artifacts = models.BooleanField(default=True)
     name = models.CharField(max_length=255, null=False, default="Job")
 
@@ -338,6 +342,7 @@ class DBTOrchestrator(ScheduledWorkflow):
             "resource_id": str(self.dbtresource_id),
             "dbtresource_id": str(self.dbtresource_id),
             "commands": self.commands,
+            "dependencies": self.dependencies,
             "project_id": str(self.project_id) if self.project_id else None,
             "save_artifacts": self.save_artifacts,
         }
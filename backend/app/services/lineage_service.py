@@ -1,3 +1,9 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
 from django.core.cache import caches
 from django.db.models import Q, QuerySet
 from django.forms.models import model_to_dict
@@ -8,7 +14,14 @@ from app.utils.obj import convert_to_dict, make_values_serializable
 
 cache = caches["default"]
 
-_CACHE = {}
+LINEAGE_GRAPH_CACHE_ENABLED = os.getenv("LINEAGE_GRAPH_CACHE", "true") == "true"
+LINEAGE_GRAPH_CACHE_SIZE = int(os.getenv("LINEAGE_GRAPH_CACHE_SIZE", 8))
+
+# least recently used graphs are evicted once `LINEAGE_GRAPH_CACHE_SIZE` workspaces are cached
+_CACHE: OrderedDict[str, tuple[str, "WorkspaceLineageGraph"]] = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+# graphs are built under a per-workspace lock so one slow build doesn't block other workspaces
+_WORKSPACE_LOCKS: dict[str, threading.Lock] = {}
 
 
 class Lineage(BaseModel):
@@ -35,6 +48,140 @@ class Lineage(BaseModel):
         }
 
 
+def _build_csr(
+    num_nodes: int, sources: np.ndarray, targets: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # returns the row pointers, the neighbor of each sorted edge, and the position of each sorted edge in the input
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    return indptr, targets[order], order
+
+
+class WorkspaceLineageGraph:
+    """
+    Compact adjacency of a workspace's asset and column lineage, stored as CSR arrays of asset indices. Traversals run in memory and only return ids, which are hydrated from postgres by the caller.
+    """
+
+    LINEAGE_TYPES = [None, *ColumnLink.LineageType.values]
+
+    def __init__(
+        self,
+        asset_links: list[tuple[str, str, str]],
+        column_links: list[tuple[str, str, str, str | None]],
+    ):
+        """
+        `asset_links` are `(link_id, source_asset_id, target_asset_id)` and `column_links` are `(link_id, source_asset_id, target_asset_id, lineage_type)`.
+        """
+        asset_ids = {}
+        for _, source, target in asset_links:
+            asset_ids.setdefault(source, len(asset_ids))
+            asset_ids.setdefault(target, len(asset_ids))
+        for _, source, target, _ in column_links:
+            asset_ids.setdefault(source, len(asset_ids))
+            asset_ids.setdefault(target, len(asset_ids))
+        self.asset_index = asset_ids
+        self.asset_ids = list(asset_ids)
+        num_assets = len(asset_ids)
+
+        self.asset_link_ids = np.array([v[0] for v in asset_links], dtype=object)
+        sources = np.array(
+            [asset_ids[v[1]] for v in asset_links], dtype=np.int64
+        ).reshape(-1)
+        targets = np.array(
+            [asset_ids[v[2]] for v in asset_links], dtype=np.int64
+        ).reshape(-1)
+        self.asset_links_source = sources
+        self.asset_links_target = targets
+        self.successor_indptr, self.successor_indices, _ = _build_csr(
+            num_assets, sources, targets
+        )
+        self.predecessor_indptr, self.predecessor_indices, _ = _build_csr(
+            num_assets, targets, sources
+        )
+
+        # column links are grouped by the asset of their target column
+        lineage_type_codes = {t: i for i, t in enumerate(self.LINEAGE_TYPES)}
+        column_sources = np.array(
+            [asset_ids[v[1]] for v in column_links], dtype=np.int64
+        ).reshape(-1)
+        column_targets = np.array(
+            [asset_ids[v[2]] for v in column_links], dtype=np.int64
+        ).reshape(-1)
+        self.column_indptr, self.column_source_assets, column_order = _build_csr(
+            num_assets, column_targets, column_sources
+        )
+        self.column_link_ids = np.array(
+            [v[0] for v in column_links], dtype=object
+        ).reshape(-1)[column_order]
+        self.column_lineage_types = np.array(
+            [lineage_type_codes[v[3]] for v in column_links], dtype=np.int8
+        ).reshape(-1)[column_order]
+
+    @classmethod
+    def load(cls, workspace_id: str) -> "WorkspaceLineageGraph":
+        asset_links = AssetLink.objects.filter(workspace_id=workspace_id).values_list(
+            "id", "source_id", "target_id"
+        )
+        column_links = ColumnLink.objects.filter(workspace_id=workspace_id).values_list(
+            "id", "source__asset_id", "target__asset_id", "lineage_type"
+        )
+        return cls(list(asset_links), list(column_links))
+
+    def _traverse(self, asset_idx: int, depth: int, reverse: bool) -> set[int]:
+        indptr, indices = (
+            (self.predecessor_indptr, self.predecessor_indices)
+            if reverse
+            else (self.successor_indptr, self.successor_indices)
+        )
+        visited = {asset_idx}
+        frontier = [asset_idx]
+        for _ in range(depth):
+            next_frontier = []
+            for node in frontier:
+                for neighbor in indices[indptr[node] : indptr[node + 1]].tolist():
+                    if neighbor not in visited:
+                        visited.add(neighbor)
+                        next_frontier.append(neighbor)
+            if not next_frontier:
+                break
+            frontier = next_frontier
+        return visited
+
+    def relatives(
+        self, asset_id: str, predecessor_depth: int = 1, successor_depth: int = 1
+    ) -> list[str]:
+        if asset_id not in self.asset_index:
+            return []
+        asset_idx = self.asset_index[asset_id]
+        indices = self._traverse(asset_idx, predecessor_depth, reverse=True)
+        indices |= self._traverse(asset_idx, successor_depth, reverse=False)
+        indices.discard(asset_idx)
+        return [self.asset_ids[i] for i in indices]
+
+    def asset_link_ids_between(self, asset_ids: list[str]) -> list[str]:
+        mask = np.zeros(len(self.asset_index), dtype=bool)
+        mask[[self.asset_index[a] for a in asset_ids if a in self.asset_index]] = True
+        selected = mask[self.asset_links_source] & mask[self.asset_links_target]
+        return self.asset_link_ids[selected].tolist()
+
+    def column_link_ids_between(
+        self, asset_ids: list[str], lineage_type: str | None
+    ) -> list[str]:
+        indices = [self.asset_index[a] for a in asset_ids if a in self.asset_index]
+        mask = np.zeros(len(self.asset_index), dtype=bool)
+        mask[indices] = True
+        allowed_types = [0, self.LINEAGE_TYPES.index(lineage_type)]
+        out = []
+        for i in indices:
+            start, end = self.column_indptr[i], self.column_indptr[i + 1]
+            selected = mask[self.column_source_assets[start:end]] & np.isin(
+                self.column_lineage_types[start:end], allowed_types
+            )
+            out.extend(self.column_link_ids[start:end][selected].tolist())
+        return out
+
+
 class LineageService:
     def __init__(self, workspace_id: str):
         self.workspace_id = workspace_id
@@ -46,12 +193,82 @@ class LineageService:
             return False
         return True
 
+    @classmethod
+    def _get_graph_version_key(cls, workspace_id: str) -> str:
+        return f"lineage_graph_version_{workspace_id}"
+
+    @classmethod
+    def invalidate(cls, workspace_id: str):
+        # the version is shared through the django cache so every process rebuilds its copy
+        cache.set(cls._get_graph_version_key(str(workspace_id)), uuid.uuid4().hex, None)
+
+    def get_graph(self) -> WorkspaceLineageGraph:
+        workspace_id = str(self.workspace_id)
+        key = self._get_graph_version_key(workspace_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+
+        with _CACHE_LOCK:
+            workspace_lock = _WORKSPACE_LOCKS.setdefault(workspace_id, threading.Lock())
+        with workspace_lock:
+            with _CACHE_LOCK:
+                cached = _CACHE.get(workspace_id)
+                if cached is not None and cached[0] == version:
+                    _CACHE.move_to_end(workspace_id)
+                    return cached[1]
+            graph = WorkspaceLineageGraph.load(workspace_id)
+            with _CACHE_LOCK:
+                _CACHE[workspace_id] = (version, graph)
+                _CACHE.move_to_end(workspace_id)
+                while len(_CACHE) > LINEAGE_GRAPH_CACHE_SIZE:
+                    _CACHE.popitem(last=False)
+            return graph
+
     def get_lineage(
         self,
         asset_id: str,
         predecessor_depth: int = 1,
         successor_depth: int = 1,
         lineage_type: ColumnLink.LineageType = ColumnLink.LineageType.ALL,
+    ) -> Lineage:
+        if not LINEAGE_GRAPH_CACHE_ENABLED:
+            return self.get_lineage_from_db(
+                asset_id, predecessor_depth, successor_depth, lineage_type
+            )
+
+        graph = self.get_graph()
+        relatives = set(graph.relatives(asset_id, predecessor_depth, successor_depth))
+        relatives.add(asset_id)
+        assets_to_filter = list(relatives)
+        assets = Asset.objects.filter(
+            id__in=assets_to_filter, workspace_id=self.workspace_id
+        )
+        asset_links = AssetLink.objects.filter(
+            id__in=graph.asset_link_ids_between(assets_to_filter)
+        )
+        columns = Column.objects.filter(
+            asset_id__in=assets_to_filter, workspace_id=self.workspace_id
+        )
+        column_links = ColumnLink.objects.filter(
+            id__in=graph.column_link_ids_between(assets_to_filter, lineage_type)
+        )
+
+        return Lineage(
+            asset_id=asset_id,
+            assets=assets,
+            asset_links=asset_links,
+            columns=columns,
+            column_links=column_links,
+        )
+
+    def get_lineage_from_db(
+        self,
+        asset_id: str,
+        predecessor_depth: int = 1,
+        successor_depth: int = 1,
+        lineage_type: ColumnLink.LineageType = ColumnLink.LineageType.ALL,
     ) -> Lineage:
         # convert asset_id to string because networkx node link data does not support UUID
         workspace_id = str(self.workspace_id)
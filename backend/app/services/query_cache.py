@@ -0,0 +1,99 @@
+import hashlib
+import os
+import time
+from typing import Any
+
+from django.core.cache import caches
+
+from app.utils.task_logs import get_redis_client
+
+cache = caches["default"]
+
+PREVIEW_CACHE_ENABLED = os.getenv("DBT_PREVIEW_CACHE", "true") == "true"
+PREVIEW_RESULT_CACHE_TTL = int(os.getenv("DBT_PREVIEW_RESULT_CACHE_TTL", 5 * 60))
+PREVIEW_RESULT_CACHE_SIZE = int(os.getenv("DBT_PREVIEW_RESULT_CACHE_SIZE", 1000))
+# results larger than this are recomputed rather than kept around
+PREVIEW_RESULT_CACHE_MAX_ROWS = int(
+    os.getenv("DBT_PREVIEW_RESULT_CACHE_MAX_ROWS", 50000)
+)
+COMPILED_SQL_CACHE_TTL = int(os.getenv("DBT_COMPILED_SQL_CACHE_TTL", 24 * 60 * 60))
+COMPILED_SQL_CACHE_SIZE = int(os.getenv("DBT_COMPILED_SQL_CACHE_SIZE", 5000))
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class BoundedCache:
+    """
+    Namespace in the django cache that holds at most `max_entries` keys. Keys are indexed in a redis sorted set scored by write time, and the oldest are evicted once it is full. The index is updated in a single transaction, so concurrent writers can't lose entries or exceed the bound.
+    """
+
+    def __init__(self, prefix: str, ttl: int, max_entries: int):
+        self.prefix = prefix
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.index_key = f"{prefix}:index"
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    def get(self, key: str) -> Any | None:
+        return cache.get(self._key(key))
+
+    def set(self, key: str, value: Any):
+        full_key = self._key(key)
+        cache.set(full_key, value, self.ttl)
+        now = time.time()
+        pipe = get_redis_client().pipeline()
+        pipe.zadd(self.index_key, {full_key: now})
+        # entries older than the ttl have already expired from the cache
+        pipe.zremrangebyscore(self.index_key, "-inf", now - self.ttl)
+        pipe.zrange(self.index_key, 0, -self.max_entries - 1)
+        pipe.zremrangebyrank(self.index_key, 0, -self.max_entries - 1)
+        pipe.expire(self.index_key, self.ttl)
+        evicted = pipe.execute()[2]
+        if evicted:
+            cache.delete_many([k.decode() for k in evicted])
+
+    def clear(self):
+        client = get_redis_client()
+        keys = client.zrange(self.index_key, 0, -1)
+        cache.delete_many([k.decode() for k in keys])
+        client.delete(self.index_key)
+
+
+compiled_sql_cache = BoundedCache(
+    "dbt_compiled_sql", COMPILED_SQL_CACHE_TTL, COMPILED_SQL_CACHE_SIZE
+)
+preview_result_cache = BoundedCache(
+    "dbt_preview_result", PREVIEW_RESULT_CACHE_TTL, PREVIEW_RESULT_CACHE_SIZE
+)
+
+
+def get_compiled_sql_key(
+    dbtresource_id: str,
+    project_id: str | None,
+    dbt_sql: str,
+    fingerprint: str,
+    use_fast_compile: bool,
+    limit: int | None,
+) -> str:
+    # the fingerprint covers every file dbt parses, so it stands in for the manifest version
+    # compiling through dbt bakes the limit into the sql, so it is part of the key too
+    return ":".join(
+        [
+            str(dbtresource_id),
+            str(project_id),
+            hash_text(dbt_sql),
+            fingerprint,
+            "fast" if use_fast_compile else "dbt",
+            str(limit),
+        ]
+    )
+
+
+def get_preview_result_key(
+    resource_id: str, sql: str, limit: int | None, result_format: str
+) -> str:
+    return ":".join([str(resource_id), hash_text(sql), str(limit), result_format])
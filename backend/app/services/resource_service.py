@@ -32,6 +32,7 @@ from app.models.resources import (
     TableauDetails,
 )
 from app.models.workflows import MetadataSyncWorkflow
+from app.services.lineage_service import LineageService
 
 
 class CreateResourceSerializer(serializers.Serializer):
@@ -308,7 +309,10 @@ class ResourceService:
         if resource is None:
             raise ValidationError("Resource not found.")
 
+        # the resource's links are deleted with it
+        workspace_id = self.workspace.id
         resource.delete()
+        transaction.on_commit(lambda: LineageService.invalidate(workspace_id))
 
     def test_resource(self, resource_id: int):
         resource = Resource.objects.get(id=resource_id, workspace=self.workspace)
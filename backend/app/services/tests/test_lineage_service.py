@@ -1,4 +1,5 @@
 from app.services.lineage_service import LineageService
+from app.services.resource_service import ResourceService
 
 
 def test_get_asset_lineage(prepopulated_dev_db):
@@ -11,3 +12,32 @@ def test_get_asset_lineage(prepopulated_dev_db):
     assert len(out.asset_links) > 0
     assert len(out.columns) > 0
     assert len(out.column_links) > 0
+
+
+def test_cached_lineage_matches_db_lineage(prepopulated_dev_db):
+    asset_id = "0:urn:li:dataset:(urn:li:dataPlatform:postgres,mydb.dbt_sl_test.raw_items,PROD)"
+    service = LineageService(prepopulated_dev_db[0].workspace.id)
+    for depth in range(1, 4):
+        cached = service.get_lineage(asset_id, depth, depth)
+        uncached = service.get_lineage_from_db(asset_id, depth, depth)
+        assert {v.id for v in cached.assets} == {v.id for v in uncached.assets}
+        assert {v.id for v in cached.asset_links} == {
+            v.id for v in uncached.asset_links
+        }
+        assert {v.id for v in cached.columns} == {v.id for v in uncached.columns}
+        assert {v.id for v in cached.column_links} == {
+            v.id for v in uncached.column_links
+        }
+
+
+def test_cached_lineage_rebuilt_after_resource_delete(
+    prepopulated_dev_db, django_capture_on_commit_callbacks
+):
+    asset_id = "0:urn:li:dataset:(urn:li:dataPlatform:postgres,mydb.dbt_sl_test.raw_items,PROD)"
+    resource = prepopulated_dev_db[1]
+    service = LineageService(resource.workspace.id)
+    assert len(service.get_graph().relatives(asset_id)) > 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ResourceService(resource.workspace).delete_resource(resource.id)
+    assert service.get_graph().relatives(asset_id) == []
@@ -50,6 +50,39 @@ def send_status_update(task_id, state, task_kwargs):
         print("Error sending status update")
 
 
+def send_query_page_ready(task_id, workspace_id, page_info: dict):
+    channel_layer = get_channel_layer()
+    try:
+        async_to_sync(channel_layer.group_send)(
+            f"workspace_{workspace_id}",
+            {
+                "type": "query_page_ready",
+                "task_id": str(task_id),
+                **page_info,
+            },
+        )
+    except Exception as e:
+        print(e)
+        print("Error sending query page update")
+
+
+def send_task_log(task_id, workspace_id, offset: str, data: str):
+    channel_layer = get_channel_layer()
+    try:
+        async_to_sync(channel_layer.group_send)(
+            f"workspace_{workspace_id}",
+            {
+                "type": "task_log",
+                "task_id": str(task_id),
+                "offset": offset,
+                "data": data,
+            },
+        )
+    except Exception as e:
+        print(e)
+        print("Error sending task log")
+
+
 SIGNAL_STATE_MAP = {
     "task_prerun": states.STARTED,
     "task_success": states.SUCCESS,
@@ -1,30 +1,118 @@
-import pgbulk
-from django.db.models import Model
-from django.utils import timezone
+import uuid
+
+from django.db import connection, transaction
+from django.db.models import Model, QuerySet
+from django.db.models.expressions import RawSQL
 
 from app.models import Resource
 
 
-def get_pg_instance_ids(model_type: Model, resource: Resource):
-    ## This function is used to get the primary keys of instances of a model that are associated with a resource.
-    ## Some instances are associated with multiple resources, `inclusive` includes these where `exclusive`` excludes these.
-    out = []
-    if not hasattr(model_type, "get_for_resource"):
-        raise ValueError(
-            f"Model {model_type.__name__} must have a get_for_resource method to use the `delete_and_upsert` function"
+def _qn(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+
+class StagingTable:
+    """
+    Temporary copy of a model's table, filled with COPY. Used to diff new instances against the existing table with set operations inside postgres. When an instance is staged more than once, the last copy wins.
+    """
+
+    ordinal_column = "_stage_ordinal"
+
+    def __init__(self, model_type: type[Model]):
+        self.model_type = model_type
+        self.name = f"stage_{model_type._meta.db_table}_{uuid.uuid4().hex[:8]}"
+        self.fields = model_type._meta.concrete_fields
+        self.pk_column = model_type._meta.pk.column
+
+    @property
+    def table(self) -> str:
+        return _qn(self.model_type._meta.db_table)
+
+    @property
+    def columns(self) -> list[str]:
+        return [_qn(f.column) for f in self.fields]
+
+    @property
+    def content_columns(self) -> list[str]:
+        # columns that determine whether an existing row needs to be updated
+        return [
+            _qn(f.column)
+            for f in self.fields
+            if not f.primary_key and f.name not in ("created_at", "updated_at")
+        ]
+
+    @property
+    def has_updated_at(self) -> bool:
+        return any(f.name == "updated_at" for f in self.fields)
+
+    def create(self, cursor, instances: list[Model]):
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {_qn(self.name)} (LIKE {self.table} INCLUDING DEFAULTS, {_qn(self.ordinal_column)} BIGSERIAL) ON COMMIT DROP"
+        )
+        with cursor.copy(
+            f"COPY {_qn(self.name)} ({', '.join(self.columns)}) FROM STDIN"
+        ) as copy:
+            for instance in instances:
+                copy.write_row(
+                    [
+                        f.get_db_prep_save(f.pre_save(instance, add=True), connection)
+                        for f in self.fields
+                    ]
+                )
+
+    def drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {_qn(self.name)}")
+
+    def pks_sql(self) -> RawSQL:
+        return RawSQL(f"SELECT {_qn(self.pk_column)} FROM {_qn(self.name)}", [])
+
+    def latest_sql(self) -> str:
+        # the ordinal follows COPY order, so the last staged copy of each pk is kept
+        pk = _qn(self.pk_column)
+        return f"""(
+    SELECT DISTINCT ON ({pk}) * FROM {_qn(self.name)}
+    ORDER BY {pk}, {_qn(self.ordinal_column)} DESC
+)"""
+
+    def insert_new(self, cursor) -> int:
+        pk = _qn(self.pk_column)
+        cursor.execute(
+            f"""
+INSERT INTO {self.table} ({", ".join(self.columns)})
+SELECT {", ".join(f"s.{c}" for c in self.columns)}
+FROM {self.latest_sql()} AS s
+WHERE NOT EXISTS (SELECT 1 FROM {self.table} AS t WHERE t.{pk} = s.{pk})
+"""
+        )
+        return cursor.rowcount
+
+    def update_changed(self, cursor, scope: QuerySet | None = None) -> int:
+        """
+        Updates existing rows whose contents differ from their staged copy. If `scope` is given, only rows whose pk it returns are updated, so staged rows that exist outside of it are left untouched.
+        """
+        content_columns = self.content_columns
+        if len(content_columns) == 0:
+            return 0
+        pk = _qn(self.pk_column)
+        set_columns = list(content_columns)
+        if self.has_updated_at:
+            set_columns.append(_qn("updated_at"))
+        scope_sql, scope_params = "", None
+        if scope is not None:
+            sql, scope_params = scope.values_list("pk").query.sql_with_params()
+            scope_sql = f"\n    AND t.{pk} IN ({sql})"
+        cursor.execute(
+            f"""
+UPDATE {self.table} AS t
+SET {", ".join(f"{c} = s.{c}" for c in set_columns)}
+FROM {self.latest_sql()} AS s
+WHERE t.{pk} = s.{pk}
+    AND md5(ROW({", ".join(f"t.{c}" for c in content_columns)})::text)
+        <> md5(ROW({", ".join(f"s.{c}" for c in content_columns)})::text){scope_sql}
+""",
+            scope_params,
         )
-    instances_ls = (
-        model_type.get_for_resource(resource.id),
-        model_type.get_for_resource(resource.id, inclusive=False),
-    )
-    pk_name = model_type._meta.pk.name
-    for instances in instances_ls:
-        if instances.exists():
-            out_it = [str(v) for v in instances.values_list(pk_name, flat=True)]
-        else:
-            out_it = []
-        out.append(out_it)
-    return out
+        return cursor.rowcount
 
 
 def pg_delete_and_upsert(
@@ -42,56 +130,42 @@ def pg_delete_and_upsert(
     model_types = set([type(i) for i in instances])
     if len(model_types) > 1:
         raise ValueError("All instances must be of the same model type")
+    model_type = model_types.pop()
+    if not hasattr(model_type, "get_for_resource"):
+        raise ValueError(
+            f"Model {model_type.__name__} must have a get_for_resource method to use the `delete_and_upsert` function"
+        )
 
     # adjust urns
     instances = [i.adjust_urns() for i in instances]
     if indirect_instances is not None:
         indirect_instances = [i.adjust_urns() for i in indirect_instances]
 
-    # delete instances that are no longer in the new list
-    model_type = model_types.pop()
-    pk_name = model_type._meta.pk.name
-    cur_ids_inclusive, cur_ids_exclusive = get_pg_instance_ids(model_type, resource)
-    new_primary_keys = [str(getattr(i, pk_name)) for i in instances]
-    to_delete = list(set(cur_ids_exclusive) - set(new_primary_keys))
-    base_delete = model_type.objects.filter(id__in=to_delete)
-    model_field_names = [f.name for f in model_type._meta.get_fields()]
-    if "is_indirect" in model_field_names:
-        # only delete direct instances for now, indirect deletion handled later. This is required to ensure cross-resource connections are maintained.
-        base_delete = base_delete.filter(is_indirect=False)
-    base_delete.delete()
-
-    # upsert the new instances
-    new_instances = []
-    update_instances = []
-    for i in instances:
-        if str(i.id) not in cur_ids_inclusive:
-            new_instances.append(i)
-        else:
-            i.updated_at = timezone.now()
-            update_instances.append(i)
-    pgbulk.copy(
-        model_type,
-        new_instances,
-    )
-    pgbulk.update(
-        model_type,
-        update_instances,
-        ignore_unchanged=True,
-    )
-
-    # insert the indirect instances if they don't exist.
-    ## This functionality is necessary because links can exist across resources, and if the underyling nodes are not present, the link creation will raise a FK error.
-    ## That said, we don't want to add these temporary nodes if the true nodes already exist in the graph.
-    if indirect_instances is not None:
-        cur_ids = [
-            str(id) for id in model_type.objects.all().values_list(pk_name, flat=True)
-        ]
-        new_indirect_instances = [
-            i.adjust_urns() for i in indirect_instances if str(i.id) not in cur_ids
-        ]
+    ## Instances are staged in a temp table so the insert, update and delete sets are computed with joins in postgres rather than python list membership checks.
+    with transaction.atomic(), connection.cursor() as cursor:
+        staging = StagingTable(model_type)
+        staging.create(cursor, instances)
 
-        pgbulk.copy(
-            model_type,
-            new_indirect_instances,
+        # delete instances that are no longer in the new list. Deletes go through the orm so cascades are still applied.
+        base_delete = model_type.get_for_resource(resource.id, inclusive=False).exclude(
+            pk__in=staging.pks_sql()
         )
+        model_field_names = [f.name for f in model_type._meta.get_fields()]
+        if "is_indirect" in model_field_names:
+            # only delete direct instances for now, indirect deletion handled later. This is required to ensure cross-resource connections are maintained.
+            base_delete = base_delete.filter(is_indirect=False)
+        base_delete.delete()
+
+        # upsert the new instances, only touching rows whose contents changed. As before, only rows already attached to this resource are updated.
+        staging.insert_new(cursor)
+        staging.update_changed(cursor, scope=model_type.get_for_resource(resource.id))
+        staging.drop(cursor)
+
+        # insert the indirect instances if they don't exist.
+        ## This functionality is necessary because links can exist across resources, and if the underyling nodes are not present, the link creation will raise a FK error.
+        ## That said, we don't want to add these temporary nodes if the true nodes already exist in the graph.
+        if indirect_instances:
+            indirect_staging = StagingTable(model_type)
+            indirect_staging.create(cursor, indirect_instances)
+            indirect_staging.insert_new(cursor)
+            indirect_staging.drop(cursor)
@@ -0,0 +1,146 @@
+import fcntl
+import hashlib
+import importlib.metadata
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+
+import duckdb
+
+logger = logging.getLogger(__name__)
+
+DATAHUB_ENV_CACHE_ENABLED = os.getenv("DATAHUB_ENV_CACHE", "true") == "true"
+DATAHUB_ENV_ROOT = os.getenv(
+    "DATAHUB_ENV_ROOT", os.path.join(tempfile.gettempdir(), "datahub_envs")
+)
+DATAHUB_INGEST_MAX_WORKERS = int(os.getenv("DATAHUB_INGEST_MAX_WORKERS", 4))
+
+
+def get_datahub_package(extras: list[str]) -> str:
+    """
+    Returns the acryl-datahub requirement for an ingest with `extras`, pinned to the version locked for the backend. Cached environments are keyed on their requirements, so a version bump builds a new one instead of reusing whatever was resolved first.
+    """
+    package = f"acryl-datahub[{','.join(['datahub-lite', *extras])}]"
+    try:
+        return f"{package}=={importlib.metadata.version('acryl-datahub')}"
+    except importlib.metadata.PackageNotFoundError:
+        return package
+
+
+def get_uvx_command(packages: list[str]) -> list[str]:
+    command = ["uvx", "--no-progress", "--isolated", "--from", packages[0]]
+    for package in packages[1:]:
+        command.extend(["--with", package])
+    command.append("datahub")
+    return command
+
+
+@contextmanager
+def _env_lock(lock_path: str):
+    os.makedirs(DATAHUB_ENV_ROOT, exist_ok=True)
+    with open(lock_path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def get_datahub_command(packages: list[str]) -> list[str]:
+    """
+    Returns the command that runs the datahub cli with `packages` installed. Each set of packages gets its own virtualenv, built once with uv and reused by later ingests instead of resolving a fresh isolated environment on every run.
+
+    Falls back to an isolated `uvx` run if the environment can't be built.
+    """
+    if not DATAHUB_ENV_CACHE_ENABLED:
+        return get_uvx_command(packages)
+
+    key = hashlib.sha256("\n".join(packages).encode()).hexdigest()[:16]
+    env_path = os.path.join(DATAHUB_ENV_ROOT, key)
+    # written last, so a half-built environment is never used
+    ready_path = os.path.join(env_path, ".ready")
+    executable = os.path.join(env_path, "bin", "datahub")
+    if os.path.exists(ready_path):
+        return [executable]
+
+    with _env_lock(f"{env_path}.lock"):
+        if os.path.exists(ready_path):
+            return [executable]
+        shutil.rmtree(env_path, ignore_errors=True)
+        try:
+            subprocess.run(
+                ["uv", "venv", "--quiet", env_path], check=True, capture_output=True
+            )
+            subprocess.run(
+                [
+                    "uv",
+                    "pip",
+                    "install",
+                    "--quiet",
+                    "--python",
+                    os.path.join(env_path, "bin", "python"),
+                    *packages,
+                ],
+                check=True,
+                capture_output=True,
+            )
+        except (OSError, subprocess.CalledProcessError) as e:
+            stderr = getattr(e, "stderr", None) or b""
+            logger.warning(
+                f"Could not build datahub environment for {packages}, using uvx: {e} {stderr.decode(errors='replace')}"
+            )
+            shutil.rmtree(env_path, ignore_errors=True)
+            return get_uvx_command(packages)
+        with open(ready_path, "w"):
+            pass
+    return [executable]
+
+
+def merge_datahub_dbs(db_path: str, part_paths: list[str]):
+    """
+    Merges datahub-lite duckdb files written by separate ingests into `db_path`. Parts are applied in order, so where two ingests emit the same aspect the later one wins, as it would have when both wrote to a single sink.
+    """
+    part_paths = [path for path in part_paths if os.path.exists(path)]
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    if not part_paths:
+        return
+    shutil.copyfile(part_paths[0], db_path)
+
+    con = duckdb.connect(db_path)
+    try:
+        for path in part_paths[1:]:
+            con.execute(f"ATTACH '{path}' AS part (READ_ONLY)")
+            tables = con.execute(
+                "SELECT table_name FROM duckdb_tables() WHERE database_name = 'part'"
+            ).fetchall()
+            existing = {
+                name
+                for (name,) in con.execute(
+                    "SELECT table_name FROM duckdb_tables() WHERE database_name = current_database()"
+                ).fetchall()
+            }
+            for (table,) in tables:
+                if table not in existing:
+                    con.execute(
+                        f'CREATE TABLE "{table}" AS SELECT * FROM part."{table}"'
+                    )
+                    continue
+                keys = con.execute(
+                    "SELECT constraint_column_names FROM duckdb_constraints() WHERE database_name = 'part' AND table_name = ? AND constraint_type = 'PRIMARY KEY'",
+                    [table],
+                ).fetchone()
+                if keys:
+                    condition = " AND ".join(
+                        f'"{table}"."{key}" = p."{key}"' for key in keys[0]
+                    )
+                    con.execute(
+                        f'DELETE FROM "{table}" USING part."{table}" p WHERE {condition}'
+                    )
+                con.execute(f'INSERT INTO "{table}" SELECT * FROM part."{table}"')
+            con.execute("DETACH part")
+    finally:
+        con.close()
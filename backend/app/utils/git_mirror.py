@@ -0,0 +1,126 @@
+import fcntl
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from git import Repo as GitRepo
+
+GIT_MIRROR_ENABLED = os.getenv("GIT_MIRROR_CACHE", "true") == "true"
+GIT_MIRROR_ROOT = os.getenv(
+    "GIT_MIRROR_ROOT", os.path.join(tempfile.gettempdir(), "git_mirrors")
+)
+# mirrors fetched more recently than this are used as is, the clone itself still fetches anything newer
+GIT_MIRROR_FETCH_INTERVAL = int(os.getenv("GIT_MIRROR_FETCH_INTERVAL", 60))
+GIT_MIRROR_TTL = int(os.getenv("GIT_MIRROR_TTL", 7 * 24 * 60 * 60))
+
+
+class GitMirror:
+    """
+    Bare mirror of a repository on local disk, kept current with incremental fetches. Clones borrow its objects with `--reference`, so only objects newer than the mirror come over the network.
+
+    A file lock next to the mirror serializes fetches across workers, while clones only hold it shared so they never read a half-fetched mirror.
+    """
+
+    def __init__(self, repository_id: str, git_repo_url: str):
+        self.git_repo_url = git_repo_url
+        self.path = os.path.join(GIT_MIRROR_ROOT, f"{repository_id}.git")
+        self.lock_path = f"{self.path}.lock"
+        self.used_path = f"{self.path}.used"
+
+    @contextmanager
+    def _lock(self, exclusive: bool, blocking: bool = True):
+        os.makedirs(GIT_MIRROR_ROOT, exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            if not blocking:
+                flags |= fcntl.LOCK_NB
+            fcntl.flock(f, flags)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @property
+    def exists(self) -> bool:
+        return os.path.exists(os.path.join(self.path, "HEAD"))
+
+    def _fetched_recently(self) -> bool:
+        fetch_head = os.path.join(self.path, "FETCH_HEAD")
+        if not os.path.exists(fetch_head):
+            fetch_head = os.path.join(self.path, "HEAD")
+        return time.time() - os.path.getmtime(fetch_head) < GIT_MIRROR_FETCH_INTERVAL
+
+    def update(self, env: dict[str, str] | None = None):
+        with self._lock(exclusive=True):
+            if not self.exists:
+                shutil.rmtree(self.path, ignore_errors=True)
+                repo = GitRepo.clone_from(
+                    self.git_repo_url, self.path, mirror=True, env=env
+                )
+                # clones point at these objects, so they must never be garbage collected
+                with repo.config_writer() as git_config:
+                    git_config.set_value("gc", "auto", "0")
+                    git_config.set_value("gc", "pruneExpire", "never")
+            elif not self._fetched_recently():
+                repo = GitRepo(self.path)
+                repo.git.remote("set-url", "origin", self.git_repo_url)
+                repo.git.fetch("--prune", "origin", env=env)
+            with open(self.used_path, "a"):
+                os.utime(self.used_path)
+
+    def clone(
+        self, path: str, env: dict[str, str] | None = None, dissociate: bool = False
+    ) -> GitRepo:
+        """
+        Clones from the remote using the mirror as a reference. Long-lived clones should `dissociate` so they copy the borrowed objects and stay valid once the mirror is cleaned up.
+        """
+        self.update(env)
+        with self._lock(exclusive=False):
+            return GitRepo.clone_from(
+                self.git_repo_url,
+                path,
+                env=env,
+                reference=self.path,
+                dissociate=dissociate,
+            )
+
+    @classmethod
+    def cleanup(cls, max_age: int = GIT_MIRROR_TTL):
+        # removes mirrors that no clone has used within `max_age` seconds
+        if not os.path.exists(GIT_MIRROR_ROOT):
+            return
+        now = time.time()
+        for name in os.listdir(GIT_MIRROR_ROOT):
+            if not name.endswith(".git"):
+                continue
+            mirror = cls(name[: -len(".git")], "")
+            if (
+                os.path.exists(mirror.used_path)
+                and now - os.path.getmtime(mirror.used_path) < max_age
+            ):
+                continue
+            try:
+                with mirror._lock(exclusive=True, blocking=False):
+                    shutil.rmtree(mirror.path, ignore_errors=True)
+                    if os.path.exists(mirror.used_path):
+                        os.remove(mirror.used_path)
+            except BlockingIOError:
+                # in use by another worker
+                continue
+
+
+def clone_repository(
+    repository_id: str,
+    git_repo_url: str,
+    path: str,
+    env: dict[str, str] | None = None,
+    dissociate: bool = False,
+) -> GitRepo:
+    if not GIT_MIRROR_ENABLED:
+        return GitRepo.clone_from(git_repo_url, path, env=env)
+    mirror = GitMirror(str(repository_id), git_repo_url)
+    if not mirror.exists:
+        GitMirror.cleanup()
+    return mirror.clone(path, env=env, dissociate=dissociate)
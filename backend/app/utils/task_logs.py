@@ -0,0 +1,62 @@
+from functools import cache
+
+import redis
+from django.conf import settings
+
+START_OFFSET = "0-0"
+
+
+@cache
+def get_redis_client() -> redis.Redis:
+    return redis.Redis.from_url(settings.TASK_LOG_REDIS_URL)
+
+
+def parse_offset(offset: str) -> tuple[int, int]:
+    # stream ids are "<ms>-<seq>" and only compare correctly as integers
+    ms, _, seq = offset.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class TaskLog:
+    """
+    Append-only log of a task's output, stored as a redis stream of chunks. Each chunk's stream id is its offset, so readers can resume from the last chunk they saw instead of re-reading the whole log.
+    """
+
+    def __init__(self, task_id: str, workspace_id: str | None = None):
+        self.task_id = str(task_id)
+        self.workspace_id = None if workspace_id is None else str(workspace_id)
+        self.key = f"task_log:{self.task_id}"
+        self.workspace_key = f"{self.key}:workspace"
+
+    @property
+    def client(self) -> redis.Redis:
+        return get_redis_client()
+
+    def append(self, data: str) -> str:
+        pipe = self.client.pipeline()
+        pipe.xadd(self.key, {"data": data})
+        pipe.expire(self.key, settings.TASK_LOG_TTL)
+        if self.workspace_id is not None:
+            pipe.set(self.workspace_key, self.workspace_id, ex=settings.TASK_LOG_TTL)
+        offset = pipe.execute()[0]
+        return offset.decode()
+
+    def get_workspace_id(self) -> str | None:
+        # the workspace the log was written for, used to keep other workspaces from reading it
+        workspace_id = self.client.get(self.workspace_key)
+        return workspace_id.decode() if workspace_id is not None else None
+
+    def read(
+        self, after: str = START_OFFSET, count: int | None = None
+    ) -> list[tuple[str, str]]:
+        # "(" makes the range exclusive of the offset the reader already has
+        entries = self.client.xrange(self.key, min=f"({after}", max="+", count=count)
+        return [
+            (offset.decode(), fields[b"data"].decode()) for offset, fields in entries
+        ]
+
+    def read_all(self) -> str:
+        return "".join(data for _, data in self.read())
+
+    def delete(self):
+        self.client.delete(self.key, self.workspace_key)
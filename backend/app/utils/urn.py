@@ -12,3 +12,10 @@ class UrnAdjuster:
             return urn
 
         return f"{self.workspace_id}{self.JOIN_KEY}{urn}"
+
+    def unadjust(self, urn: str):
+        prefix = f"{self.workspace_id}{self.JOIN_KEY}"
+        if urn.startswith(prefix):
+            return urn[len(prefix) :]
+
+        return urn
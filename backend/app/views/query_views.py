@@ -1,10 +1,11 @@
 from adrf.views import APIView
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from rest_framework import serializers, status
 from rest_framework.response import Response
 from sqlfmt.api import Mode, format_string
 from sqlfmt.exception import SqlfmtError
 
+from app.models.query import DBTQuery, Query, ResultFormat, query_to_json
 from app.workflows.query import execute_query, validate_query
 
 
@@ -22,8 +23,13 @@ def make_signed_url_response(result):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
+    response = {"signed_url": signed_url}
+    if result.get("result_format", ResultFormat.JSON) != ResultFormat.JSON:
+        for key in ["query_id", "result_format", "num_rows", "column_types", "pages"]:
+            response[key] = result.get(key)
+
     return JsonResponse(
-        {"signed_url": signed_url},
+        response,
         status=status.HTTP_201_CREATED,
     )
 
@@ -31,6 +37,9 @@ def make_signed_url_response(result):
 class QueryPreviewInputSerializer(serializers.Serializer):
     query = serializers.CharField(required=True)
     limit = serializers.IntegerField(required=False, default=1000)
+    result_format = serializers.ChoiceField(
+        choices=ResultFormat.choices, required=False, default=None
+    )
 
 
 class QueryPreviewView(APIView):
@@ -47,6 +56,7 @@ class QueryPreviewView(APIView):
                 resource_id=str(dbt_resource.resource.id),
                 sql=serializer.validated_data.get("query"),
                 limit=serializer.validated_data.get("limit"),
+                result_format=serializer.validated_data.get("result_format"),
             )
             .apply_async()
             .get()
@@ -83,6 +93,9 @@ class DbtQueryPreviewInputSerializer(serializers.Serializer):
     use_fast_compile = serializers.BooleanField(required=False, default=True)
     project_id = serializers.CharField(required=True)
     limit = serializers.IntegerField(required=False, default=1000)
+    result_format = serializers.ChoiceField(
+        choices=ResultFormat.choices, required=False, default=None
+    )
 
 
 class DbtQueryPreviewView(APIView):
@@ -125,6 +138,7 @@ class DbtQueryPreviewView(APIView):
                         resource_id=str(dbt_resource.resource.id),
                         sql=sql,
                         limit=serializer.validated_data.get("limit"),
+                        result_format=serializer.validated_data.get("result_format"),
                     )
                     .apply_async()
                     .get()
@@ -177,6 +191,44 @@ class DbtQueryValidateView(APIView):
         return JsonResponse(result)
 
 
+class QueryResultPageView(APIView):
+    def get(self, request, query_id, page):
+        workspace = request.user.current_workspace()
+        # sql and dbt previews store their results the same way
+        query = (
+            Query.objects.filter(id=query_id, workspace=workspace).first()
+            or DBTQuery.objects.filter(id=query_id, workspace=workspace).first()
+        )
+        if query is None:
+            return Response(
+                {"error": "query not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        if query.result_format == ResultFormat.JSON:
+            return Response(
+                {"error": "paging is not available for json results"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if page < 0 or page >= query.num_pages:
+            return Response(
+                {"error": "page out of range"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # arrow pages are standalone ipc streams, so they can be served as is
+        if (
+            request.query_params.get("format") == ResultFormat.ARROW
+            and query.result_format == ResultFormat.ARROW
+        ):
+            return HttpResponse(
+                query.read_page_bytes(page),
+                content_type="application/vnd.apache.arrow.stream",
+            )
+
+        return HttpResponse(
+            query_to_json(query.read_page(page), query.result_metadata["column_types"]),
+            content_type="application/json",
+        )
+
+
 def format_query(query):
     mode = Mode()
     return format_string(query, mode)
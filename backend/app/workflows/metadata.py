@@ -1,4 +1,8 @@
+import os
 import tempfile
+import time
+
+from celery import states
 
 from app.core.e2e import DataHubDBParser
 from app.models import Resource
@@ -33,20 +37,60 @@ def ingest_metadata(
     )
 
 
+def _use_incremental_sync(incremental: bool | None) -> bool:
+    if incremental is None:
+        return os.getenv("INCREMENTAL_METADATA_SYNC") == "true"
+    return incremental
+
+
 @task
-def process_metadata(self, workspace_id: str, resource_id: str):
+def process_metadata(
+    self, workspace_id: str, resource_id: str, incremental: bool | None = None
+):
     resource = Resource.objects.get(id=resource_id)
+    previous_fingerprints = (
+        resource.metadata_fingerprints if _use_incremental_sync(incremental) else None
+    )
     with resource.datahub_db.open("rb") as f:
         with tempfile.NamedTemporaryFile("wb", delete=False, suffix=".duckdb") as f2:
             f2.write(f.read())
             parser = DataHubDBParser(resource, f2.name)
-            parser.parse()
+            parser.parse(previous_fingerprints=previous_fingerprints)
 
     DataHubDBParser.combine_and_upload([parser], resource)
 
+    # only persist fingerprints once the upload succeeded so a failed sync is fully redone
+    resource.metadata_fingerprints = parser.fingerprints or None
+    resource.save(update_fields=["metadata_fingerprints"])
+
 
 @task
-def sync_metadata(self, workspace_id: str, resource_id: str):
+def cleanup_indirect_instances(self, workspace_id: str, resource_id: str):
+    # runs outside of the upload transaction, so long cleanups don't hold locks on the metadata tables
+    start = time.time()
+    num_deleted = {"asset": 0, "column": 0}
+
+    def report_progress(type: str, deleted: int):
+        num_deleted[type] = deleted
+        if self.request.id is None:
+            return
+        self.update_state(
+            state=states.STARTED,
+            meta={"deleted": num_deleted, "elapsed": time.time() - start},
+        )
+
+    for type in ["asset", "column"]:
+        DataHubDBParser.delete_unused_indirect_instances(
+            type, workspace_id, progress_callback=report_progress
+        )
+
+    return {"deleted": num_deleted, "elapsed": time.time() - start}
+
+
+@task
+def sync_metadata(
+    self, workspace_id: str, resource_id: str, incremental: bool | None = None
+):
     # check if artifacts exist and were produced by orchestration run
     standard_kwargs = {
         "workspace_id": workspace_id,
@@ -55,6 +99,7 @@ def sync_metadata(self, workspace_id: str, resource_id: str):
     tasks = [
         prepare_dbt_repos.si(**standard_kwargs),
         ingest_metadata.si(**standard_kwargs, parent_task_id=self.request.id),
-        process_metadata.si(**standard_kwargs),
+        process_metadata.si(**standard_kwargs, incremental=incremental),
+        cleanup_indirect_instances.si(**standard_kwargs),
     ]
     return self.run_subtasks(*tasks)
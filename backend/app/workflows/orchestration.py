@@ -10,8 +10,10 @@ from celery import states
 from git import Repo as GitRepo
 
 from app.models.resources import DBTResource
+from app.signals import send_task_log
+from app.utils.task_logs import TaskLog
 from app.workflows.utils import task
-from vinyl.lib.dbt import STREAM_ERROR_STRING, STREAM_SUCCESS_STRING
+from vinyl.lib.dbt import STREAM_ERROR_STRING, STREAM_SUCCESS_STRING, DBTProject
 from vinyl.lib.utils.files import load_orjson
 
 STREAM_BUFFER_INTERVAL = 1.0
@@ -41,6 +43,39 @@ def get_run_results(dbtproj):
     return {}
 
 
+def merge_run_results(run_results: list[dict]) -> dict:
+    # combines the run results of commands that ran separately into one artifact
+    run_results = [r for r in run_results if r]
+    if not run_results:
+        return {}
+    merged = {**run_results[-1], "results": []}
+    for r in run_results:
+        merged["results"].extend(r.get("results", []))
+    merged["elapsed_time"] = sum(r.get("elapsed_time", 0) for r in run_results)
+    return merged
+
+
+def get_command_waves(dependencies: list[list[int]]) -> list[list[int]]:
+    """
+    Groups command indices into waves that can run concurrently, where every command runs after the wave containing its last dependency.
+    """
+    remaining = {i: set(deps) for i, deps in enumerate(dependencies)}
+    for i, deps in remaining.items():
+        if i in deps or any(d not in remaining for d in deps):
+            raise ValueError(f"Invalid dependencies for command {i}")
+    waves = []
+    done = set()
+    while remaining:
+        wave = sorted(i for i, deps in remaining.items() if deps <= done)
+        if not wave:
+            raise ValueError("Command dependencies contain a cycle")
+        waves.append(wave)
+        done.update(wave)
+        for i in wave:
+            del remaining[i]
+    return waves
+
+
 def export_run_results_from_outputs(
     outs: list[dict], dbt_resource: Any, repo: str | None = None
 ) -> None:
@@ -65,6 +100,7 @@ def run_dbt_command(
     save_artifacts: bool = True,
     stream: bool = False,
     buffer_interval: float = STREAM_BUFFER_INTERVAL,
+    target_name: str | None = None,
 ):
     repo_override = (
         GitRepo(repo_override_dir) if os.path.exists(repo_override_dir) else None
@@ -76,6 +112,10 @@ def run_dbt_command(
     with dbt_resource.dbt_repo_context(
         project_id=project_id, isolate=True, repo_override=repo_override
     ) as (dbtproj, project_dir, _):
+        if target_name is not None:
+            # commands running concurrently in the same checkout each get their own target
+            dbtproj.target_path = os.path.join(dbtproj.dbt_project_dir, target_name)
+            dbtproj.generate_target_paths()
         success = None
         stdout = ""
         stderr = ""
@@ -84,8 +124,23 @@ def run_dbt_command(
             split_command.pop(0)
 
         if stream:
+            # each interval's new output is appended to the task log, so clients can resume from an offset
+            task_log = TaskLog(self.request.id, workspace_id=workspace_id)
+            stdouts = []
+            buffer = []
             last_update = time.time()
 
+            def flush():
+                data = "".join(buffer)
+                buffer.clear()
+                offset = task_log.append(data)
+                send_task_log(self.request.id, workspace_id, offset, data)
+                # the output itself is only kept in the task log, so each update stays small
+                self.update_state(
+                    state=states.STARTED,
+                    meta={"success": success, "log_offset": offset},
+                )
+
             for line in dbtproj.stream_dbt_command(split_command, write_json=True):
                 if line == STREAM_SUCCESS_STRING:
                     success = True
@@ -94,21 +149,18 @@ def run_dbt_command(
                     success = False
                     break
 
-                stdout += line
+                stdouts.append(line)
+                buffer.append(line)
                 current_time = time.time()
 
                 if current_time - last_update >= buffer_interval:
-                    result = return_helper(
-                        success=success,
-                        stdout=stdout,
-                        stderr=stderr,
-                    )
-                    self.update_state(
-                        state=states.STARTED,
-                        meta=result,
-                    )
+                    flush()
                     last_update = current_time
 
+            if buffer:
+                flush()
+            stdout = "".join(stdouts)
+
             if success is None:
                 raise RuntimeError("Stream ended without success or error signal")
         else:
@@ -122,28 +174,20 @@ def run_dbt_command(
         return return_helper(success, stdout, stderr, run_results)
 
 
-@task
-def save_artifacts_task(
-    self,
+def upload_job_artifacts(
+    dbt_resource: DBTResource,
+    dbtproj: DBTProject,
     workspace_id: str,
-    resource_id: str,
-    dbtresource_id: str,
     parent_task_id: str,
-    project_id: str | None = None,
-    repo_override_dir: str | None = None,
+    run_results: dict | None = None,
 ):
     from app.models.resources import ArtifactSource
     from app.models.workflows import ArtifactType, TaskArtifact
 
-    repo_override = (
-        GitRepo(repo_override_dir) if os.path.exists(repo_override_dir) else None
-    )
-
-    dbt_resource = DBTResource.objects.get(id=dbtresource_id)
     stdout, stderr, success = dbt_resource.upload_artifacts(
         artifact_source=ArtifactSource.ORCHESTRATION,
-        repo_override=repo_override,
         export=True,
+        dbtproj=dbtproj,
     )
     if not success:
         return return_helper(
@@ -152,26 +196,50 @@ def save_artifacts_task(
             "",
             {},
         )
+
+    if run_results:
+        # generating artifacts overwrites the run results of the job itself
+        with open(dbtproj.run_results_path, "wb") as f:
+            f.write(orjson.dumps(run_results))
+
+    # Save a zip of the target directory
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_zip_path = os.path.join(tmp_dir, f"target_{parent_task_id}.zip")
+        shutil.make_archive(tmp_zip_path, "zip", dbtproj.target_path)
+
+        # Create TaskArtifact and save the zip file
+        artifact = TaskArtifact.objects.create(
+            task_id=parent_task_id,
+            workspace_id=workspace_id,
+            artifact_type=ArtifactType.TARGET,
+        )
+        with open(f"{tmp_zip_path}.zip", "rb") as zip_file:
+            artifact.artifact.save(f"target_{parent_task_id}.zip", zip_file)
+
+    return return_helper(True, "uploaded artifacts successfully", "", {})
+
+
+@task
+def save_artifacts_task(
+    self,
+    workspace_id: str,
+    resource_id: str,
+    dbtresource_id: str,
+    parent_task_id: str,
+    project_id: str | None = None,
+    repo_override_dir: str | None = None,
+):
+    repo_override = (
+        GitRepo(repo_override_dir) if os.path.exists(repo_override_dir) else None
+    )
+
+    dbt_resource = DBTResource.objects.get(id=dbtresource_id)
     with dbt_resource.dbt_repo_context(
         project_id=project_id,
         isolate=True,
         repo_override=repo_override,
     ) as (dbtproj, _, _):
-        # Save a zip of the target directory
-        with tempfile.TemporaryDirectory() as tmp_dir:
-            tmp_zip_path = os.path.join(tmp_dir, f"target_{parent_task_id}.zip")
-            shutil.make_archive(tmp_zip_path, "zip", dbtproj.target_path)
-
-            # Create TaskArtifact and save the zip file
-            artifact = TaskArtifact.objects.create(
-                task_id=parent_task_id,
-                workspace_id=workspace_id,
-                artifact_type=ArtifactType.TARGET,
-            )
-            with open(f"{tmp_zip_path}.zip", "rb") as zip_file:
-                artifact.artifact.save(f"target_{parent_task_id}.zip", zip_file)
-
-    return return_helper(True, "uploaded artifacts successfully", "", {})
+        return upload_job_artifacts(dbt_resource, dbtproj, workspace_id, parent_task_id)
 
 
 @task
@@ -183,6 +251,7 @@ def run_dbt_commands(
     commands: list[str],
     project_id: str | None = None,
     save_artifacts=True,
+    dependencies: list[list[int]] | None = None,
 ):
     dbt_resource = DBTResource.objects.get(id=dbtresource_id)
     if not dbt_resource.jobs_allowed:
@@ -195,7 +264,6 @@ def run_dbt_commands(
     ):
         if os.path.exists(dbtproj.target_path):
             shutil.rmtree(dbtproj.target_path)
-        outs = []
         task_kwargs = {
             "workspace_id": workspace_id,
             "resource_id": resource_id,
@@ -203,19 +271,52 @@ def run_dbt_commands(
             "project_id": project_id,
             "repo_override_dir": repo.working_tree_dir,
         }
-        # Create a chain of tasks
-        tasks = [
-            run_dbt_command.si(**task_kwargs, command=command, stream=True)
-            for command in commands
-        ]
+        if dependencies is None:
+            # Create a chain of tasks
+            tasks = [
+                run_dbt_command.si(**task_kwargs, command=command, stream=True)
+                for command in commands
+            ]
+            outs = list(self.run_subtasks(*tasks))
+        else:
+            # independent commands run concurrently, each in its own target directory
+            outs = [None] * len(commands)
+            for wave in get_command_waves(dependencies):
+                tasks = [
+                    run_dbt_command.si(
+                        **task_kwargs,
+                        command=commands[i],
+                        stream=True,
+                        target_name=f"target_{i}",
+                    )
+                    for i in wave
+                ]
+                for i, out in zip(wave, self.run_parallel_subtasks(*tasks)):
+                    outs[i] = out
+
+            # combine the targets of commands that ran on this worker, later commands taking precedence
+            for i in range(len(commands)):
+                command_target_path = os.path.join(
+                    dbtproj.dbt_project_dir, f"target_{i}"
+                )
+                if os.path.exists(command_target_path):
+                    shutil.copytree(
+                        command_target_path, dbtproj.target_path, dirs_exist_ok=True
+                    )
+                    shutil.rmtree(command_target_path)
 
+        run_results = merge_run_results([out["run_results"] for out in outs])
         if save_artifacts:
-            tasks.append(
-                save_artifacts_task.si(**task_kwargs, parent_task_id=self.request.id)
+            outs.append(
+                upload_job_artifacts(
+                    dbt_resource,
+                    dbtproj,
+                    workspace_id,
+                    self.request.id,
+                    run_results=run_results,
+                )
             )
 
-        outs = self.run_subtasks(*tasks)
-
     return returns_helper(outs)
 
 
@@ -1,15 +1,24 @@
+from functools import partial
+
 from app.models.query import DBTQuery, Query
+from app.models.settings import StorageSettings
+from app.services.storage_backends import CustomS3Boto3Storage
+from app.signals import send_query_page_ready
 from app.workflows.utils import task
 from vinyl.lib.utils.query import _QUERY_LIMIT
 
 
 @task
-def execute_query(self, workspace_id, resource_id, sql, limit=None):
+def execute_query(self, workspace_id, resource_id, sql, limit=None, result_format=None):
     limit = _QUERY_LIMIT if limit is None else limit
     query = Query.objects.create(
         sql=sql, resource_id=resource_id, workspace_id=workspace_id
     )
-    return query.run(limit=limit)
+    return query.run(
+        limit=limit,
+        result_format=result_format,
+        on_first_page=partial(send_query_page_ready, self.request.id, workspace_id),
+    )
 
 
 @task
@@ -22,7 +31,13 @@ def validate_query(self, workspace_id, resource_id, sql):
 
 @task
 def execute_dbt_query(
-    self, workspace_id, dbt_resource_id, dbt_sql, limit=None, use_fast_compile=True
+    self,
+    workspace_id,
+    dbt_resource_id,
+    dbt_sql,
+    limit=None,
+    use_fast_compile=True,
+    result_format=None,
 ):
     limit = _QUERY_LIMIT if limit is None else limit
     query = DBTQuery(
@@ -30,4 +45,17 @@ def execute_dbt_query(
         dbt_sql=dbt_sql,
         workspace_id=workspace_id,
     )
-    return query.run(use_fast_compile=use_fast_compile, limit=limit)
+    return query.run(
+        use_fast_compile=use_fast_compile,
+        limit=limit,
+        result_format=result_format,
+        on_first_page=partial(send_query_page_ready, self.request.id, workspace_id),
+    )
+
+
+@task(status_consumer=False)
+def delete_query_file(self, workspace_id, name):
+    CustomS3Boto3Storage(
+        workspace_id=workspace_id,
+        storage_category=StorageSettings.StorageCategories.DATA,
+    ).delete(name)
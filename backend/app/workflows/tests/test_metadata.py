@@ -1,3 +1,4 @@
+import json
 import time
 
 import pytest
@@ -5,11 +6,15 @@ from celery import states
 from django_celery_results.models import TaskResult
 
 from app.models import (
+    AssetError,
+    AssetLink,
+    ColumnLink,
     Resource,
 )
 from app.models.workflows import MetadataSyncWorkflow
 from app.utils.test_utils import assert_ingest_output, require_env_vars
-from app.workflows.metadata import process_metadata
+from app.utils.urn import UrnAdjuster
+from app.workflows.metadata import cleanup_indirect_instances, process_metadata
 
 
 def run_test_sync(
@@ -37,6 +42,9 @@ def run_test_sync(
                 workspace_id=str(resource.workspace_id), resource_id=resource_id_str
             ).apply_async()
             task.get()
+            cleanup_indirect_instances.si(
+                workspace_id=str(resource.workspace_id), resource_id=resource_id_str
+            ).apply_async().get()
             task_id = task.id
             periodic_task_id = None
             task_result = TaskResult.objects.get(task_id=task_id)
@@ -125,3 +133,63 @@ class TestMetadataSync:
             produce_columns=False,
             produce_column_links=False,
         )
+
+    @pytest.mark.xdist_group(name="postgres")
+    def test_metadata_sync_postgres_incremental(self, local_postgres):
+        run_test_sync([local_postgres], recache=False, use_cache=True)
+        local_postgres.refresh_from_db()
+        assert local_postgres.metadata_fingerprints
+        column_link_ids = set(ColumnLink.objects.values_list("id", flat=True))
+
+        # nothing changed, so all column links should be reused from the last sync
+        process_metadata.si(
+            workspace_id=str(local_postgres.workspace_id),
+            resource_id=str(local_postgres.id),
+            incremental=True,
+        ).apply_async().get()
+        assert set(ColumnLink.objects.values_list("id", flat=True)) == column_link_ids
+
+    @pytest.mark.xdist_group(name="postgres")
+    def test_metadata_sync_postgres_incremental_changed_asset(self, local_postgres):
+        run_test_sync([local_postgres], recache=False, use_cache=True)
+        local_postgres.refresh_from_db()
+
+        def get_state():
+            errors = sorted(
+                (asset_id, json.dumps(error, sort_keys=True))
+                for asset_id, error in AssetError.objects.values_list(
+                    "asset_id", "error"
+                )
+            )
+            return set(ColumnLink.objects.values_list("id", flat=True)), errors
+
+        column_link_ids, errors = get_state()
+        changed_id = (
+            ColumnLink.objects.filter(workspace_id=local_postgres.workspace_id)
+            .values_list("source__asset_id", flat=True)
+            .first()
+        )
+        successor_ids = list(
+            AssetLink.objects.filter(source_id=changed_id).values_list(
+                "target_id", flat=True
+            )
+        )
+        assert successor_ids
+
+        # a changed fingerprint marks the asset as changed, and its stored lineage is dropped so only a recompute can restore it
+        fingerprints = local_postgres.metadata_fingerprints
+        fingerprints[UrnAdjuster(local_postgres.workspace_id).unadjust(changed_id)] = (
+            "changed"
+        )
+        local_postgres.save(update_fields=["metadata_fingerprints"])
+        recomputed_ids = [changed_id, *successor_ids]
+        ColumnLink.objects.filter(target__asset_id__in=recomputed_ids).delete()
+        AssetError.objects.filter(asset_id__in=recomputed_ids).delete()
+
+        process_metadata.si(
+            workspace_id=str(local_postgres.workspace_id),
+            resource_id=str(local_postgres.id),
+            incremental=True,
+        ).apply_async().get()
+        # reused errors of unchanged assets are neither duplicated nor re-adjusted
+        assert get_state() == (column_link_ids, errors)
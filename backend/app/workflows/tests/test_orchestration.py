@@ -1,7 +1,30 @@
 import time
 
+import pytest
+
 from app.models.resources import EnvironmentType
 from app.models.workflows import DBTOrchestrator
+from app.workflows.orchestration import get_command_waves, merge_run_results
+
+
+def test_get_command_waves():
+    assert get_command_waves([[], [], [0, 1], [0]]) == [[0, 1], [2, 3]]
+    with pytest.raises(ValueError):
+        get_command_waves([[1], [0]])
+    with pytest.raises(ValueError):
+        get_command_waves([[2]])
+
+
+def test_merge_run_results():
+    merged = merge_run_results(
+        [
+            {"results": [{"unique_id": "a"}], "elapsed_time": 1},
+            {},
+            {"results": [{"unique_id": "b"}], "elapsed_time": 2},
+        ]
+    )
+    assert [r["unique_id"] for r in merged["results"]] == ["a", "b"]
+    assert merged["elapsed_time"] == 3
 
 
 def test_orchestration(custom_celery, local_postgres):
@@ -31,3 +54,27 @@ def test_orchestration(custom_celery, local_postgres):
     assert dbtresource.catalog
     # ensure the workflow is marked completed (used by the UI)
     assert workflow.most_recent(successes_only=True)[0]
+
+
+def test_orchestration_with_dependencies(custom_celery, local_postgres):
+    resource = local_postgres
+    dbtresource = resource.dbtresource_set.filter(
+        environment=EnvironmentType.PROD
+    ).first()
+
+    # ensure the resource is ready
+    time.sleep(1)
+
+    resource.refresh_from_db()
+    workflow = DBTOrchestrator(
+        workspace=resource.workspace,
+        dbtresource=dbtresource,
+        commands=["ls", "compile", "run"],
+        dependencies=[[], [], [0, 1]],
+        save_artifacts=True,
+    ).schedule_now()
+    result, _ = workflow.await_next_result()
+    assert result["success"]
+    assert all(result["stdouts"])
+    assert not any(result["stderrs"])
+    assert result["run_results"]
@@ -1,10 +1,15 @@
+from unittest.mock import patch
+
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pytest
 import requests
 from django.conf import settings
 
 from app.models import Resource
+from app.models.query import DBTQuery, Query, ResultFormat
 from app.utils.test_utils import require_env_vars
-from app.workflows.query import execute_dbt_query, execute_query
+from app.workflows.query import delete_query_file, execute_dbt_query, execute_query
 
 TEST_QUERY = "select * from mydb.dbt_sl_test.raw_products"
 
@@ -59,11 +64,86 @@ def run_test_dbt_query(
     assert len(data.json()["data"]) == output_len
 
 
+def run_test_paged_query(resource: Resource, result_format: str, limit=10):
+    result = (
+        execute_query.si(
+            workspace_id=str(resource.workspace.id),
+            resource_id=str(resource.id),
+            sql=TEST_QUERY,
+            limit=limit,
+            result_format=result_format,
+        )
+        .apply_async()
+        .get()
+    )
+    assert result["result_format"] == result_format
+    assert result["num_rows"] == limit
+    query = Query.objects.get(id=result["query_id"])
+    assert query.num_pages == len(result["pages"])
+    assert sum(len(query.read_page(i)) for i in range(query.num_pages)) == limit
+
+
 @pytest.mark.usefixtures("custom_celery")
 class TestQuery:
     def test_query_postgres(self, local_postgres):
         run_test_query(local_postgres)
 
+    @pytest.mark.parametrize(
+        "result_format", [ResultFormat.ARROW, ResultFormat.PARQUET]
+    )
+    def test_query_postgres_paged(self, local_postgres, result_format):
+        run_test_paged_query(local_postgres, result_format)
+
+    def test_query_postgres_first_page(self, local_postgres):
+        query = Query.objects.create(
+            sql=TEST_QUERY,
+            resource_id=local_postgres.id,
+            workspace_id=local_postgres.workspace.id,
+        )
+        first_pages = []
+        # results that fit in a page are only sent whole
+        result = query.run(limit=10, on_first_page=first_pages.append)
+        assert result["status"] == "success"
+        assert first_pages == []
+
+        with (
+            patch("app.models.query.QUERY_RESULT_PAGE_SIZE", 4),
+            patch.object(Query, "_expire_first_page") as expire_first_page,
+        ):
+            result = query.run(limit=10, on_first_page=first_pages.append)
+        assert result["status"] == "success"
+        assert len(first_pages) == 1
+        assert first_pages[0]["num_rows"] == 4
+        # the first page outlives the full result until its url expires
+        url = first_pages[0]["signed_url"].replace(
+            settings.AWS_S3_PUBLIC_URL, settings.AWS_S3_ENDPOINT_URL
+        )
+        assert requests.get(url).status_code == 200
+        (name,) = expire_first_page.call_args.args
+        delete_query_file(workspace_id=str(local_postgres.workspace.id), name=name)
+        assert requests.get(url).status_code == 404
+
+    @pytest.mark.parametrize(
+        "result_format", [ResultFormat.ARROW, ResultFormat.PARQUET]
+    )
+    def test_query_postgres_no_rows(self, local_postgres, result_format):
+        query = Query.objects.create(
+            sql=f"{TEST_QUERY} where false",
+            resource_id=local_postgres.id,
+            workspace_id=local_postgres.workspace.id,
+        )
+        result = query.run(limit=10, result_format=result_format)
+        assert result["status"] == "success"
+        assert result["num_rows"] == 0
+        # the schema is written even without any rows
+        with query.results.open("rb") as f:
+            if result_format == ResultFormat.ARROW:
+                table = pa.ipc.open_stream(f.read()).read_all()
+            else:
+                table = pq.read_table(f)
+        assert table.num_rows == 0
+        assert table.column_names == list(result["column_types"])
+
     @require_env_vars("BIGQUERY_0_WORKSPACE_ID")
     def test_query_bigquery(self, remote_bigquery):
         adj_query = TEST_QUERY.replace(
@@ -78,6 +158,47 @@ class TestDBTQuery:
         run_test_dbt_query(local_postgres)
         run_test_dbt_query(local_postgres, use_fast_compile=False)
 
+    def test_dbt_query_postgres_cached(self, local_postgres):
+        dbtresource = local_postgres.dbtresource_set.first()
+
+        def run_query():
+            query = DBTQuery.objects.create(
+                dbt_sql=TEST_DBT_QUERY,
+                dbtresource=dbtresource,
+                workspace_id=local_postgres.workspace.id,
+            )
+            return query.run(limit=10)
+
+        first = run_query()
+        # repeated previews reuse the compiled sql and the stored results
+        with patch("vinyl.lib.dbt.DBTProject.fast_compile") as fast_compile:
+            second = run_query()
+            fast_compile.assert_not_called()
+        assert second["query_id"] != first["query_id"]
+        assert (
+            DBTQuery.objects.get(id=second["query_id"]).results.name
+            == DBTQuery.objects.get(id=first["query_id"]).results.name
+        )
+
+    def test_dbt_query_postgres_cached_per_limit(self, local_postgres):
+        dbtresource = local_postgres.dbtresource_set.first()
+
+        def run_query(limit):
+            query = DBTQuery.objects.create(
+                dbt_sql=TEST_DBT_QUERY,
+                dbtresource=dbtresource,
+                workspace_id=local_postgres.workspace.id,
+            )
+            return query.run(use_fast_compile=False, limit=limit)
+
+        # sql compiled by dbt has the limit baked in, so it isn't reused for another one
+        run_query(5)
+        result = run_query(10)
+        url = result["signed_url"].replace(
+            settings.AWS_S3_PUBLIC_URL, settings.AWS_S3_ENDPOINT_URL
+        )
+        assert len(requests.get(url).json()["data"]) == 10
+
     @require_env_vars("BIGQUERY_0_WORKSPACE_ID")
     def test_dbt_query_bigquery(self, remote_bigquery):
         run_test_dbt_query(remote_bigquery)
@@ -26,7 +26,9 @@ class CustomTask(Task):
     def apply_async(self, *args, **kwargs):
         args, kwargs = self._adjust_inputs(*args, **kwargs)
         res = super().apply_async(*args, **kwargs)
-        if os.getenv("CUSTOM_CELERY_EAGER") == "true":
+        # delayed tasks are left to run on their own schedule
+        delayed = "countdown" in kwargs or "eta" in kwargs
+        if os.getenv("CUSTOM_CELERY_EAGER") == "true" and not delayed:
             res.get(disable_sync_subtasks=False)
         return res
 
@@ -37,6 +39,18 @@ class CustomTask(Task):
             return chain(*tasks).apply(parent_task=self).get()
         return chain(*tasks).apply_async(parent_task=self).get()
 
+    def run_parallel_subtasks(self, *tasks):
+        # every task is started before any is waited on
+        if self.request.called_directly:
+            return ChainResult(t.type(*t.args, **t.kwargs) for t in tasks)
+        elif self.request.is_eager:
+            results = ChainResult(t.apply() for t in tasks)
+        else:
+            results = ChainResult(t.apply_async() for t in tasks)
+        # force the parent to record its children before they finish
+        self.update_state(state=states.STARTED)
+        return results.get()
+
 
 class CustomTaskNoStatusConsumer(CustomTask):
     pass
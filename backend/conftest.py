@@ -13,7 +13,7 @@ from rest_framework.test import APIClient
 from rest_framework_simplejwt.tokens import AccessToken
 
 from app.utils.test_utils import assert_ingest_output
-from app.workflows.metadata import process_metadata
+from app.workflows.metadata import cleanup_indirect_instances, process_metadata
 from fixtures.local_env import (
     create_local_alternative_storage,
     create_local_metabase,
@@ -239,6 +239,9 @@ def prepopulated_dev_db(local_metabase, local_postgres):
             )
 
         process_metadata(resource_id=resource.id, workspace_id=resource.workspace.id)
+        cleanup_indirect_instances(
+            resource_id=resource.id, workspace_id=resource.workspace.id
+        )
 
     # ensure output
     assert_ingest_output(resources)
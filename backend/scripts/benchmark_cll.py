@@ -0,0 +1,58 @@
+import argparse
+import time
+from types import SimpleNamespace
+
+import django
+
+django.setup()
+
+from app.core.e2e import DataHubDBParser
+from app.models import ResourceType
+
+
+def get_dummy_resource(subtype: str):
+    # parsing only needs ids and dialect info, so no db row is required
+    return SimpleNamespace(
+        id="benchmark",
+        workspace=SimpleNamespace(id="benchmark"),
+        details=SimpleNamespace(subtype=subtype),
+        type=ResourceType.DB,
+    )
+
+
+def run_parser(path: str, subtype: str, n_jobs: int):
+    parser = DataHubDBParser(get_dummy_resource(subtype), path, n_jobs=n_jobs)
+    start = time.perf_counter()
+    parser.parse()
+    return parser, time.perf_counter() - start
+
+
+def get_comparable_outputs(parser: DataHubDBParser):
+    edges = sorted(
+        (u, v, data.get("lineage_type"), tuple(sorted(data.get("ntype", []))))
+        for u, v, data in parser.column_graph.edges(data=True)
+    )
+    errors = sorted(
+        (str(e.asset.id), e.error["type"], e.error["msg"]) for e in parser.asset_errors
+    )
+    return sorted(parser.column_graph.nodes), edges, errors
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Compare serial and parallel column lineage extraction"
+    )
+    arg_parser.add_argument("--path", default="fixtures/datahub_dbs/postgres.duckdb")
+    arg_parser.add_argument("--subtype", default="postgres")
+    arg_parser.add_argument("--n-jobs", type=int, default=4)
+    args = arg_parser.parse_args()
+
+    serial, serial_time = run_parser(args.path, args.subtype, n_jobs=1)
+    parallel, parallel_time = run_parser(args.path, args.subtype, n_jobs=args.n_jobs)
+
+    print(f"serial:   {serial_time:.2f}s")
+    print(f"parallel: {parallel_time:.2f}s ({args.n_jobs} workers)")
+    assert get_comparable_outputs(serial) == get_comparable_outputs(parallel), (
+        "serial and parallel column lineage differ"
+    )
+    print("outputs match")
@@ -0,0 +1,70 @@
+import argparse
+import time
+
+from vinyl.lib.dbt import DBTProject, FastCompiler
+from vinyl.lib.dbt_methods import DBTDialect, DBTVersion
+
+
+def get_project(path: str, dialect: str, version: str) -> DBTProject:
+    proj = DBTProject(
+        dbt_project_dir=path,
+        dialect=DBTDialect(dialect),
+        version=DBTVersion(version),
+        dbt_profiles_dir=path,
+    )
+    proj.mount_manifest()
+    proj.get_project_yml_files()
+    return proj
+
+
+def run_serial(proj: DBTProject, node_ids: list[str]):
+    # one compile per node, as `dbt_compile(fast_compile=True)` used to do
+    start = time.perf_counter()
+    compiled = {}
+    for node_id in node_ids:
+        sql = FastCompiler(proj).compile_node(node_id)
+        if sql is not None:
+            compiled[node_id] = sql
+    return compiled, time.perf_counter() - start
+
+
+def run_batch(proj: DBTProject, node_ids: list[str], n_jobs: int):
+    start = time.perf_counter()
+    compiled, fallbacks = FastCompiler(proj).compile_nodes(node_ids, max_workers=n_jobs)
+    return compiled, fallbacks, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Compare per-node and batch fast compilation of a dbt project"
+    )
+    arg_parser.add_argument(
+        "--path",
+        action="append",
+        help="dbt project directory, may be repeated",
+    )
+    arg_parser.add_argument("--dialect", default="postgres")
+    arg_parser.add_argument("--version", default=DBTVersion.V1_8.value)
+    arg_parser.add_argument("--n-jobs", type=int, default=4)
+    arg_parser.add_argument(
+        "--repeat", type=int, default=20, help="times each node is compiled"
+    )
+    args = arg_parser.parse_args()
+
+    for path in args.path or ["fixtures/test_resources/jaffle_shop"]:
+        proj = get_project(path, args.dialect, args.version)
+        node_ids = [
+            node_id
+            for node_id, node in proj.manifest["nodes"].items()
+            if node["resource_type"] == "model"
+        ] * args.repeat
+
+        serial, serial_time = run_serial(proj, node_ids)
+        batch, fallbacks, batch_time = run_batch(proj, node_ids, args.n_jobs)
+
+        print(path)
+        print(f"  nodes:     {len(node_ids)} ({len(set(fallbacks))} fall back)")
+        print(f"  per-node:  {serial_time:.3f}s")
+        print(f"  batch:     {batch_time:.3f}s ({args.n_jobs} workers)")
+        assert serial == batch, "per-node and batch fast compile differ"
+        print("  outputs match")
@@ -0,0 +1,55 @@
+import argparse
+import time
+
+import django
+import numpy as np
+
+django.setup()
+
+from app.services.lineage_service import WorkspaceLineageGraph
+
+
+def get_synthetic_graph(num_nodes: int, avg_degree: int, seed: int = 0):
+    # edges only point to higher indices so the graph is a dag like real lineage
+    rng = np.random.default_rng(seed)
+    num_edges = num_nodes * avg_degree
+    sources = rng.integers(0, num_nodes - 1, num_edges)
+    targets = np.minimum(sources + rng.integers(1, 1000, num_edges), num_nodes - 1)
+    asset_links = [
+        (f"al_{i}", f"asset_{s}", f"asset_{t}")
+        for i, (s, t) in enumerate(zip(sources.tolist(), targets.tolist()))
+    ]
+    column_links = [
+        (f"cl_{i}", f"asset_{s}", f"asset_{t}", "all")
+        for i, (s, t) in enumerate(zip(sources.tolist(), targets.tolist()))
+    ]
+    return asset_links, column_links
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Time in-memory lineage traversals on a synthetic workspace graph"
+    )
+    arg_parser.add_argument("--nodes", type=int, default=100_000)
+    arg_parser.add_argument("--avg-degree", type=int, default=3)
+    arg_parser.add_argument("--samples", type=int, default=100)
+    args = arg_parser.parse_args()
+
+    asset_links, column_links = get_synthetic_graph(args.nodes, args.avg_degree)
+    start = time.perf_counter()
+    graph = WorkspaceLineageGraph(asset_links, column_links)
+    print(f"build: {time.perf_counter() - start:.2f}s ({len(asset_links)} edges)")
+
+    roots = [f"asset_{i}" for i in range(0, args.nodes, args.nodes // args.samples)]
+    for depth in range(1, 6):
+        start = time.perf_counter()
+        sizes = []
+        for root in roots:
+            relatives = [root, *graph.relatives(root, depth, depth)]
+            graph.asset_link_ids_between(relatives)
+            graph.column_link_ids_between(relatives, "all")
+            sizes.append(len(relatives))
+        elapsed = (time.perf_counter() - start) / len(roots)
+        print(
+            f"depth {depth}: {elapsed * 1000:.2f}ms per lookup, {np.mean(sizes):.0f} assets on average"
+        )
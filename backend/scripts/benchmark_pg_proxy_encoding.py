@@ -0,0 +1,65 @@
+import argparse
+import io
+import time
+
+import duckdb
+
+from vinyl.infra.pg_proxy.backends.duckdb import RECORD_BATCH_SIZE, DuckDBQueryResult
+from vinyl.infra.pg_proxy.postgres import ProxyServerHandler
+
+TEXT_COLUMNS = """
+    i::BIGINT AS id,
+    (i % 1000)::INTEGER AS small,
+    (i / 7)::DOUBLE AS ratio,
+    'name_' || i AS name,
+    DATE '2020-01-01' + (i % 365)::INTEGER AS day,
+    i % 2 = 0 AS flag,
+    TIMESTAMP '2020-01-01 00:00:00' + to_seconds(i) AS ts
+"""
+# the per-row converters can't encode naive timestamps in binary
+BINARY_COLUMNS = TEXT_COLUMNS.rsplit(",", 1)[0]
+
+
+def get_handler() -> ProxyServerHandler:
+    handler = ProxyServerHandler.__new__(ProxyServerHandler)
+    handler.wfile = io.BytesIO()
+    return handler
+
+
+def run(db, columns: str, rows: int, binary: bool, by_row: bool):
+    cursor = db.cursor()
+    cursor.execute(f"SELECT {columns} FROM range({rows}) t(i)")
+    query_result = DuckDBQueryResult(cursor.fetch_record_batch(RECORD_BATCH_SIZE))
+    if binary:
+        query_result.result_format = [1] * query_result.column_count()
+    handler = get_handler()
+    start = time.perf_counter()
+    if by_row:
+        handler.send_data_rows_by_row(query_result)
+    else:
+        handler.send_data_rows(query_result)
+    elapsed = time.perf_counter() - start
+    cursor.close()
+    return handler.wfile.getvalue(), elapsed
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Compare per-row and batch DataRow encoding in the pg proxy"
+    )
+    arg_parser.add_argument("--rows", type=int, default=1000000)
+    args = arg_parser.parse_args()
+
+    db = duckdb.connect()
+    for label, columns, binary in [
+        ("text", TEXT_COLUMNS, False),
+        ("binary", BINARY_COLUMNS, True),
+    ]:
+        by_row, by_row_time = run(db, columns, args.rows, binary, by_row=True)
+        batch, batch_time = run(db, columns, args.rows, binary, by_row=False)
+        mb = len(batch) / 1024 / 1024
+        print(f"{label} format, {args.rows} rows, {mb:.1f}MB")
+        print(f"  per-row:  {by_row_time:.3f}s ({mb / by_row_time:.1f}MB/s)")
+        print(f"  batch:    {batch_time:.3f}s ({mb / batch_time:.1f}MB/s)")
+        assert by_row == batch, "per-row and batch encodings differ"
+        print("  outputs match")
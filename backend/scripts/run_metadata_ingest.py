@@ -2,7 +2,12 @@ import django
 
 django.setup()
 
-from app.workflows.metadata import prepare_dbt_repos, ingest_metadata, process_metadata  # noqa
+from app.workflows.metadata import (  # noqa
+    cleanup_indirect_instances,
+    ingest_metadata,
+    prepare_dbt_repos,
+    process_metadata,
+)
 from app.models import Workspace, Resource  # noqa
 
 if __name__ == "__main__":
@@ -12,3 +17,4 @@ if __name__ == "__main__":
     # prepare_dbt_repos(workspace.id, resource.id)
     # ingest_metadata(workspace.id, resource.id)
     process_metadata(workspace.id, resource.id)
+    cleanup_indirect_instances(workspace.id, resource.id)
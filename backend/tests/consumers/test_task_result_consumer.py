@@ -0,0 +1,84 @@
+import pytest
+from channels.testing import WebsocketCommunicator
+
+from api.asgi import application
+from app.utils.task_logs import TaskLog
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("transactional_db")
+class TestTaskResultConsumer:
+    url = "/ws/subscribe/test/"
+
+    async def test_resume_log_from_offset(self, client_with_token):
+        task_log = TaskLog("test_resume_log_from_offset", workspace_id="test")
+        task_log.delete()
+        first = task_log.append("first\n")
+        second = task_log.append("second\n")
+
+        communicator = WebsocketCommunicator(
+            application, f"{self.url}?token={client_with_token.access_token}"
+        )
+        connected, _ = await communicator.connect()
+        assert connected
+
+        await communicator.send_json_to(
+            {"action": "resume_log", "task_id": task_log.task_id, "offset": first}
+        )
+        response = await communicator.receive_json_from(timeout=5)
+        assert response["status"] == "TASK_LOG"
+        assert response["offset"] == second
+        assert response["data"] == "second\n"
+        assert await communicator.receive_nothing()
+
+        await communicator.disconnect()
+        assert task_log.read_all() == "first\nsecond\n"
+        task_log.delete()
+
+    async def test_resume_log_other_workspace(self, client_with_token):
+        task_log = TaskLog("test_resume_log_other_workspace", workspace_id="other")
+        task_log.delete()
+        task_log.append("secret\n")
+
+        communicator = WebsocketCommunicator(
+            application, f"{self.url}?token={client_with_token.access_token}"
+        )
+        connected, _ = await communicator.connect()
+        assert connected
+
+        await communicator.send_json_to(
+            {"action": "resume_log", "task_id": task_log.task_id, "offset": "0-0"}
+        )
+        assert await communicator.receive_nothing()
+
+        await communicator.disconnect()
+        task_log.delete()
+
+    async def test_ignores_malformed_messages(self, client_with_token):
+        task_log = TaskLog("test_ignores_malformed_messages", workspace_id="test")
+        task_log.delete()
+        offset = task_log.append("first\n")
+
+        communicator = WebsocketCommunicator(
+            application, f"{self.url}?token={client_with_token.access_token}"
+        )
+        connected, _ = await communicator.connect()
+        assert connected
+
+        await communicator.send_to(text_data="not json")
+        await communicator.send_json_to(["resume_log"])
+        await communicator.send_json_to({"action": "resume_log"})
+        await communicator.send_json_to(
+            {"action": "resume_log", "task_id": task_log.task_id, "offset": "bad"}
+        )
+        assert await communicator.receive_nothing()
+
+        # the socket is still open after the bad frames
+        await communicator.send_json_to(
+            {"action": "resume_log", "task_id": task_log.task_id}
+        )
+        response = await communicator.receive_json_from(timeout=5)
+        assert response["offset"] == offset
+
+        await communicator.disconnect()
+        task_log.delete()
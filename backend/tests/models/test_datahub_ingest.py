@@ -0,0 +1,42 @@
+import importlib.metadata
+import os
+
+import duckdb
+
+from app.utils.datahub import get_datahub_package, merge_datahub_dbs
+
+
+def _write_part(path: str, rows: list[tuple]):
+    con = duckdb.connect(path)
+    con.execute(
+        "CREATE TABLE metadata_aspect_v2 (urn VARCHAR, aspect_name VARCHAR, version BIGINT, metadata JSON, PRIMARY KEY (urn, aspect_name, version))"
+    )
+    con.executemany("INSERT INTO metadata_aspect_v2 VALUES (?, ?, ?, ?)", rows)
+    con.close()
+
+
+def test_merge_datahub_dbs_later_parts_win(tmp_path):
+    db_path = os.path.join(tmp_path, "datahub.duckdb")
+    first = os.path.join(tmp_path, "datahub.duckdb.0.duckdb")
+    second = os.path.join(tmp_path, "datahub.duckdb.1.duckdb")
+    _write_part(first, [("urn:a", "schema", 1, '"db"'), ("urn:b", "schema", 1, '"db"')])
+    _write_part(
+        second, [("urn:a", "schema", 1, '"dbt"'), ("urn:c", "schema", 1, '"dbt"')]
+    )
+
+    merge_datahub_dbs(db_path, [first, second, os.path.join(tmp_path, "missing")])
+
+    con = duckdb.connect(db_path, read_only=True)
+    rows = con.execute(
+        "SELECT urn, metadata FROM metadata_aspect_v2 ORDER BY urn"
+    ).fetchall()
+    con.close()
+    assert rows == [("urn:a", '"dbt"'), ("urn:b", '"db"'), ("urn:c", '"dbt"')]
+
+
+def test_datahub_package_pinned_to_installed_version():
+    version = importlib.metadata.version("acryl-datahub")
+    assert (
+        get_datahub_package(["postgres"])
+        == f"acryl-datahub[datahub-lite,postgres]=={version}"
+    )
@@ -0,0 +1,46 @@
+from unittest.mock import patch
+
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+
+def test_incremental_catalog_skips_fresh_relations(local_postgres):
+    dbtresource = local_postgres.dbtresource_set.first()
+    with dbtresource.dbt_repo_context() as (proj, _, _):
+        proj.mount_manifest(force_run=True)
+        node_ids = list(proj.build_model_graph().node_dict)
+        catalog = proj.mount_catalog(force_run=True, incremental_nodes=node_ids)
+        assert len(catalog["nodes"]) > 0
+
+        # nothing changed, so the second refresh is served entirely from the cache
+        with patch.object(proj, "dbt_docs_generate") as dbt_docs_generate:
+            assert proj.mount_catalog(force_run=True, incremental_nodes=node_ids) == (
+                catalog
+            )
+            dbt_docs_generate.assert_not_called()
+
+
+def test_incremental_catalog_reintrospects_expired_sources(local_postgres):
+    dbtresource = local_postgres.dbtresource_set.first()
+    with dbtresource.dbt_repo_context() as (proj, _, _):
+        proj.mount_manifest(force_run=True)
+        node_ids = list(proj.build_model_graph().node_dict)
+        source_id = next(iter(proj.manifest["sources"]))
+        node_ids.append(source_id)
+        proj.mount_catalog(force_run=True, incremental_nodes=node_ids)
+
+        # a column added outside of dbt only shows up once the source entry expires
+        conn = local_postgres.details.get_connector()._connect()
+        relation = proj.get_relation_name(source_id)
+        conn.raw_sql(
+            f"ALTER TABLE {relation} ADD COLUMN catalog_cache_test INTEGER"
+        ).close()
+        try:
+            with patch("vinyl.lib.dbt.CATALOG_CACHE_SOURCE_TTL", -1):
+                catalog = proj.mount_catalog(force_run=True, incremental_nodes=node_ids)
+        finally:
+            conn.raw_sql(
+                f"ALTER TABLE {relation} DROP COLUMN catalog_cache_test"
+            ).close()
+        assert "catalog_cache_test" in catalog["sources"][source_id]["columns"]
@@ -0,0 +1,55 @@
+import pytest
+
+from vinyl.lib.dbt import FastCompiler
+
+pytestmark = pytest.mark.django_db
+
+
+def _normalize(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def test_fast_compile_nodes_matches_dbt_compile(local_postgres):
+    dbtresource = local_postgres.dbtresource_set.first()
+    with dbtresource.dbt_repo_context() as (proj, _, _):
+        proj.mount_manifest(force_run=True)
+        node_ids = [
+            node_id
+            for node_id, node in proj.manifest["nodes"].items()
+            if node["resource_type"] == "model"
+        ]
+        compiled, fallbacks = proj.fast_compile_nodes(node_ids)
+        assert len(compiled) > 0
+        assert set(compiled) | set(fallbacks) == set(node_ids)
+
+        stdout, stderr, success = proj.dbt_compile(write_json=True)
+        assert success, stderr
+        proj.mount_manifest(force_read=True)
+        for node_id, sql in compiled.items():
+            assert _normalize(sql) == _normalize(
+                proj.manifest["nodes"][node_id]["compiled_code"]
+            ), node_id
+
+
+def test_fast_compile_falls_back_on_jinja_blocks():
+    compiler = FastCompiler.__new__(FastCompiler)
+    compiler.proj_name = "proj"
+    compiler.replace_refs = True
+    compiler.replace_sources = True
+    compiler._relation_names = {
+        "model.proj.events": '"db"."main"."events"',
+        "model.proj.raw_events": '"db"."main"."raw_events"',
+    }
+
+    assert (
+        compiler.compile("select * from {{ this }}", node_id="model.proj.events")
+        == 'select * from "db"."main"."events"'
+    )
+    incremental_sql = """
+        select * from {{ ref('raw_events') }}
+        {% if is_incremental() %}
+        where ts > (select max(ts) from {{ this }})
+        {% endif %}
+    """
+    assert compiler.compile(incremental_sql, node_id="model.proj.events") is None
+    assert compiler.compile("{# note #} select 1") is None
@@ -0,0 +1,36 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+
+def test_manifest_cache_skips_unchanged_parse(local_postgres):
+    dbtresource = local_postgres.dbtresource_set.first()
+    with dbtresource.dbt_repo_context() as (proj, _, _):
+        manifest = proj.mount_manifest(force_run=True)
+        graph = proj.build_model_graph()
+
+    # a fresh project on the same unchanged files reads the manifest and graph from memory
+    with dbtresource.dbt_repo_context() as (proj, _, _):
+        with patch.object(proj, "dbt_parse") as dbt_parse:
+            assert proj.mount_manifest(force_run=True) is manifest
+            assert proj.build_model_graph() is graph
+            dbt_parse.assert_not_called()
+
+
+def test_manifest_cache_reparses_missing_manifest(local_postgres):
+    dbtresource = local_postgres.dbtresource_set.first()
+    with dbtresource.dbt_repo_context(isolate=True) as (proj, _, _):
+        manifest = proj.mount_manifest(force_run=True)
+        fingerprint = proj.get_source_fingerprint()
+
+        # later commands read the manifest from disk, so a cache hit needs the file too
+        os.remove(proj.manifest_path)
+        assert proj.mount_manifest(force_run=True) is not manifest
+        assert os.path.exists(proj.manifest_path)
+
+        with open(os.path.join(proj.dbt_project_dir, "package-lock.yml"), "a") as f:
+            f.write("\n")
+        assert proj.get_source_fingerprint() != fingerprint
@@ -0,0 +1,24 @@
+from unittest.mock import patch
+
+import pytest
+
+from vinyl.lib.dbt import STREAM_SUCCESS_STRING
+
+pytestmark = pytest.mark.django_db
+
+
+@patch("vinyl.lib.dbt.DBT_WORKER_POOL_ENABLED", True)
+def test_worker_pool_runs_dbt_commands(local_postgres):
+    dbtresource = local_postgres.dbtresource_set.first()
+    with dbtresource.dbt_repo_context() as (proj, _, _):
+        assert proj.use_worker_pool
+        _, stderr, success = proj.dbt_parse()
+        assert success, stderr
+
+        # the second compile reuses the worker and the manifest it parsed
+        for _ in range(2):
+            _, stderr, success = proj.dbt_compile()
+            assert success, stderr
+
+        lines = list(proj.stream_dbt_command(["compile"], force_terminal=False))
+        assert lines[-1] == STREAM_SUCCESS_STRING
@@ -0,0 +1,99 @@
+import pytest
+
+from app.core.e2e import DataHubDBParser
+from app.models import Asset, AssetLink, Column, ColumnLink
+
+pytestmark = pytest.mark.django_db
+
+
+def test_delete_unused_indirect_instances_in_batches(local_postgres):
+    workspace_id = local_postgres.workspace_id
+
+    def asset(id: str, is_indirect: bool = True) -> Asset:
+        return Asset(
+            id=id,
+            type=Asset.AssetType.MODEL,
+            resource=local_postgres,
+            workspace_id=workspace_id,
+            is_indirect=is_indirect,
+        )
+
+    def column(asset_id: str, name: str, is_indirect: bool = True) -> Column:
+        return Column(
+            id=f"{asset_id}.{name}",
+            asset_id=asset_id,
+            name=name,
+            workspace_id=workspace_id,
+            is_indirect=is_indirect,
+        )
+
+    Asset.objects.bulk_create(
+        [
+            asset("direct", is_indirect=False),
+            asset("direct_orphan", is_indirect=False),
+            *[asset(f"linked_{i}") for i in range(3)],
+            *[asset(f"orphan_{i}") for i in range(5)],
+        ]
+    )
+    Column.objects.bulk_create(
+        [
+            column("direct", "id", is_indirect=False),
+            *[column(f"linked_{i}", "id") for i in range(3)],
+            *[column("linked_0", f"orphan_{i}") for i in range(5)],
+            *[column(f"orphan_{i}", "id") for i in range(5)],
+        ]
+    )
+    AssetLink.objects.bulk_create(
+        [
+            AssetLink(
+                id=f"direct->linked_{i}",
+                source_id="direct",
+                target_id=f"linked_{i}",
+                workspace_id=workspace_id,
+            )
+            for i in range(3)
+        ]
+    )
+    ColumnLink.objects.bulk_create(
+        [
+            ColumnLink(
+                id=f"direct.id->linked_{i}.id",
+                source_id="direct.id",
+                target_id=f"linked_{i}.id",
+                workspace_id=workspace_id,
+            )
+            for i in range(3)
+        ]
+    )
+
+    progress = []
+    for type in ["asset", "column"]:
+        DataHubDBParser.delete_unused_indirect_instances(
+            type,
+            workspace_id,
+            batch_size=2,
+            progress_callback=lambda type, deleted: progress.append((type, deleted)),
+        )
+
+    # five orphaned assets and five orphaned columns, two at a time
+    assert progress == [
+        ("asset", 2),
+        ("asset", 4),
+        ("asset", 5),
+        ("column", 2),
+        ("column", 4),
+        ("column", 5),
+    ]
+    assert set(Asset.objects.values_list("id", flat=True)) == {
+        "direct",
+        "direct_orphan",
+        "linked_0",
+        "linked_1",
+        "linked_2",
+    }
+    assert set(Column.objects.values_list("id", flat=True)) == {
+        "direct.id",
+        "linked_0.id",
+        "linked_1.id",
+        "linked_2.id",
+    }
@@ -0,0 +1,75 @@
+import pytest
+
+from app.models import Asset
+from app.utils.database import pg_delete_and_upsert
+from app.utils.urn import UrnAdjuster
+
+pytestmark = pytest.mark.django_db
+
+
+def _asset(resource, id: str, name: str) -> Asset:
+    return Asset(
+        id=id,
+        type=Asset.AssetType.MODEL,
+        name=name,
+        resource=resource,
+        workspace_id=resource.workspace_id,
+    )
+
+
+def _names(resource) -> dict[str, str]:
+    adjuster = UrnAdjuster(resource.workspace_id)
+    return {
+        adjuster.unadjust(id): name
+        for id, name in Asset.objects.filter(resource=resource).values_list(
+            "id", "name"
+        )
+    }
+
+
+def test_pg_delete_and_upsert_inserts_updates_and_deletes(local_postgres):
+    Asset.objects.bulk_create(
+        [
+            _asset(local_postgres, "changed", "old").adjust_urns(),
+            _asset(local_postgres, "unchanged", "same").adjust_urns(),
+            _asset(local_postgres, "removed", "gone").adjust_urns(),
+        ]
+    )
+    pg_delete_and_upsert(
+        [
+            _asset(local_postgres, "changed", "new"),
+            _asset(local_postgres, "unchanged", "same"),
+            _asset(local_postgres, "added", "added"),
+        ],
+        local_postgres,
+    )
+    assert _names(local_postgres) == {
+        "changed": "new",
+        "unchanged": "same",
+        "added": "added",
+    }
+
+
+def test_pg_delete_and_upsert_last_duplicate_wins(local_postgres):
+    Asset.objects.bulk_create([_asset(local_postgres, "existing", "old").adjust_urns()])
+    pg_delete_and_upsert(
+        [
+            _asset(local_postgres, "existing", "first"),
+            _asset(local_postgres, "added", "first"),
+            _asset(local_postgres, "existing", "last"),
+            _asset(local_postgres, "added", "last"),
+        ],
+        local_postgres,
+    )
+    assert _names(local_postgres) == {"existing": "last", "added": "last"}
+
+
+def test_pg_delete_and_upsert_skips_rows_of_other_resources(
+    local_postgres, local_metabase
+):
+    Asset.objects.bulk_create(
+        [_asset(local_metabase, "shared", "theirs").adjust_urns()]
+    )
+    pg_delete_and_upsert([_asset(local_postgres, "shared", "ours")], local_postgres)
+    assert _names(local_metabase) == {"shared": "theirs"}
+    assert _names(local_postgres) == {}
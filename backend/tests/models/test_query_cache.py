@@ -0,0 +1,19 @@
+from app.services.query_cache import BoundedCache
+
+
+def test_bounded_cache_evicts_oldest():
+    bounded_cache = BoundedCache("test_bounded_cache", ttl=60, max_entries=2)
+    bounded_cache.clear()
+    for key in ["a", "b", "c"]:
+        bounded_cache.set(key, key)
+
+    assert bounded_cache.get("a") is None
+    assert bounded_cache.get("b") == "b"
+    assert bounded_cache.get("c") == "c"
+
+    # rewriting a key makes it the newest
+    bounded_cache.set("b", "b")
+    bounded_cache.set("d", "d")
+    assert bounded_cache.get("c") is None
+    assert bounded_cache.get("b") == "b"
+    bounded_cache.clear()
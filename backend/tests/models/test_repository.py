@@ -9,6 +9,7 @@ from app.models import Workspace
 from app.models.project import Project
 from app.models.ssh_key import SSHKey
 from app.models.workspace import generate_short_uuid
+from app.utils.git_mirror import GitMirror
 from app.utils.test_utils import require_env_vars
 
 TEST_WORKSPACE_ID = generate_short_uuid()
@@ -58,6 +59,20 @@ class TestRepository:
         ):
             assert len(os.listdir(repo.working_tree_dir)) > 3
 
+    def test_isolated_repo_context_uses_mirror(self, local_postgres_repo):
+        mirror = GitMirror(
+            str(local_postgres_repo.id), local_postgres_repo.git_repo_url
+        )
+        with local_postgres_repo.main_project.repo_context(isolate=True) as (
+            repo,
+            _,
+        ):
+            assert mirror.exists
+            # isolated clones borrow objects from the mirror rather than downloading them
+            alternates = os.path.join(repo.git_dir, "objects", "info", "alternates")
+            with open(alternates, "r") as f:
+                assert mirror.path in f.read()
+
     @isolate_mark
     def test_dbt_repo_context_with_schema(
         self,
@@ -99,6 +99,24 @@ class TestOrchestrationViews:
         assert response.status_code == 400
         assert "All commands must start with 'dbt'" in response.data["commands"]
 
+    def test_patch_commands_checks_saved_dependencies(
+        self, client, minimal_scheduled_workflow
+    ):
+        response = client.patch(
+            f"/jobs/{minimal_scheduled_workflow.id}/",
+            {"dependencies": [[], [0]]},
+            format="json",
+        )
+        assert response.status_code == 200
+
+        response = client.patch(
+            f"/jobs/{minimal_scheduled_workflow.id}/",
+            {"commands": ["dbt deps", "dbt parse", "dbt run"]},
+            format="json",
+        )
+        assert response.status_code == 400
+        assert "dependencies" in response.data
+
     def test_orchestration_integration(
         self,
         client,
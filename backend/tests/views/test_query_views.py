@@ -141,6 +141,29 @@ class TestValidateDBTViews(TestValidateViews):
         )
 
 
+@pytest.mark.usefixtures("force_isolate", "custom_celery", "storage")
+@pytest.mark.xdist_group(name="postgres")
+def test_dbt_query_pages(client, user, local_postgres):
+    user.active_workspace_id = local_postgres.workspace.id
+    user.save()
+    project_id = local_postgres.dbtresource_set.first().repository.main_project.id
+    response = client.post(
+        "/query/dbt/",
+        {
+            "query": TestDBTQueryViews.default_query,
+            "project_id": project_id,
+            "result_format": "arrow",
+            "limit": 100,
+        },
+    )
+    assert response.status_code == 201
+
+    # dbt query results are paged through the same endpoint as sql queries
+    response = client.get(f"/query/{response.json()['query_id']}/pages/0/")
+    assert response.status_code == 200
+    assert len(response.json()["data"]) > 0
+
+
 FORMAT_QUERY = """with source as (select * from {{ source('ecom', 'raw_customers') }}), renamed as (select id as customer_id, name as customer_name from source) select * from renamed"""
 
 
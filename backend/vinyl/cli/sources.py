@@ -394,25 +394,27 @@ def generate_sources(
         sources, _, _ = generate_sources_helper(resources, json=json, twin=twin)
 
         if twin:
-            msg = "generating twins... " if len(sources) > 1 else "generating twin... "
-            for source in tqdm(
-                sources,
-                msg,
-                unit="source",
-            ):
+            # database twins are built per resource, so their tables are sampled concurrently
+            database_twins = {}
+            for source in sources:
                 pr = source._parent_resource
                 if isinstance(pr.connector, _DatabaseConnector):
                     database, schema = source._location.split(".")
-                    pr.connector._generate_twin(
-                        os.path.join(root_path, _get_twin_relative_path(pr.name)),
-                        database,
-                        schema,
-                        source.name,
+                    database_twins.setdefault(pr.name, (pr, []))[1].append(
+                        (database, schema, source.name)
                     )
                 elif isinstance(pr.connector, _TableConnector):
                     # doesn't actually generate a file, just returns the path
                     pr.connector._generate_twin(source.location)
 
+            for pr, tables in database_twins.values():
+                errors = pr.connector._generate_twins(
+                    os.path.join(root_path, _get_twin_relative_path(pr.name)),
+                    tables,
+                )
+                for error in errors:
+                    print(f"Failed to generate twin for {error.node_id}: {error.msg}")
+
         print(f"Generated {len(sources)} sources at {sources_path}")
 
     run_fn()
@@ -1,14 +1,24 @@
 import logging
 import re
-from typing import Dict, Iterator, List, Optional, Tuple
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 import pyarrow as pa
 import sqlglot
 
-from vinyl.infra.pg_proxy.core import BVType, Connection, QueryResult, Session
+from vinyl.infra.pg_proxy.core import (
+    BVType,
+    Connection,
+    QueryResult,
+    Session,
+    StatementCache,
+)
 
 logger = logging.getLogger(__name__)
 
+# rows per arrow batch handed to the wire encoder, which writes each batch in one go
+RECORD_BATCH_SIZE = 65536
+
 
 def to_bvtype(t: pa.DataType) -> BVType:
     if pa.types.is_int64(t):
@@ -54,24 +64,18 @@ class RecordBatchIterator(Iterator[list[Optional[str]]]):
         self.rbr = rbr
 
     def __iter__(self):
-        try:
-            self.rb = self.rbr.read_next_batch()
-        except StopIteration:
-            self.rb = None
-        self.i = 0
+        self.batch_rows = iter(())
         return self
 
     def __next__(self) -> List:
-        if self.rb is None:
-            raise StopIteration
-        if self.i >= self.rb.num_rows:
-            self.rb = self.rbr.read_next_batch()
-            self.i = 0
-        ret = []
-        for col in self.rb.columns:
-            ret.append(col[self.i].as_py())
-        self.i += 1
-        return ret
+        while True:
+            try:
+                return next(self.batch_rows)
+            except StopIteration:
+                pass
+            # raises StopIteration once the reader is exhausted
+            rb = self.rbr.read_next_batch()
+            self.batch_rows = map(list, zip(*(col.to_pylist() for col in rb.columns)))
 
 
 class DuckDBQueryResult(QueryResult):
@@ -109,16 +113,41 @@ class DuckDBQueryResult(QueryResult):
         else:
             return iter([])
 
+    def record_batches(self) -> Optional[Iterator[pa.RecordBatch]]:
+        if self.rbr:
+            return iter(self.rbr)
+        return None
+
     def status(self) -> str:
         return self._status
 
 
+def get_config_params(cursor) -> set[str]:
+    return set(
+        [r[0] for r in cursor.execute("SELECT name FROM duckdb_settings()").fetchall()]
+    )
+
+
+class ParsedStatement(NamedTuple):
+    rewritten: Optional[str]
+    is_begin: bool
+    is_commit: bool
+    is_rollback: bool
+    is_load: bool
+    is_dml: bool
+
+
 class DuckDBSession(Session):
-    def __init__(self, cursor):
+    def __init__(self, cursor, connection: Optional["DuckDBConnection"] = None):
         super().__init__()
         self._cursor = cursor
+        self.connection = connection
+        # parsing and rewriting only depend on the statement text, so sessions of a connection share one cache
+        self.statement_cache = (
+            connection.statement_cache if connection is not None else StatementCache()
+        )
         self.in_txn = False
-        self.refresh_config()
+        self.refresh_config(force=False)
 
     def cursor(self):
         return self._cursor
@@ -126,15 +155,12 @@ class DuckDBSession(Session):
     def close(self):
         self._cursor.close()
 
-    def refresh_config(self):
-        self.config_params = set(
-            [
-                r[0]
-                for r in self._cursor.execute(
-                    "SELECT name FROM duckdb_settings()"
-                ).fetchall()
-            ]
-        )
+    def refresh_config(self, force: bool = True):
+        # settings belong to the database, so sessions share the connection's copy unless an extension was just loaded
+        if self.connection is not None:
+            self.config_params = self.connection.get_config_params(self._cursor, force)
+        else:
+            self.config_params = get_config_params(self._cursor)
 
     def load_df_function(self, table: str):
         return self._cursor.query(f"select * from {table}")
@@ -183,8 +209,7 @@ class DuckDBSession(Session):
     def in_transaction(self) -> bool:
         return self.in_txn
 
-    def execute_sql(self, sql: str, params=None) -> QueryResult:
-        status = ""
+    def parse_statement(self, sql: str) -> ParsedStatement:
         try:
             lsql = sqlglot.parse_one(sql).sql(comments=False)
         except Exception as e:
@@ -193,22 +218,37 @@ class DuckDBSession(Session):
             lsql = sql
 
         lsql = lsql.lower()
+        return ParsedStatement(
+            # SET rewrites depend on the settings loaded at the time, so they are redone per execution
+            rewritten=None if sql.startswith("SET ") else self.rewrite_sql(sql),
+            is_begin="begin" in lsql or "start transaction" in lsql,
+            is_commit="commit" in lsql,
+            is_rollback="rollback" in lsql,
+            is_load="load " in lsql,
+            is_dml="insert " in lsql or "update " in lsql or "delete " in lsql,
+        )
+
+    def prepare_sql(self, sql: str):
+        self.statement_cache.get(sql, self.parse_statement)
+
+    def execute_sql(self, sql: str, params=None) -> QueryResult:
+        status = ""
+        stmt = self.statement_cache.get(sql, self.parse_statement)
         if self.in_txn:
-            if "commit" in lsql:
+            if stmt.is_commit:
                 self.in_txn = False
                 status = "COMMIT"
-            elif "rollback" in lsql:
+            elif stmt.is_rollback:
                 self.in_txn = False
                 status = "ROLLBACK"
-            elif "begin" in lsql or "start transaction" in lsql:
+            elif stmt.is_begin:
                 return DuckDBQueryResult(status="BEGIN")
-        elif "begin" in lsql or "start transaction" in lsql:
-            lsql = "begin"
+        elif stmt.is_begin:
             self.in_txn = True
             status = "BEGIN"
 
         logger.debug("Original SQL: %s", sql)
-        sql = self.rewrite_sql(sql)
+        sql = stmt.rewritten if stmt.rewritten is not None else self.rewrite_sql(sql)
         logger.debug("Rewritten SQL: %s", sql)
         if params:
             self._cursor.execute(sql, params)
@@ -220,18 +260,27 @@ class DuckDBSession(Session):
 
         rb = None
         if self._cursor.description:
-            if "load " in lsql:
+            if stmt.is_load:
                 self.refresh_config()
                 status = "LOAD"
-            elif not ("insert " in lsql or "update " in lsql or "delete " in lsql):
-                rb = self._cursor.fetch_record_batch()
+            elif not stmt.is_dml:
+                rb = self._cursor.fetch_record_batch(RECORD_BATCH_SIZE)
         return DuckDBQueryResult(rb, status)
 
 
 class DuckDBConnection(Connection):
-    def __init__(self, db):
-        super().__init__()
+    def __init__(self, db, pool_size: int = 0):
+        super().__init__(pool_size)
         self.db = db
+        self.statement_cache = StatementCache()
+        self._config_params = None
+        self._config_lock = threading.Lock()
+
+    def get_config_params(self, cursor, force: bool = False) -> set[str]:
+        with self._config_lock:
+            if force or self._config_params is None:
+                self._config_params = get_config_params(cursor)
+            return self._config_params
 
     def parameters(self) -> Dict[str, str]:
         return {
@@ -243,4 +292,4 @@ class DuckDBConnection(Connection):
     def new_session(self) -> Session:
         cursor = self.db.cursor()
         cursor.execute("SET search_path='main'")
-        return DuckDBSession(cursor)
+        return DuckDBSession(cursor, self)
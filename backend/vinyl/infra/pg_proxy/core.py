@@ -1,8 +1,14 @@
 import enum
 import json
+import os
+import queue
 import re
+import threading
 import uuid
-from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+STATEMENT_CACHE_SIZE = int(os.getenv("PG_PROXY_STATEMENT_CACHE_SIZE", 1024))
 
 
 class BVType(enum.Enum):
@@ -25,6 +31,34 @@ class BVType(enum.Enum):
     STRINGARRAY = 16
 
 
+class StatementCache:
+    """Bounded LRU map from raw statement text to something derived from it, e.g. its rewritten SQL. Safe to share between sessions."""
+
+    def __init__(self, maxsize: int = STATEMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sql: str, compute: Callable[[str], Any]) -> Any:
+        with self._lock:
+            if sql in self._entries:
+                self._entries.move_to_end(sql)
+                return self._entries[sql]
+        # computed outside the lock, racing sessions just compute the same value twice
+        value = compute(sql)
+        if self.maxsize > 0:
+            with self._lock:
+                self._entries[sql] = value
+                self._entries.move_to_end(sql)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
 class QueryResult:
     """The BV representation of a result of a query."""
 
@@ -43,6 +77,10 @@ class QueryResult:
     def rows(self) -> Iterator[List]:
         raise NotImplementedError
 
+    def record_batches(self) -> Optional[Iterator[Any]]:
+        """Arrow record batches of the result, for backends that produce them. Returning None falls back to `rows`."""
+        return None
+
     def status(self) -> str:
         raise NotImplementedError
 
@@ -60,6 +98,10 @@ class Session:
     def execute_sql(self, sql: str, params=None) -> QueryResult:
         raise NotImplementedError
 
+    def prepare_sql(self, sql: str):
+        """Called when a client prepares a statement, so backends can do per-statement work before it is executed."""
+        pass
+
     def in_transaction(self) -> bool:
         raise NotImplementedError
 
@@ -70,14 +112,33 @@ class Session:
 class Connection:
     """Translation layer from an upstream data source into the BV representation of a query result."""
 
-    def __init__(self):
+    def __init__(self, pool_size: int = 0):
         self._sessions = {}
+        # fresh sessions set up ahead of time; a session is never returned to the pool once used
+        self.pool_size = pool_size
+        self._pool = queue.SimpleQueue()
+        self._pool_lock = threading.Lock()
 
     def create_session(self) -> Session:
-        sess = self.new_session()
+        try:
+            sess = self._pool.get_nowait()
+        except queue.Empty:
+            sess = self.new_session()
         self._sessions[sess.id] = sess
         return sess
 
+    def fill_pool(self):
+        with self._pool_lock:
+            while self._pool.qsize() < self.pool_size:
+                self._pool.put(self.new_session())
+
+    def close_pool(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
     def get_session(self, id: int) -> Optional[Session]:
         return self._sessions.get(id)
 
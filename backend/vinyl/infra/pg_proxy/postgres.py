@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import hashlib
 import io
@@ -5,9 +6,16 @@ import json
 import logging
 import os
 import random
+import socket
 import socketserver
 import struct
-from typing import Dict, Optional
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import pyarrow as pa
+import pyarrow.compute as pc
 
 from vinyl.infra.pg_proxy.core import (
     BVType,
@@ -21,6 +29,9 @@ from vinyl.infra.pg_proxy.rewrite import Rewriter
 logger = logging.getLogger(__name__)
 
 NULL_BYTE = b"\x00"
+SSL_REQUEST_CODE = 80877103
+CANCEL_REQUEST_CODE = 80877102
+PROTOCOL_VERSION_3 = 196608
 
 
 class ServerResponse:
@@ -128,6 +139,122 @@ BVTYPE_TO_PGTYPE = {
 }
 
 
+_INT32 = struct.Struct("!i")
+_INT32_CELL = struct.Struct("!ii")
+_INT64_CELL = struct.Struct("!iq")
+_FLOAT64_CELL = struct.Struct("!id")
+_DATA_ROW_HEADER = struct.Struct("!cih")
+NULL_CELL = _INT32.pack(-1)
+TRUE_CELL = _INT32.pack(1) + b"\x01"
+FALSE_CELL = _INT32.pack(1) + b"\x00"
+# offsets of the postgres epoch (2000-01-01) from the unix epoch
+PG_EPOCH_DAYS = 10957
+PG_EPOCH_MICROS = PG_EPOCH_DAYS * 24 * 60 * 60 * 1000000
+
+
+def _bytes_cells(values: list[Optional[bytes]]) -> list[bytes]:
+    return [NULL_CELL if v is None else _INT32.pack(len(v)) + v for v in values]
+
+
+def _packed_cells(values: list, cell: struct.Struct, width: int) -> list[bytes]:
+    return [NULL_CELL if v is None else cell.pack(width, v) for v in values]
+
+
+def _converted_cells(values: list, converter: Callable, encode: bool) -> list[bytes]:
+    cells = []
+    for v in values:
+        if v is None:
+            cells.append(NULL_CELL)
+            continue
+        v = converter(v)
+        if encode:
+            v = v.encode("utf-8")
+        cells.append(_INT32.pack(len(v)) + v)
+    return cells
+
+
+def _as_binary(col: pa.Array) -> pa.Array:
+    # reinterprets utf8 data as bytes without copying, so to_pylist skips decoding
+    if pa.types.is_large_string(col.type):
+        return col.cast(pa.large_binary())
+    return col.cast(pa.binary())
+
+
+def _encode_text_column(col: pa.Array, bvtype: BVType) -> list[bytes]:
+    if bvtype == BVType.TEXT:
+        return _bytes_cells(_as_binary(col).to_pylist())
+    if bvtype in (BVType.BIGINT, BVType.INTEGER, BVType.BOOL, BVType.DATE):
+        # arrow's formatting of these matches the per-value converters
+        return _bytes_cells(_as_binary(pc.cast(col, pa.string())).to_pylist())
+    if bvtype == BVType.FLOAT:
+        return _converted_cells(col.to_pylist(), str, True)
+    converter = BVTYPE_TO_PGTYPE.get(bvtype, PG_UNKNOWN)[1]
+    return _converted_cells(col.to_pylist(), converter, True)
+
+
+def _encode_binary_column(col: pa.Array, bvtype: BVType) -> list[bytes]:
+    t = col.type
+    if bvtype == BVType.TEXT:
+        return _bytes_cells(_as_binary(col).to_pylist())
+    if bvtype == BVType.BOOL:
+        return [
+            NULL_CELL if v is None else TRUE_CELL if v else FALSE_CELL
+            for v in col.to_pylist()
+        ]
+    if bvtype == BVType.BIGINT:
+        return _packed_cells(col.to_pylist(), _INT64_CELL, 8)
+    if bvtype == BVType.INTEGER and pa.types.is_signed_integer(t):
+        return _packed_cells(col.to_pylist(), _INT32_CELL, 4)
+    if bvtype == BVType.FLOAT:
+        return _packed_cells(col.to_pylist(), _FLOAT64_CELL, 8)
+    if bvtype == BVType.DATE:
+        days = pc.cast(col.cast(pa.date32(), safe=False), pa.int32())
+        return _packed_cells(
+            pc.subtract(days, PG_EPOCH_DAYS).to_pylist(), _INT32_CELL, 4
+        )
+    if bvtype == BVType.TIME:
+        micros = pc.cast(col.cast(pa.time64("us"), safe=False), pa.int64())
+        return _packed_cells(micros.to_pylist(), _INT64_CELL, 8)
+    if bvtype == BVType.TIMESTAMP:
+        micros = pc.cast(col.cast(pa.timestamp("us", tz=t.tz), safe=False), pa.int64())
+        return _packed_cells(
+            pc.subtract(micros, PG_EPOCH_MICROS).to_pylist(), _INT64_CELL, 8
+        )
+    pgtype = BVTYPE_TO_PGTYPE.get(bvtype, PG_UNKNOWN)
+    if len(pgtype) < 3 or pgtype[2] is None:
+        raise Exception(f"Binary format is not supported for {bvtype}")
+    return _converted_cells(col.to_pylist(), pgtype[2], False)
+
+
+class DataRowEncoder:
+    """
+    Encodes Arrow record batches into DataRow messages a column at a time. Each column is converted in one pass, with arrow casts and packed structs for the common types, and the rows of a batch come back as a single buffer.
+    """
+
+    def __init__(self, bvtypes: list[BVType], result_format: Optional[list[int]]):
+        self.bvtypes = bvtypes
+        self.binary = [
+            bool(result_format and result_format[i] != 0) for i in range(len(bvtypes))
+        ]
+
+    def encode(self, batch: pa.RecordBatch) -> bytes:
+        ncols = len(self.bvtypes)
+        if ncols == 0:
+            return _DATA_ROW_HEADER.pack(ServerResponse.DATA_ROW, 6, 0) * batch.num_rows
+        columns = [
+            (_encode_binary_column if binary else _encode_text_column)(col, bvtype)
+            for col, bvtype, binary in zip(batch.columns, self.bvtypes, self.binary)
+        ]
+        out = []
+        for cells in zip(*columns):
+            body = b"".join(cells)
+            out.append(
+                _DATA_ROW_HEADER.pack(ServerResponse.DATA_ROW, len(body) + 6, ncols)
+            )
+            out.append(body)
+        return b"".join(out)
+
+
 class BVBuffer(object):
     """A helper for reading and writing bytes in the format the PG wire protocol expects."""
 
@@ -209,11 +336,15 @@ class BVContext:
                 return TransactionStatus.IN_TRANSACTION
         return TransactionStatus.IDLE
 
-    def execute_sql(self, sql: str, params=None, result_fmt=None) -> QueryResult:
-        logger.info("Input SQL: " + sql)
+    def rewrite_sql(self, sql: str) -> str:
         if self.rewriter:
-            sql = self.rewriter.rewrite(sql)
+            sql = self.rewriter.rewrite_cached(sql)
             logger.info("Rewritten SQL: " + sql)
+        return sql
+
+    def execute_sql(self, sql: str, params=None, result_fmt=None) -> QueryResult:
+        logger.info("Input SQL: " + sql)
+        sql = self.rewrite_sql(sql)
         qr = self.session.execute_sql(sql, params)
         if qr.has_results():
             if result_fmt and len(result_fmt) != qr.column_count():
@@ -249,6 +380,7 @@ class BVContext:
 
     def add_statement(self, name: str, sql: str, param_oids: list[int]):
         self.stmts[name] = (sql, param_oids)
+        self.session.prepare_sql(self.rewrite_sql(sql))
 
     def close_statement(self, name: str):
         del self.stmts[name]
@@ -288,58 +420,70 @@ class ProxyServerHandler(socketserver.StreamRequestHandler):
                     payload = self.r.read_bytes(msglen - 4)
                 else:
                     payload = None
-
-                if not ctx.authenticated:
-                    if type_code == ClientCommand.PASSWORD_MESSAGE:
-                        self.handle_md5_password(ctx, payload)
-                    else:
-                        raise Exception("Not authenticated")
-                elif type_code == ClientCommand.QUERY:
-                    self.handle_query(ctx, payload)
-                elif type_code == ClientCommand.PARSE:
-                    self.handle_parse(ctx, payload)
-                elif type_code == ClientCommand.BIND:
-                    self.handle_bind(ctx, payload)
-                elif type_code == ClientCommand.DESCRIBE:
-                    self.handle_describe(ctx, payload)
-                elif type_code == ClientCommand.EXECUTE:
-                    self.handle_execute(ctx, payload)
-                elif type_code == ClientCommand.CLOSE:
-                    self.handle_close(ctx, payload)
-                elif type_code == ClientCommand.SYNC:
-                    ctx.sync()
-                    self.send_ready_for_query(ctx)
-                elif type_code == ClientCommand.FLUSH:
-                    ctx.flush()
-                else:
-                    raise Exception("Unknown type_code: %s" % type_code)
+                self.handle_message(ctx, type_code, payload)
         except Exception as e:
             logger.exception(e)
             self.send_error(e)
 
+        self.close_context(ctx)
+
+    def handle_message(
+        self, ctx: BVContext, type_code: bytes, payload: Optional[bytes]
+    ):
+        if not ctx.authenticated:
+            if type_code == ClientCommand.PASSWORD_MESSAGE:
+                self.handle_md5_password(ctx, payload)
+            else:
+                raise Exception("Not authenticated")
+        elif type_code == ClientCommand.QUERY:
+            self.handle_query(ctx, payload)
+        elif type_code == ClientCommand.PARSE:
+            self.handle_parse(ctx, payload)
+        elif type_code == ClientCommand.BIND:
+            self.handle_bind(ctx, payload)
+        elif type_code == ClientCommand.DESCRIBE:
+            self.handle_describe(ctx, payload)
+        elif type_code == ClientCommand.EXECUTE:
+            self.handle_execute(ctx, payload)
+        elif type_code == ClientCommand.CLOSE:
+            self.handle_close(ctx, payload)
+        elif type_code == ClientCommand.SYNC:
+            ctx.sync()
+            self.send_ready_for_query(ctx)
+        elif type_code == ClientCommand.FLUSH:
+            ctx.flush()
+        else:
+            raise Exception("Unknown type_code: %s" % type_code)
+
+    def close_context(self, ctx: Optional[BVContext]):
         if ctx:
             self.server.conn.close_session(ctx.session)
-            del self.server.ctxts[ctx.process_id]
-            ctx = None
-
-    def handle_startup(self, conn: Connection) -> BVContext:
-        msglen = self.r.read_uint32() - 4
-        code = self.r.read_uint32()
-        if code == 80877103:  ## SSL request
-            self.send_notice()
-            return self.handle_startup(conn)
-        elif code == 196608:  # Protocol 3.0
-            msg = [
-                x.decode("utf-8")
-                for x in self.r.read_bytes(msglen - 4).split(NULL_BYTE)
-            ]
+            # a cancel request may have removed it already
+            self.server.ctxts.pop(ctx.process_id, None)
+
+    def handle_startup(self, conn: Connection) -> Optional[BVContext]:
+        while True:
+            msglen = self.r.read_uint32() - 4
+            code = self.r.read_uint32()
+            payload = self.r.read_bytes(msglen - 4)
+            if code == SSL_REQUEST_CODE:
+                self.send_notice()
+                continue
+            return self.handle_startup_message(conn, code, payload)
+
+    def handle_startup_message(
+        self, conn: Connection, code: int, payload: bytes
+    ) -> Optional[BVContext]:
+        if code == PROTOCOL_VERSION_3:
+            msg = [x.decode("utf-8") for x in payload.split(NULL_BYTE)]
             params = dict(zip(msg[::2], msg[1::2]))
             logger.info("Client connection params: %s", params)
             ctx = BVContext(conn.create_session(), self.server.rewriter, params)
             self.send_auth_request(ctx)
             return ctx
-        elif code == 80877102:  ## Cancel request
-            process_id, secret_key = self.r.read_uint32(), self.r.read_uint32()
+        elif code == CANCEL_REQUEST_CODE:
+            buf = BVBuffer(io.BytesIO(payload))
+            process_id, secret_key = buf.read_uint32(), buf.read_uint32()
             ctx = self.server.ctxts.get(process_id)
             if ctx and ctx.secret_key == secret_key:
                 self.server.conn.close_session(ctx.session)
@@ -549,6 +693,26 @@ class ProxyServerHandler(socketserver.StreamRequestHandler):
         self.wfile.write(sig + out)
 
     def send_data_rows(self, query_result: QueryResult, limit: int = 0) -> int:
+        batches = query_result.record_batches()
+        if batches is None:
+            return self.send_data_rows_by_row(query_result, limit)
+        encoder = DataRowEncoder(
+            [query_result.column(i)[1] for i in range(query_result.column_count())],
+            query_result.result_format,
+        )
+        cnt = 0
+        for batch in batches:
+            if limit > 0:
+                batch = batch.slice(0, limit - cnt)
+            if batch.num_rows == 0:
+                continue
+            self.wfile.write(encoder.encode(batch))
+            cnt += batch.num_rows
+            if limit > 0 and cnt >= limit:
+                break
+        return cnt
+
+    def send_data_rows_by_row(self, query_result: QueryResult, limit: int = 0) -> int:
         cnt = 0
         converters = []
         for i in range(query_result.column_count()):
@@ -666,3 +830,236 @@ class ProxyServer(socketserver.ThreadingTCPServer):
     def verify_request(self, request, client_address) -> bool:
         """Ensure all requests come from localhost until auth is in place"""
         return client_address[0] == "127.0.0.1" or "HOST" in os.environ
+
+
+class LoopWriter:
+    """
+    File-like writer for handler code running on executor threads. Writes are queued and sent by a task on the event loop, so a thread only waits once `max_pending` writes are still unsent. A client that accepts nothing for `timeout` seconds is treated as gone, which frees the thread instead of stalling it indefinitely.
+    """
+
+    def __init__(
+        self,
+        writer: asyncio.StreamWriter,
+        loop: asyncio.AbstractEventLoop,
+        max_pending: int = 16,
+        timeout: float = 60,
+    ):
+        self.writer = writer
+        self.loop = loop
+        self.timeout = timeout
+        self._slots = threading.Semaphore(max_pending)
+        self._pending = deque()
+        self._ready = asyncio.Event()
+        self._closed = False
+        self._sender = loop.create_task(self._send())
+
+    def _enqueue(self, data: bytes):
+        if self._closed:
+            self._slots.release()
+            return
+        self._pending.append(data)
+        self._ready.set()
+
+    async def _send(self):
+        try:
+            while not self._closed or self._pending:
+                if not self._pending:
+                    await self._ready.wait()
+                    self._ready.clear()
+                    continue
+                data = self._pending.popleft()
+                try:
+                    self.writer.write(data)
+                    await self.writer.drain()
+                finally:
+                    self._slots.release()
+        except ConnectionError:
+            pass
+        finally:
+            self._closed = True
+            # unblock handler threads still waiting for a slot
+            for _ in range(len(self._pending)):
+                self._slots.release()
+            self._pending.clear()
+
+    def write(self, data: bytes):
+        if self._closed:
+            raise ConnectionResetError("Client connection closed")
+        if not self._slots.acquire(timeout=self.timeout):
+            self.loop.call_soon_threadsafe(self.writer.transport.abort)
+            raise ConnectionResetError("Client stopped reading")
+        self.loop.call_soon_threadsafe(self._enqueue, data)
+
+    def flush(self):
+        pass
+
+    async def close(self):
+        # everything already queued is sent before the connection is closed
+        self._closed = True
+        self._ready.set()
+        try:
+            await asyncio.wait_for(self._sender, self.timeout)
+        except asyncio.TimeoutError:
+            self.writer.transport.abort()
+        self.writer.close()
+
+
+class AsyncProxyConnection(ProxyServerHandler):
+    """
+    Serves one client on the event loop of an `AsyncProxyServer`. Messages are read asynchronously and handed to the blocking `ProxyServerHandler` methods on the server's executor, which only holds a thread while a message is being handled. Startup and cleanup run on a separate executor, so clients can still connect and disconnect while every query thread is busy.
+    """
+
+    def __init__(
+        self,
+        server: "AsyncProxyServer",
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.wfile = LoopWriter(
+            writer,
+            asyncio.get_running_loop(),
+            max_pending=server.max_pending_writes,
+            timeout=server.write_timeout,
+        )
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.server.executor, func, *args
+        )
+
+    async def run_control(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.server.control_executor, func, *args
+        )
+
+    async def read_uint32(self) -> int:
+        return struct.unpack("!I", await self.reader.readexactly(4))[0]
+
+    async def startup(self) -> Optional[BVContext]:
+        while True:
+            msglen = await self.read_uint32()
+            body = await self.reader.readexactly(msglen - 4)
+            code = struct.unpack("!I", body[:4])[0]
+            if code == SSL_REQUEST_CODE:
+                await self.run_control(self.send_notice)
+                continue
+            return await self.run_control(
+                self.handle_startup_message, self.server.conn, code, body[4:]
+            )
+
+    async def handle(self):
+        ctx = None
+        try:
+            ctx = await self.startup()
+            if ctx:
+                self.server.ctxts[ctx.process_id] = ctx
+                # replace the pooled session this client took
+                self.server.fill_pool()
+            while ctx:
+                type_code = await self.reader.read(1)
+                if not type_code or type_code == ClientCommand.TERMINATE:
+                    break
+
+                msglen = await self.read_uint32()
+                if msglen > 4:
+                    payload = await self.reader.readexactly(msglen - 4)
+                else:
+                    payload = None
+                await self.run(self.handle_message, ctx, type_code, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # client went away
+            pass
+        except Exception as e:
+            logger.exception(e)
+            try:
+                await self.run_control(self.send_error, e)
+            except ConnectionError:
+                pass
+
+        try:
+            await self.run_control(self.close_context, ctx)
+        finally:
+            await self.wfile.close()
+
+
+class AsyncProxyServer:
+    """
+    Asyncio counterpart of `ProxyServer`. Clients are served from one event loop instead of a thread each, the blocking backend calls share a bounded executor, and new clients take sessions from a pool that is kept warm in the background.
+    """
+
+    def __init__(
+        self,
+        server_address,
+        conn: Connection,
+        *,
+        rewriter: Optional[Rewriter] = None,
+        extensions: list[Extension] = [],
+        auth: Optional[Dict[str, str]] = None,
+        max_workers: int = 8,
+        max_pending_writes: int = 16,
+        write_timeout: float = 60,
+    ):
+        self.conn = conn
+        self.rewriter = rewriter
+        self.extensions = {e.type(): e for e in extensions}
+        self.ctxts = {}
+        self.auth = auth
+        self.max_pending_writes = max_pending_writes
+        self.write_timeout = write_timeout
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pg_proxy"
+        )
+        # startup, cleanup and pool refills, kept apart from the query threads
+        self.control_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="pg_proxy_control"
+        )
+        # bound up front so `server_address` is known before serving, as with socketserver
+        self.socket = socket.create_server(server_address)
+        self.server_address = self.socket.getsockname()[:2]
+        self._loop = None
+        self._server = None
+
+    def verify_request(self, client_address) -> bool:
+        """Ensure all requests come from localhost until auth is in place"""
+        return client_address[0] == "127.0.0.1" or "HOST" in os.environ
+
+    def _fill_pool(self):
+        try:
+            self.conn.fill_pool()
+        except Exception as e:
+            logger.exception(e)
+
+    def fill_pool(self):
+        if self.conn.pool_size > 0:
+            self.control_executor.submit(self._fill_pool)
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        if not self.verify_request(writer.get_extra_info("peername")):
+            writer.close()
+            return
+        await AsyncProxyConnection(self, reader, writer).handle()
+
+    async def serve(self):
+        self._loop = asyncio.get_running_loop()
+        await self._loop.run_in_executor(self.control_executor, self._fill_pool)
+        self._server = await asyncio.start_server(self.handle_client, sock=self.socket)
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def serve_forever(self):
+        asyncio.run(self.serve())
+
+    def shutdown(self):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._server.close)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.control_executor.shutdown(wait=False, cancel_futures=True)
+        self.conn.close_pool()
@@ -3,6 +3,8 @@ from typing import Any, Callable, TypeVar
 import sqlglot
 import sqlglot.expressions as exp
 
+from vinyl.infra.pg_proxy.core import StatementCache
+
 DecoratedCallable = TypeVar("DecoratedCallable", bound=Callable[..., Any])
 
 
@@ -11,14 +13,19 @@ class Rewriter:
         self._relations = {}
         self._read = read
         self._write = write
+        self._cache = StatementCache()
 
     def relation(self, name: str) -> Callable[[DecoratedCallable], DecoratedCallable]:
         def decorator(func: DecoratedCallable) -> DecoratedCallable:
             self._relations[name] = func
+            self._cache.clear()
             return func
 
         return decorator
 
+    def rewrite_cached(self, sql: str) -> str:
+        return self._cache.get(sql, self.rewrite)
+
     def rewrite(self, sql: str) -> str:
         try:
             stmts = self._read.parse(sql)
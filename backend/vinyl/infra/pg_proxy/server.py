@@ -7,7 +7,7 @@ import duckdb
 
 from vinyl.infra.pg_proxy.backends.duckdb import DuckDBConnection
 from vinyl.infra.pg_proxy.bv_dialects import BVPostgres, BVDuckDB
-from vinyl.infra.pg_proxy.postgres import ProxyServer
+from vinyl.infra.pg_proxy.postgres import AsyncProxyServer, ProxyServer
 from vinyl.infra.pg_proxy.rewrite import Rewriter
 
 
@@ -42,9 +42,26 @@ class TurntableMetricsRewriter(Rewriter):
 rewriter = TurntableMetricsRewriter(BVPostgres(), BVDuckDB())
 
 
+PG_PROXY_ASYNC = os.getenv("PG_PROXY_ASYNC", "true") == "true"
+PG_PROXY_MAX_WORKERS = int(os.getenv("PG_PROXY_MAX_WORKERS", 8))
+PG_PROXY_SESSION_POOL_SIZE = int(os.getenv("PG_PROXY_SESSION_POOL_SIZE", 4))
+PG_PROXY_MAX_PENDING_WRITES = int(os.getenv("PG_PROXY_MAX_PENDING_WRITES", 16))
+PG_PROXY_WRITE_TIMEOUT = float(os.getenv("PG_PROXY_WRITE_TIMEOUT", 60))
+
+
 def create(
     db: duckdb.DuckDBPyConnection, host_addr: Tuple[str, int], auth: dict = None
-) -> ProxyServer:
+) -> ProxyServer | AsyncProxyServer:
+    if PG_PROXY_ASYNC:
+        return AsyncProxyServer(
+            host_addr,
+            DuckDBConnection(db, pool_size=PG_PROXY_SESSION_POOL_SIZE),
+            rewriter=rewriter,
+            auth=auth,
+            max_workers=PG_PROXY_MAX_WORKERS,
+            max_pending_writes=PG_PROXY_MAX_PENDING_WRITES,
+            write_timeout=PG_PROXY_WRITE_TIMEOUT,
+        )
     server = ProxyServer(host_addr, DuckDBConnection(db), rewriter=rewriter, auth=auth)
     return server
 
@@ -4,18 +4,21 @@ import itertools
 import json
 import os
 import secrets
+import threading
 import traceback
 from abc import ABC, abstractmethod
 from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing
 from dataclasses import asdict, dataclass, field
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterator, Optional
 
 import ibis
 import ibis.expr.types as ir
 import pandas as pd
+import pyarrow as pa
 from ibis import Schema
 from ibis.backends import BaseBackend
 from ibis.backends.duckdb import Backend as DuckDBBackend
@@ -36,11 +39,37 @@ from vinyl.lib.utils.text import (
 _TEMP_PATH_PREFIX = "vinyl_"
 _JOIN_STRING_HELPER = "_____"
 _PARALLEL_DB_THREADS = 10
+_QUERY_BATCH_SIZE = int(os.getenv("VINYL_QUERY_BATCH_SIZE", 5000))
 
 
 # NOTE: Starting in Ibis 10.0, Ibis now uses nomenclature for tables (i.e. catalog, database, name), that is distinct from how we usually think about it. Database, schema, name. Until we rename our variables, the variable naming will be confusing.
 
 
+def _arrow_from_df(df: pd.DataFrame) -> pa.Table:
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # mixed python objects (e.g. json values) can't be inferred, so they are kept as strings
+        object_columns = df.select_dtypes(include="object").columns
+        adj_df = df.astype({c: str for c in object_columns})
+        return pa.Table.from_pandas(adj_df, preserve_index=False)
+
+
+def _batches_from_df(
+    df: pd.DataFrame, batch_size: int = _QUERY_BATCH_SIZE
+) -> Iterator[pa.RecordBatch]:
+    yield from _arrow_from_df(df).to_batches(max_chunksize=batch_size)
+
+
+def _frames_from_df(
+    df: pd.DataFrame, batch_size: int = _QUERY_BATCH_SIZE
+) -> Iterator[pd.DataFrame]:
+    if df.empty:
+        yield df
+    for start in range(0, len(df), batch_size):
+        yield df.iloc[start : start + batch_size]
+
+
 @dataclass
 class SourceInfo:
     _name: str
@@ -49,9 +78,71 @@ class SourceInfo:
     _parent_resource: Any | None = None
 
 
+class _TwinProgress:
+    """Tables already copied into a twin, kept in a file next to it so an interrupted build resumes where it stopped."""
+
+    def __init__(self, twin_path: str):
+        self.path = f"{twin_path}.progress"
+        self._lock = threading.Lock()
+        self._completed = set()
+        if not os.path.exists(self.path):
+            return
+        if not os.path.exists(twin_path):
+            # progress is meaningless once the twin itself is gone
+            os.remove(self.path)
+            return
+        with open(self.path) as f:
+            for line in f:
+                self._completed.add(self._key(**json.loads(line)))
+
+    @staticmethod
+    def _key(
+        database: str,
+        schema: str,
+        table: str,
+        sample_row_count: int | None,
+        row_count: int | None = None,
+    ) -> tuple:
+        return (database, schema, table, sample_row_count)
+
+    def is_complete(
+        self, database: str, schema: str, table: str, sample_row_count: int | None
+    ) -> bool:
+        return self._key(database, schema, table, sample_row_count) in self._completed
+
+    def mark(
+        self,
+        database: str,
+        schema: str,
+        table: str,
+        sample_row_count: int | None,
+        row_count: int,
+    ):
+        entry = {
+            "database": database,
+            "schema": schema,
+            "table": table,
+            "sample_row_count": sample_row_count,
+            "row_count": row_count,
+        }
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._completed.add(self._key(**entry))
+
+    def clear(self):
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._completed.clear()
+
+
 class _ResourceConnector(ABC):
     """Base interface for handling connecting to resource and getting sources"""
 
+    # whether `run_query_iter` reads arrow batches from the driver, rather than converting dataframes
+    _streams_arrow: bool = False
+
     @abstractmethod
     def _list_sources(
         self, with_schema=False
@@ -71,6 +162,43 @@ class _ResourceConnector(ABC):
     ) -> tuple[pd.DataFrame, dict[str, str]]:
         pass
 
+    def run_query_iter(
+        self,
+        query: str,
+        limit: int | None = _QUERY_LIMIT,
+        bypass_limit_helper: bool = False,
+        batch_size: int = _QUERY_BATCH_SIZE,
+    ) -> tuple[Iterator[pa.RecordBatch], dict[str, str]]:
+        """
+        Runs the query and returns the column types along with a lazy iterator of arrow record batches. Connectors without a streaming driver api fall back to `run_query`.
+        """
+        frames, columns = self.run_query_frames(
+            query, limit, bypass_limit_helper, batch_size
+        )
+        return (
+            batch for df in frames for batch in _batches_from_df(df, batch_size)
+        ), columns
+
+    def run_query_frames(
+        self,
+        query: str,
+        limit: int | None = _QUERY_LIMIT,
+        bypass_limit_helper: bool = False,
+        batch_size: int = _QUERY_BATCH_SIZE,
+    ) -> tuple[Iterator[pd.DataFrame], dict[str, str]]:
+        """
+        Like `run_query_iter`, but yields dataframes of at most `batch_size` rows. Results the driver returns as python objects are never converted to arrow, which can't type values such as json objects.
+        """
+        if self._streams_arrow:
+            batches, columns = self.run_query_iter(
+                query, limit, bypass_limit_helper, batch_size
+            )
+            return (batch.to_pandas() for batch in batches), columns
+        df, columns = self.run_query(
+            query, limit=limit, bypass_limit_helper=bypass_limit_helper
+        )
+        return _frames_from_df(df, batch_size), columns
+
     @abstractmethod
     def validate_sql(self, query: str) -> ValidationOutput:
         pass
@@ -121,6 +249,8 @@ class _DatabaseConnector(_ResourceConnector):
     _excluded_dbs: list[str] = []
     _excluded_schemas: list[str] = []
     _excluded_tables: list[str] = []
+    # whether the backend from `_connect` can run queries from several threads at once
+    _thread_safe: bool = True
 
     def _expand_table_names(self, location: str) -> list[str]:
         db, sch, table = location.split(_JOIN_STRING_HELPER)
@@ -183,6 +313,86 @@ class _DatabaseConnector(_ResourceConnector):
                 traceback=traceback.format_exc(),
             )
 
+    def _bulk_columns_query(self, database: str) -> str | None:
+        """
+        Query returning (schema, table, column, data_type, is_nullable, numeric_precision, numeric_scale) for every column in `database`, ordered by column position. Connectors without one fall back to introspecting each table.
+        """
+        return None
+
+    def _bulk_type_mapper(self) -> Any:
+        return None
+
+    def _get_bulk_columns(self, database: str) -> list[tuple] | None:
+        query = self._bulk_columns_query(database)
+        if query is None:
+            return None
+        with closing(self._conn.raw_sql(query)) as cursor:
+            return cursor.fetchall()
+
+    @staticmethod
+    def _bulk_type_string(data_type: str, precision: Any, scale: Any) -> str:
+        # information_schema reports numerics without their precision and scale
+        if data_type.lower() in ("numeric", "decimal", "number") and precision:
+            return f"{data_type}({int(precision)},{int(scale or 0)})"
+        return data_type
+
+    def _sources_from_bulk_columns(
+        self,
+        database: str,
+        rows: list[tuple],
+        schema: str,
+        table: str,
+        with_schema: bool,
+    ) -> tuple[list[SourceInfo], list[str]]:
+        """
+        Builds sources for the tables in `rows` that match the `schema` and `table` patterns. Returns the names of tables whose column types couldn't be mapped, so they can be introspected individually.
+        """
+        columns_by_table: dict[tuple[str, str], list[tuple]] = {}
+        for sch, tbl, *column in rows:
+            if schema == "*":
+                if sch in self._excluded_schemas:
+                    continue
+            elif sch != schema:
+                continue
+            if table == "*":
+                if tbl in self._excluded_tables:
+                    continue
+            elif tbl != table:
+                continue
+            columns_by_table.setdefault((sch, tbl), []).append(column)
+
+        type_mapper = self._bulk_type_mapper()
+        sources = []
+        fallback_table_names = []
+        for (sch, tbl), columns in columns_by_table.items():
+            ibis_schema = None
+            if with_schema:
+                try:
+                    fields = []
+                    for name, data_type, is_nullable, precision, scale in columns:
+                        type_string = self._bulk_type_string(
+                            data_type, precision, scale
+                        )
+                        if is_nullable is None:
+                            dtype = type_mapper.from_string(type_string)
+                        else:
+                            dtype = type_mapper.from_string(
+                                type_string, nullable=is_nullable != "NO"
+                            )
+                        fields.append((name, dtype))
+                    ibis_schema = ibis.schema(fields)
+                except Exception:
+                    fallback_table_names.append(
+                        _JOIN_STRING_HELPER.join([database, sch, tbl])
+                    )
+                    continue
+            sources.append(
+                SourceInfo(
+                    _name=tbl, _location=f"{database}.{sch}", _schema=ibis_schema
+                )
+            )
+        return sources, fallback_table_names
+
     def _find_sources_in_db(
         self,
         databases_override: list[str] | None = None,
@@ -190,7 +400,10 @@ class _DatabaseConnector(_ResourceConnector):
     ) -> tuple[list[SourceInfo], list[VinylError]]:
         self._connect()
 
-        expanded_table_names = []
+        sources = []
+        unadj_tbl_names = []
+        fallback_table_names = []
+        bulk_columns = {}
 
         # get tables
         for loc in self._tables:
@@ -211,8 +424,21 @@ class _DatabaseConnector(_ResourceConnector):
             else:
                 adj_databases = [database]
 
-            unadj_tbl_names = []
             for db in adj_databases:
+                # one metadata query per database instead of a round trip per schema and table
+                if db not in bulk_columns:
+                    try:
+                        bulk_columns[db] = self._get_bulk_columns(db)
+                    except Exception:
+                        bulk_columns[db] = None
+                if bulk_columns[db] is not None:
+                    bulk_sources, bulk_fallbacks = self._sources_from_bulk_columns(
+                        db, bulk_columns[db], schema, table, with_schema
+                    )
+                    sources.extend(bulk_sources)
+                    fallback_table_names.extend(bulk_fallbacks)
+                    continue
+
                 if not self._allows_multiple_schemas:
                     adj_schemas = ["main"]
                 elif schema == "*":
@@ -228,38 +454,43 @@ class _DatabaseConnector(_ResourceConnector):
                 for sch in adj_schemas:
                     unadj_tbl_names.append(_JOIN_STRING_HELPER.join([db, sch, table]))
 
-        with WorkerPool(n_jobs=10, keep_alive=True) as pool:
-            nested_table_names = list(
-                tqdm(
-                    pool.imap_unordered(self._expand_table_names, unadj_tbl_names),
-                    total=len(unadj_tbl_names),
-                    desc="Getting table names...",
+        nested_table_names = []
+        if unadj_tbl_names:
+            with WorkerPool(n_jobs=10, keep_alive=True) as pool:
+                nested_table_names = list(
+                    tqdm(
+                        pool.imap_unordered(self._expand_table_names, unadj_tbl_names),
+                        total=len(unadj_tbl_names),
+                        desc="Getting table names...",
+                    )
                 )
-            )
 
         # flatten list
         expanded_table_names = list(itertools.chain(*nested_table_names))
 
         if with_schema:
             # make parallel calls to db
-            with WorkerPool(n_jobs=10, keep_alive=True) as pool:
-                results = list(
-                    tqdm(
-                        pool.imap_unordered(
-                            self._get_sources_for_table_names,
-                            [(pre, True) for pre in expanded_table_names],
-                        ),
-                        total=len(expanded_table_names),
-                        desc="Getting table schemas if required...",
+            expanded_table_names += fallback_table_names
+            results = []
+            if expanded_table_names:
+                with WorkerPool(n_jobs=10, keep_alive=True) as pool:
+                    results = list(
+                        tqdm(
+                            pool.imap_unordered(
+                                self._get_sources_for_table_names,
+                                [(pre, True) for pre in expanded_table_names],
+                            ),
+                            total=len(expanded_table_names),
+                            desc="Getting table schemas if required...",
+                        )
                     )
-                )
         else:
             # no need to make parallel calls
             results = [
                 self._get_sources_for_table_names(t, False)
                 for t in expanded_table_names
             ]
-        sources = [r[0] for r in results if r[0] is not None]
+        sources += [r[0] for r in results if r[0] is not None]
         errors = [r[1] for r in results if r[1] is not None]
         return sources, errors
 
@@ -270,7 +501,11 @@ class _DatabaseConnector(_ResourceConnector):
 
     @lru_cache()
     def _get_table(self, database: str, schema: str, table: str) -> ir.Table:
-        conn = self._connect()
+        return self._table_from(self._connect(), database, schema, table)
+
+    def _table_from(
+        self, conn: BaseBackend, database: str, schema: str, table: str
+    ) -> ir.Table:
         if not self._allows_multiple_databases and not self._allows_multiple_schemas:
             return conn.table(table)
         elif not self._allows_multiple_schemas:
@@ -281,6 +516,49 @@ class _DatabaseConnector(_ResourceConnector):
 
         return conn.table(database=(database, schema), name=table)
 
+    def _sample_for_twin(
+        self,
+        database: str,
+        schema: str,
+        table: str,
+        sample_row_count: int | None = 1000,
+        conn: BaseBackend | None = None,
+    ) -> ir.Table:
+        if conn is None:
+            tbl = self._get_table(database, schema, table)
+        else:
+            tbl = self._table_from(conn, database, schema, table)
+        if sample_row_count is None:
+            return tbl
+        row_count = tbl.count().execute()
+        if row_count <= sample_row_count:
+            return tbl
+        # compiles to TABLESAMPLE where the dialect supports it and to a random() filter elsewhere
+        return tbl.sample(sample_row_count / row_count, method="row")
+
+    def _twin_worker_connect(self) -> BaseBackend:
+        """
+        Returns the backend a twin worker thread samples through. Connectors whose `_connect` hands back a cached backend, and with it a single driver connection, override this to give each worker a fresh one.
+        """
+        return self._connect()
+
+    @staticmethod
+    def _write_twin_table(twin_con, schema: str, table: str, sampled: ir.Table) -> int:
+        # arrow batches are streamed into duckdb as they arrive rather than materialized first
+        reader = sampled.to_pyarrow_batches(chunk_size=_QUERY_BATCH_SIZE)
+        view_name = f"{_TEMP_PATH_PREFIX}{secrets.token_hex(8)}"
+        with closing(twin_con.cursor()) as cursor:
+            cursor.register(view_name, reader)
+            try:
+                cursor.execute(
+                    f'CREATE OR REPLACE TABLE "{schema}"."{table}" AS SELECT * FROM {view_name}'
+                )
+            finally:
+                cursor.unregister(view_name)
+            return cursor.execute(
+                f'SELECT count(*) FROM "{schema}"."{table}"'
+            ).fetchone()[0]
+
     def _generate_twin(
         self,
         twin_path: str,
@@ -289,40 +567,77 @@ class _DatabaseConnector(_ResourceConnector):
         table: str,
         sample_row_count: int | None = 1000,
     ) -> ir.Table:
-        tbl = self._get_table(database, schema, table)
-        if sample_row_count is None:
-            sampled = tbl
-        else:
-            row_count = tbl.count()
-            # using safer random() sample
-            sampled = tbl.filter(
-                ibis.random() < ibis.least(sample_row_count / row_count, 1)
-            )
-        pyarrow_table = sampled.to_pyarrow()
+        progress = _TwinProgress(twin_path)
         conn = self._create_twin_connection(twin_path)
-        # using raw sql to set the schema since the argument is not supported in the ibis api
-
-        # create final table
-        conn.raw_sql(f"CREATE SCHEMA IF NOT EXISTS {schema}")
-        conn.raw_sql(f"USE {schema}")
-        table_temp_name = f"table_{secrets.token_hex(8)}"
-        temp_table = conn.create_table(
-            table_temp_name, obj=pyarrow_table, overwrite=True
-        )
+        conn.raw_sql(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+        sampled = self._sample_for_twin(database, schema, table, sample_row_count)
+        row_count = self._write_twin_table(conn.con, schema, table, sampled)
+        progress.mark(database, schema, table, sample_row_count, row_count)
+        return conn.table(table, database=schema)
 
-        # reconnect to catch type errors
-        reconn = ibis.duckdb.connect(twin_path)
-        temp_table = reconn.table(table_temp_name, schema=schema)
-        original_types = sampled.schema().types
-        cast_dict = {}
-        for i, (name, type) in enumerate(temp_table.schema().items()):
-            cast_dict[name] = original_types[i]
-        temp_table = temp_table.cast(cast_dict)
+    def _generate_twins(
+        self,
+        twin_path: str,
+        tables: list[tuple[str, str, str]],
+        sample_row_count: int | None = 1000,
+        max_workers: int = _PARALLEL_DB_THREADS,
+        resume: bool = True,
+    ) -> list[VinylError]:
+        """
+        Copies samples of `tables`, given as (database, schema, table), into the twin at `twin_path`. Tables are sampled concurrently, and each finished table is recorded so that a rerun with `resume` skips it.
+        """
+        # read before connecting, which creates the twin file
+        progress = _TwinProgress(twin_path)
+        conn = self._create_twin_connection(twin_path)
+        if not resume:
+            progress.clear()
+        pending = [
+            (database, schema, table)
+            for database, schema, table in tables
+            if not progress.is_complete(database, schema, table, sample_row_count)
+        ]
+        # created up front, concurrent creates of the same schema would conflict
+        for schema in sorted(set(schema for _, schema, _ in pending)):
+            conn.raw_sql(f'CREATE SCHEMA IF NOT EXISTS "{schema}"')
+        if not self._thread_safe:
+            max_workers = 1
+        shared_conn = self._connect()
+        worker_conns = []
+        local = threading.local()
+
+        def generate(location: tuple[str, str, str]) -> VinylError | None:
+            database, schema, table = location
+            try:
+                if not hasattr(local, "conn"):
+                    local.conn = self._twin_worker_connect()
+                    worker_conns.append(local.conn)
+                sampled = self._sample_for_twin(
+                    database, schema, table, sample_row_count, conn=local.conn
+                )
+                row_count = self._write_twin_table(conn.con, schema, table, sampled)
+                progress.mark(database, schema, table, sample_row_count, row_count)
+                return None
+            except Exception as e:
+                return VinylError(
+                    node_id=f"{database}.{schema}.{table}",
+                    type=VinylErrorType.DATABASE_ERROR,
+                    dialect=None,
+                    msg=str(e),
+                    traceback=traceback.format_exc(),
+                )
 
-        # create final table and delete temp one
-        final_table = conn.create_table(table, obj=temp_table, overwrite=True)
-        conn.drop_table(table_temp_name)
-        return final_table
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(
+                tqdm(
+                    executor.map(generate, pending),
+                    total=len(pending),
+                    desc="Generating twins...",
+                )
+            )
+        for worker_conn in worker_conns:
+            if worker_conn is not shared_conn:
+                worker_conn.disconnect()
+        return [e for e in results if e is not None]
 
     def run_query(
         self,
@@ -376,6 +691,7 @@ class DatabaseFileConnector(_FileConnector, _DatabaseConnector):
         if use_sqlite:
             self._allows_multiple_databases = False
             self._allows_multiple_schemas = False
+            self._thread_safe = False
 
     def _list_sources(
         self, with_schema=False
@@ -385,12 +701,41 @@ class DatabaseFileConnector(_FileConnector, _DatabaseConnector):
         )
         return out, errors
 
+    def _bulk_columns_query(self, database: str) -> str | None:
+        if self._use_sqlite:
+            return None
+        return f"""
+            SELECT table_schema, table_name, column_name, data_type, is_nullable, numeric_precision, numeric_scale
+            FROM information_schema.columns
+            WHERE table_catalog = '{database}'
+            ORDER BY table_schema, table_name, ordinal_position
+        """
+
+    def _bulk_type_mapper(self) -> Any:
+        from ibis.backends.sql.datatypes import DuckDBType
+
+        return DuckDBType
+
+    def _get_bulk_columns(self, database: str) -> list[tuple] | None:
+        query = self._bulk_columns_query(database)
+        if query is None:
+            return None
+        # raw_sql hands back the shared duckdb connection, which must stay open
+        return self._conn.con.execute(query).fetchall()
+
     def _connect(self) -> DuckDBBackend:
         if self._use_sqlite:
             self._conn = self._connect_helper_sqlite(self._path)
             return self._conn
         return self._connect_helper_duckdb(self._conn, self._path)
 
+    def _twin_worker_connect(self) -> BaseBackend:
+        conn = self._connect()
+        if self._use_sqlite:
+            return conn
+        # a duckdb connection isn't safe to share across threads, a cursor onto it sees the same attached databases
+        return ibis.duckdb.from_connection(conn.con.cursor())
+
     @classmethod
     @lru_cache()
     def _connect_helper_duckdb(cls, conn: DuckDBBackend, path) -> DuckDBBackend:
@@ -486,6 +831,7 @@ class FileConnector(_FileConnector, _TableConnector):
 
 
 class BigQueryConnector(_DatabaseConnector):
+    _streams_arrow: bool = True
     _credentials: Any
     _BQ_ITERATOR_ROW_CUTOFF = 1000  # faster to use iterators for small datasets, but faster to download directly for large datasets
 
@@ -501,7 +847,7 @@ class BigQueryConnector(_DatabaseConnector):
         self._tables = tables
         self._project_id = project_id
 
-    def _connect(self) -> BaseBackend:
+    def _connect_args(self) -> dict[str, Any]:
         connect_args = {}
         if self._service_account_path is not None:
             connect_args["service_account_path"] = self._service_account_path
@@ -511,9 +857,16 @@ class BigQueryConnector(_DatabaseConnector):
             )
         if self._project_id is not None:
             connect_args["project_id"] = self._project_id
-        self._conn = BigQueryConnector._connect_helper(**connect_args)
+        return connect_args
+
+    def _connect(self) -> BaseBackend:
+        self._conn = BigQueryConnector._connect_helper(**self._connect_args())
         return self._conn
 
+    def _twin_worker_connect(self) -> BaseBackend:
+        # bypasses the cache, so workers don't share one client
+        return BigQueryConnector._connect_helper.__wrapped__(**self._connect_args())
+
     def _list_sources(self, with_schema=False) -> list[SourceInfo]:
         self._connect()
         out, errors = self._find_sources_in_db(
@@ -582,6 +935,28 @@ class BigQueryConnector(_DatabaseConnector):
 
         return df, columns
 
+    def run_query_iter(
+        self,
+        query: str,
+        limit: int | None = _QUERY_LIMIT,
+        bypass_limit_helper: bool = False,
+        batch_size: int = _QUERY_BATCH_SIZE,
+    ) -> tuple[Iterator[pa.RecordBatch], dict[str, str]]:
+        from google.cloud import bigquery_storage
+
+        conn = self._connect()
+        if not bypass_limit_helper:
+            query = query_limit_helper(query, limit)
+        rows = conn.client.query_and_wait(query, page_size=batch_size)
+        columns = {field.name: field.field_type for field in rows.schema}
+        bqstorage_client = None
+        if rows.total_rows >= self._BQ_ITERATOR_ROW_CUTOFF:
+            # the storage read api streams large results in parallel
+            bqstorage_client = bigquery_storage.BigQueryReadClient(
+                credentials=conn.client._credentials
+            )
+        return rows.to_arrow_iterable(bqstorage_client=bqstorage_client), columns
+
     def validate_sql(self, query: str) -> ValidationOutput:
         from google.cloud.bigquery import QueryJobConfig
 
@@ -651,17 +1026,37 @@ class PostgresConnector(_DatabaseConnector):
             raise ValueError("Postgres connector only supports one database at a time")
         self._database = dbs.pop()
 
+    def _connect_args(self) -> tuple:
+        return (self._host, self._port, self._user, self._password, self._database)
+
     def _connect(self) -> BaseBackend:
-        self._conn = self._connect_helper(
-            self._host, self._port, self._user, self._password, self._database
-        )
+        self._conn = self._connect_helper(*self._connect_args())
         return self._conn
 
+    def _twin_worker_connect(self) -> BaseBackend:
+        # a shared psycopg2 connection would serialize the workers, and one worker's commit would invalidate another's open named cursor
+        return self._connect_helper.__wrapped__(*self._connect_args())
+
+    _columns_view = "information_schema.columns"
+
     def _list_sources(self, with_schema=False) -> list[SourceInfo]:
         self._connect()
         out, errors = self._find_sources_in_db(with_schema=with_schema)
         return out, errors
 
+    def _bulk_columns_query(self, database: str) -> str | None:
+        # the connection is already scoped to `database`
+        return f"""
+            SELECT table_schema, table_name, column_name, data_type, is_nullable, numeric_precision, numeric_scale
+            FROM {self._columns_view}
+            ORDER BY table_schema, table_name, ordinal_position
+        """
+
+    def _bulk_type_mapper(self) -> Any:
+        from ibis.backends.sql.datatypes import PostgresType
+
+        return PostgresType
+
     def run_query(
         self,
         query: str,
@@ -685,6 +1080,55 @@ class PostgresConnector(_DatabaseConnector):
 
         return df, columns
 
+    def run_query_frames(
+        self,
+        query: str,
+        limit: int | None = _QUERY_LIMIT,
+        bypass_limit_helper: bool = False,
+        batch_size: int = _QUERY_BATCH_SIZE,
+    ) -> tuple[Iterator[pd.DataFrame], dict[str, str]]:
+        import psycopg2
+
+        conn = self._connect()
+        adj_query = query if bypass_limit_helper else query_limit_helper(query, limit)
+
+        # named cursors are server side, so rows are only transferred as they are fetched
+        cursor = conn.con.cursor(
+            name=f"{_TEMP_PATH_PREFIX}{secrets.token_hex(8)}", withhold=True
+        )
+        try:
+            cursor.execute(adj_query)
+            rows = cursor.fetchmany(batch_size)
+        except psycopg2.Error:
+            # statements that can't be declared as a cursor (e.g. explain) are run normally
+            cursor.close()
+            if not conn.con.autocommit:
+                conn.con.rollback()
+            return super().run_query_frames(
+                query, limit, bypass_limit_helper, batch_size
+            )
+
+        # named cursors only have a description after the first fetch
+        types_dict = {
+            **self._raw_types_dict,
+            **(cursor.string_types if cursor.string_types else {}),
+            **(cursor.binary_types if cursor.binary_types else {}),
+        }
+        columns = {
+            desc.name: types_dict.get(desc.type_code, self.PGTypeHelper()).name
+            for desc in cursor.description
+        }
+
+        def frames(rows):
+            with closing(cursor):
+                while len(rows) > 0:
+                    yield pd.DataFrame(rows, columns=[col for col in columns])
+                    if len(rows) < batch_size:
+                        break
+                    rows = cursor.fetchmany(batch_size)
+
+        return frames(rows), columns
+
     def validate_sql(self, query: str) -> ValidationOutput:
         import psycopg2
 
@@ -720,6 +1164,9 @@ class PostgresConnector(_DatabaseConnector):
 
 
 class RedshiftConnector(PostgresConnector):
+    # unlike information_schema, also covers late binding views and external tables
+    _columns_view = "svv_columns"
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -744,6 +1191,7 @@ class SnowflakeConnector(_DatabaseConnector):
     from snowflake.connector import constants
 
     _raw_types_dict = dict(constants.FIELD_ID_TO_NAME)
+    _streams_arrow: bool = True
     _account: str
     _user: str
     _password: str
@@ -763,17 +1211,34 @@ class SnowflakeConnector(_DatabaseConnector):
         self._warehouse = warehouse
         self._tables = tables
 
+    def _connect_args(self) -> tuple:
+        return (self._account, self._user, self._password, self._warehouse)
+
     def _connect(self) -> BaseBackend:
-        self._conn = self._connect_helper(
-            self._account, self._user, self._password, self._warehouse
-        )
+        self._conn = self._connect_helper(*self._connect_args())
         return self._conn
 
+    def _twin_worker_connect(self) -> BaseBackend:
+        # a snowflake connection runs one query at a time, so each worker gets its own
+        return self._connect_helper.__wrapped__(*self._connect_args())
+
     def _list_sources(self, with_schema=False) -> list[SourceInfo]:
         self._connect()
         out, errors = self._find_sources_in_db(with_schema=with_schema)
         return out, errors
 
+    def _bulk_columns_query(self, database: str) -> str | None:
+        return f"""
+            SELECT table_schema, table_name, column_name, data_type, is_nullable, numeric_precision, numeric_scale
+            FROM "{database}".information_schema.columns
+            ORDER BY table_schema, table_name, ordinal_position
+        """
+
+    def _bulk_type_mapper(self) -> Any:
+        from ibis.backends.sql.datatypes import SnowflakeType
+
+        return SnowflakeType
+
     # caching ensures we create one bq connection per set of credentials across instances of the class
     @staticmethod
     @lru_cache()
@@ -804,6 +1269,29 @@ class SnowflakeConnector(_DatabaseConnector):
             }
         return df, columns
 
+    def run_query_iter(
+        self,
+        query: str,
+        limit: int | None = _QUERY_LIMIT,
+        bypass_limit_helper: bool = False,
+        batch_size: int = _QUERY_BATCH_SIZE,
+    ) -> tuple[Iterator[pa.RecordBatch], dict[str, str]]:
+        conn = self._connect()
+        if not bypass_limit_helper:
+            query = query_limit_helper(query, limit)
+        cursor = conn.raw_sql(query)
+        columns = {
+            d.name: self._raw_types_dict.get(d.type_code, None)
+            for d in cursor.description
+        }
+
+        def batches():
+            with closing(cursor):
+                for table in cursor.fetch_arrow_batches():
+                    yield from table.to_batches(max_chunksize=batch_size)
+
+        return batches(), columns
+
     def run_query_no_arrow(
         self,
         query: str,
@@ -843,6 +1331,9 @@ class SnowflakeConnector(_DatabaseConnector):
 
 
 class DatabricksConnector(_DatabaseConnector):
+    _streams_arrow: bool = True
+    # databricks-sql connections can't be shared between threads
+    _thread_safe: bool = False
     _host: str
     _token: str
     _http_path: str
@@ -913,6 +1404,27 @@ class DatabricksConnector(_DatabaseConnector):
 
         return df, columns
 
+    def run_query_iter(
+        self,
+        query: str,
+        limit: int | None = _QUERY_LIMIT,
+        bypass_limit_helper: bool = False,
+        batch_size: int = _QUERY_BATCH_SIZE,
+    ) -> tuple[Iterator[pa.RecordBatch], dict[str, str]]:
+        conn = self._connect(use_spark=False)
+        if not bypass_limit_helper:
+            query = query_limit_helper(query, limit)
+        cursor = conn.cursor()
+        cursor.execute(query)
+        columns = {d[0]: d[1] for d in cursor.description}
+
+        def batches():
+            with closing(cursor):
+                while (table := cursor.fetchmany_arrow(batch_size)).num_rows > 0:
+                    yield from table.to_batches()
+
+        return batches(), columns
+
     def validate_sql(self, query: str) -> ValidationOutput:
         from databricks.sql.exc import ServerOperationError
 
@@ -938,6 +1450,8 @@ class ClickhouseConnector(_DatabaseConnector):
         "system",
     ]
     _allows_multiple_databases: bool = False
+    # a clickhouse session rejects concurrent queries
+    _thread_safe: bool = False
     _host: str
     _port: int
     _user: str
@@ -971,6 +1485,27 @@ class ClickhouseConnector(_DatabaseConnector):
         out, errors = self._find_sources_in_db(with_schema=with_schema)
         return out, errors
 
+    def _bulk_columns_query(self, database: str) -> str | None:
+        # clickhouse databases play the role of schemas, and nullability is part of the type
+        return """
+            SELECT database, table, name, type, NULL, NULL, NULL
+            FROM system.columns
+            WHERE database = %(database)s
+            ORDER BY database, table, position
+        """
+
+    def _bulk_type_mapper(self) -> Any:
+        from ibis.backends.sql.datatypes import ClickHouseType
+
+        return ClickHouseType
+
+    def _get_bulk_columns(self, database: str) -> list[tuple] | None:
+        # raw_sql doesn't take parameters, so the query is bound by the clickhouse client
+        result = self._conn.con.query(
+            self._bulk_columns_query(database), parameters={"database": database}
+        )
+        return result.result_rows
+
     def run_query(
         self,
         query: str,
@@ -1,18 +1,22 @@
 ## NOTE: can't name this file `dbt.py` or weird import errors will ensue.
+import hashlib
 import os
 import re
 import select
 import subprocess
 import sys
 import tempfile
+import threading
+import time
 import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import make_dataclass
 from io import StringIO
 from typing import Any, Callable, Generator
 
 import orjson
 import yaml
-from dbt_extractor import ExtractionError, py_extract_from_source
 
 from vinyl.lib.dbt_methods import (
     DBTArgs,
@@ -20,7 +24,9 @@ from vinyl.lib.dbt_methods import (
     DBTError,
     DBTVersion,
 )
+from vinyl.lib.dbt_worker import DBT_WORKER_POOL_ENABLED, DBTWorkerPool
 from vinyl.lib.errors import VinylError, VinylErrorType
+from vinyl.lib.utils.artifact_store import ArtifactStore, LazyArtifact
 from vinyl.lib.utils.env import set_env
 from vinyl.lib.utils.files import adjust_path, cd, file_exists_in_directory, load_orjson
 from vinyl.lib.utils.graph import DAG
@@ -30,11 +36,282 @@ from vinyl.lib.utils.query_limit_helper import query_limit_helper
 STREAM_SUCCESS_STRING = "PROCESS_STREAM_SUCCESS"
 STREAM_ERROR_STRING = "PROCESS_STREAM_ERROR"
 
+MANIFEST_CACHE_ENABLED = os.getenv("DBT_MANIFEST_CACHE", "true") == "true"
+MANIFEST_CACHE_SIZE = int(os.getenv("DBT_MANIFEST_CACHE_SIZE", 8))
+ARTIFACT_STORE_ENABLED = os.getenv("DBT_ARTIFACT_STORE", "false") == "true"
+CATALOG_CACHE_FILENAME = "catalog_cache.json"
+# relations can change outside this project's runs, so entries expire quickly
+CATALOG_CACHE_TTL = int(os.getenv("DBT_CATALOG_CACHE_TTL", 30 * 60))
+# sources have no checksum and never show up in run results, so they expire sooner still
+CATALOG_CACHE_SOURCE_TTL = int(os.getenv("DBT_CATALOG_CACHE_SOURCE_TTL", 5 * 60))
+
+
+def load_artifact(path: str) -> dict[str, Any] | LazyArtifact:
+    # with the artifact store enabled, artifacts are read node by node from an indexed sqlite copy
+    if ARTIFACT_STORE_ENABLED:
+        return LazyArtifact(ArtifactStore.open(path))
+    return load_orjson(path)
+
+
+def get_tree_fingerprint(project_dir: str) -> str | None:
+    """
+    Hashes a dbt project's working tree: the checked out commit, the contents of any dirty or untracked files, and the package specs and lock file. Returns None if the project is not in a git repo.
+    """
+    try:
+        toplevel, commit = (
+            subprocess.run(
+                ["git", "rev-parse", "--show-toplevel", "HEAD"],
+                cwd=project_dir,
+                capture_output=True,
+                check=True,
+            )
+            .stdout.decode()
+            .splitlines()
+        )
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "-z", "--untracked-files=all", "."],
+            cwd=project_dir,
+            capture_output=True,
+            check=True,
+        ).stdout
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return None
 
-def run_adjusted_replace(base_pattern_list, replacement, contents):
-    pattern = r"\s*".join(base_pattern_list)
-    adjusted_pattern = pattern
-    return re.sub(adjusted_pattern, replacement, contents)
+    hasher = hashlib.sha256()
+    hasher.update(commit.encode())
+    hasher.update(status)
+    for entry in status.decode().split("\0"):
+        path = os.path.join(toplevel, entry[3:])
+        if len(entry) > 3 and os.path.isfile(path):
+            with open(path, "rb") as f:
+                hasher.update(hashlib.sha256(f.read()).digest())
+    # installed packages aren't tracked by git, their specs and lock file stand in for them
+    for name in ["packages.yml", "dependencies.yml", "package-lock.yml"]:
+        path = os.path.join(project_dir, name)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                hasher.update(name.encode())
+                hasher.update(hashlib.sha256(f.read()).digest())
+    return hasher.hexdigest()
+
+
+class ManifestCache:
+    """
+    In-process lru cache of parsed manifests and the model graphs built from them. Entries are shared between `DBTProject` instances, so they must be treated as read-only.
+    """
+
+    def __init__(self, max_size: int = MANIFEST_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple, dict[str, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> dict[str, Any] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(
+        self, key: tuple, manifest: dict[str, Any], file_key: tuple | None = None
+    ) -> dict[str, Any]:
+        with self._lock:
+            entry = {"manifest": manifest, "model_graphs": {}, "file_key": file_key}
+            if key in self._entries:
+                self._close(self._entries[key])
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                _, evicted = self._entries.popitem(last=False)
+                self._close(evicted)
+            return entry
+
+    @staticmethod
+    def _close(entry: dict[str, Any]):
+        # releases the sqlite connection of a lazily loaded manifest
+        if isinstance(entry["manifest"], LazyArtifact):
+            entry["manifest"].store.close()
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                self._close(entry)
+            self._entries.clear()
+
+
+_MANIFEST_CACHE = ManifestCache()
+
+
+class CatalogCache:
+    """
+    Per-relation catalog entries persisted in the target directory. Each entry records when it was introspected and the relation and model checksum it was introspected for, so only relations that may have changed since are sent back to the warehouse.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = (
+            load_orjson(path) if os.path.exists(path) else {}
+        )
+
+    @classmethod
+    def get_fingerprint(cls, proj: "DBTProject", node_id: str) -> dict[str, Any]:
+        manifest_node = proj.get_manifest_node(node_id) or {}
+        return {
+            "relation": proj.get_relation_name(node_id),
+            "checksum": manifest_node.get("checksum", {}).get("checksum"),
+        }
+
+    def get_stale(
+        self,
+        proj: "DBTProject",
+        node_ids: list[str],
+        touched_at: dict[str, float],
+        now: float,
+    ) -> list[str]:
+        """
+        A relation is stale if it was never introspected, its relation name or model changed, it was run after it was introspected, or its entry is older than `CATALOG_CACHE_TTL` (`CATALOG_CACHE_SOURCE_TTL` for sources).
+        """
+        stale = []
+        for node_id in node_ids:
+            entry = self.entries.get(node_id)
+            ttl = (
+                CATALOG_CACHE_SOURCE_TTL
+                if node_id.startswith("source.")
+                else CATALOG_CACHE_TTL
+            )
+            if (
+                entry is None
+                or now - entry["refreshed_at"] > ttl
+                or touched_at.get(node_id, 0) > entry["refreshed_at"]
+                or entry["fingerprint"] != self.get_fingerprint(proj, node_id)
+            ):
+                stale.append(node_id)
+        return stale
+
+    def update(
+        self,
+        proj: "DBTProject",
+        node_ids: list[str],
+        catalog: dict[str, Any],
+        now: float,
+    ):
+        for node_id in node_ids:
+            section = "sources" if node_id.startswith("source.") else "nodes"
+            # relations that don't exist in the warehouse yet are cached as missing
+            catalog_node = (catalog.get(section) or {}).get(node_id)
+            self.entries[node_id] = {
+                "section": section,
+                "node": catalog_node,
+                "fingerprint": self.get_fingerprint(proj, node_id),
+                "refreshed_at": now,
+            }
+
+    def save(self):
+        with open(self.path, "wb") as f:
+            f.write(orjson.dumps(self.entries))
+
+    def to_catalog(self, node_ids: list[str]) -> dict[str, Any]:
+        catalog = {"nodes": {}, "sources": {}, "errors": None}
+        for node_id in node_ids:
+            entry = self.entries.get(node_id)
+            if entry is not None and entry["node"] is not None:
+                catalog[entry["section"]][node_id] = entry["node"]
+        return catalog
+
+
+_MATERIALIZED_TYPES = ("model", "snapshot", "seed")
+
+
+class FastCompiler:
+    """
+    Compiles dbt sql without invoking dbt by substituting `ref`, `source` and `this` with relation names from the manifest and dropping `config` blocks. All substitutions are made in one pass of a single precompiled pattern, and relation names are resolved once per manifest, so compiling many nodes only pays for the scan of each file.
+    """
+
+    pattern = re.compile(
+        r"{{\s*(?:"
+        r"ref\s*\(\s*[\"']\s*(?P<ref>[^\"']+?)\s*[\"']\s*\)"
+        r"|source\s*\(\s*[\"']\s*(?P<source>[^\"']+?)\s*[\"']\s*,"
+        r"\s*[\"']\s*(?P<table>[^\"']+?)\s*[\"']\s*\)"
+        r"|(?P<this>this)"
+        r")\s*}}"
+        r"|(?P<config>{{\s*config\s*\([\s\S]*?\)\s*}})"
+    )
+
+    def __init__(self, proj: "DBTProject"):
+        self.proj = proj
+        self.manifest = proj.manifest
+        self.proj_name = proj.dbt_project_yml["name"]
+        macro_dir = os.path.join(proj.dbt_project_dir, "macros")
+        # custom ref and source macros can't be resolved statically
+        self.replace_refs = not file_exists_in_directory("ref.sql", macro_dir)
+        self.replace_sources = not file_exists_in_directory("source.sql", macro_dir)
+        self._relation_names: dict[str, str | None] = {}
+
+    def get_relation_name(self, node_id: str) -> str | None:
+        if node_id not in self._relation_names:
+            section = "sources" if node_id.startswith("source.") else "nodes"
+            self._relation_names[node_id] = (
+                self.proj.get_relation_name(node_id)
+                if node_id in self.manifest[section]
+                else None
+            )
+        return self._relation_names[node_id]
+
+    def _replace(self, match: re.Match, node_id: str | None) -> str:
+        if match["config"] is not None:
+            return ""
+        relation_name = None
+        if match["ref"] is not None:
+            if self.replace_refs:
+                relation_name = self.get_relation_name(
+                    f"model.{self.proj_name}.{match['ref']}"
+                )
+        elif match["source"] is not None:
+            if self.replace_sources:
+                relation_name = self.get_relation_name(
+                    f"source.{self.proj_name}.{match['source']}.{match['table']}"
+                )
+        elif node_id is not None and node_id.split(".")[0] in _MATERIALIZED_TYPES:
+            relation_name = self.get_relation_name(node_id)
+        return match[0] if relation_name is None else relation_name
+
+    def compile(self, dbt_sql: str, node_id: str | None = None) -> str | None:
+        contents = self.pattern.sub(lambda m: self._replace(m, node_id), dbt_sql)
+        # any jinja left over, e.g. an `is_incremental()` block around `this`, needs a real dbt compile
+        if any(token in contents for token in ("{{", "{%", "{#")):
+            return None
+        return contents
+
+    def compile_node(self, node_id: str) -> str | None:
+        model_path = self.manifest["nodes"].get(node_id, {}).get("original_file_path")
+        if not model_path:
+            return None
+        with open(os.path.join(self.proj.dbt_project_dir, model_path), "r") as f:
+            dbt_sql = f.read()
+        if not dbt_sql:
+            return None
+        return self.compile(dbt_sql, node_id=node_id)
+
+    def compile_nodes(
+        self, node_ids: list[str], max_workers: int | None = None
+    ) -> tuple[dict[str, str], list[str]]:
+        """
+        Compiles `node_ids` on a thread pool. Returns the compiled sql by node id and the nodes that couldn't be fast compiled and need a real `dbt compile`.
+        """
+        max_workers = max_workers or self.proj.max_threads
+        if max_workers > 1 and len(node_ids) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(self.compile_node, node_ids))
+        else:
+            results = [self.compile_node(node_id) for node_id in node_ids]
+        compiled = {}
+        fallbacks = []
+        for node_id, sql in zip(node_ids, results):
+            if sql is None:
+                fallbacks.append(node_id)
+            else:
+                compiled[node_id] = sql
+        return compiled, fallbacks
 
 
 class DBTProject(object):
@@ -55,6 +332,7 @@ class DBTProject(object):
     version: DBTVersion
     version_list: list[int]
     deferral_target_path: str | None
+    manifest_cache_key: tuple | None = None
 
     supported_api_versions = [DBTVersion.V1_8]
     supported_api_dialects = [
@@ -167,20 +445,91 @@ class DBTProject(object):
             return False
         return True
 
+    def get_source_fingerprint(self, defer: bool = False) -> str | None:
+        """
+        Hashes everything a `dbt parse` depends on: the project's working tree (see `get_tree_fingerprint`), the profile, env vars and deferral manifest. Returns None if the project is not in a git repo, in which case nothing is cached.
+        """
+        tree_fingerprint = get_tree_fingerprint(self.dbt_project_dir)
+        if tree_fingerprint is None:
+            return None
+
+        hasher = hashlib.sha256()
+        hasher.update(tree_fingerprint.encode())
+        profiles_path = os.path.join(self.dbt_profiles_dir, "profiles.yml")
+        if os.path.exists(profiles_path):
+            with open(profiles_path, "rb") as f:
+                hasher.update(f.read())
+        hasher.update(orjson.dumps(self.env_vars, option=orjson.OPT_SORT_KEYS))
+        if defer and self.deferral_target_path:
+            deferral_manifest_path = os.path.join(
+                self.deferral_target_path, "manifest.json"
+            )
+            if os.path.exists(deferral_manifest_path):
+                stat = os.stat(deferral_manifest_path)
+                hasher.update(f"{stat.st_mtime_ns}:{stat.st_size}".encode())
+        return hasher.hexdigest()
+
+    def _read_manifest(self, key: tuple | None):
+        if key is None or not MANIFEST_CACHE_ENABLED:
+            self.manifest_cache_key = None
+            self.manifest = load_artifact(self.manifest_path)
+            return
+        entry = _MANIFEST_CACHE.get(key)
+        if entry is None:
+            entry = _MANIFEST_CACHE.set(
+                key,
+                load_artifact(self.manifest_path),
+                file_key=self._get_manifest_file_key(),
+            )
+        self.manifest_cache_key = key
+        self.manifest = entry["manifest"]
+
+    def _get_manifest_file_key(self) -> tuple | None:
+        # manifests read from disk are keyed by the file itself, since they may be stale relative to the project files
+        if not os.path.exists(self.manifest_path):
+            return None
+        stat = os.stat(self.manifest_path)
+        return ("file", self.manifest_path, stat.st_mtime_ns, stat.st_size)
+
     def mount_manifest(
         self, read=True, force_read=False, force_run=False, defer: bool = False
     ):
         if hasattr(self, "manifest") and not force_run and not force_read:
             return self.manifest
         elif force_run or not os.path.exists(self.manifest_path):
+            source_key = None
+            if MANIFEST_CACHE_ENABLED and read:
+                fingerprint = self.get_source_fingerprint(defer=defer)
+                if fingerprint is not None:
+                    source_key = ("source", self.dbt_project_dir, defer, fingerprint)
+                    entry = _MANIFEST_CACHE.get(source_key)
+                    # the manifest on disk must still be the one this entry was read from, since later commands read it from the target directory
+                    if (
+                        entry is not None
+                        and entry["file_key"] == self._get_manifest_file_key()
+                    ):
+                        # nothing dbt parses has changed since this manifest was built
+                        self.manifest_cache_key = source_key
+                        self.manifest = entry["manifest"]
+                        if hasattr(self, "model_graph"):
+                            del self.model_graph
+                        return self.manifest
+
             stdout, stderr, success = self.dbt_parse(defer=defer)
             if not success:
                 raise Exception(
                     f"Failed to parse manifest. Stdout: {stdout}, Stderr: {stderr}"
                 )
+            if source_key is not None:
+                self._read_manifest(source_key)
+                if hasattr(self, "model_graph"):
+                    del self.model_graph
+                return self.manifest
 
         if read:
-            self.manifest = load_orjson(self.manifest_path)
+            self._read_manifest(self._get_manifest_file_key())
+            if hasattr(self, "model_graph"):
+                del self.model_graph
 
         elif (force_read or force_run) and hasattr(self, "manifest"):
             # make sure you don't accidentally read an outdated manifest in the future
@@ -201,6 +550,14 @@ class DBTProject(object):
         self.mount_manifest()
         if hasattr(self, "model_graph") and not rebuild:
             return self.model_graph
+        entry = (
+            _MANIFEST_CACHE.get(self.manifest_cache_key)
+            if self.manifest_cache_key is not None
+            else None
+        )
+        if entry is not None and include_sources in entry["model_graphs"]:
+            self.model_graph = entry["model_graphs"][include_sources]
+            return self.model_graph
         # build networkx graph
         dag = DAG()
         for parent, children in self.manifest["child_map"].items():
@@ -223,6 +580,8 @@ class DBTProject(object):
         dag.remove_nodes_and_reconnect(nodes_to_remove)
 
         self.model_graph = dag
+        if entry is not None:
+            entry["model_graphs"][include_sources] = dag
         return dag
 
     def get_ancestors_and_descendants(
@@ -245,9 +604,13 @@ class DBTProject(object):
         defer: bool = False,
         partial: bool = False,
         partial_nodes: list[str] | None = None,
+        incremental_nodes: list[str] | None = None,
     ):
         if hasattr(self, "catalog") and not force_run and not force_read:
             return self.catalog
+        elif incremental_nodes is not None:
+            self.catalog = self._mount_catalog_incremental(incremental_nodes, defer)
+            return self.catalog
         elif force_run or not os.path.exists(self.catalog_path):
             _, _, success = self.dbt_docs_generate(
                 defer=defer, partial=partial, partial_nodes=partial_nodes
@@ -267,13 +630,101 @@ class DBTProject(object):
                     else:
                         self.catalog[key].update(new_val)
             else:
-                self.catalog = load_orjson(self.catalog_path)
+                self.catalog = load_artifact(self.catalog_path)
         elif (force_read or force_run) and hasattr(self, "catalog"):
             # make sure you don't accidentally read an outdated artifact in the future
             del self.catalog
 
         return self.catalog
 
+    def _get_run_times(self) -> dict[str, float]:
+        # nodes in the last run results may have changed shape in the warehouse
+        if not os.path.exists(self.run_results_path):
+            return {}
+        run_at = os.path.getmtime(self.run_results_path)
+        run_results = load_orjson(self.run_results_path)
+        return {r["unique_id"]: run_at for r in run_results.get("results", [])}
+
+    @staticmethod
+    def _get_selector(node_id: str) -> str:
+        # a bare table name doesn't select a source
+        if node_id.startswith("source."):
+            _, _, source_name, table = node_id.split(".", 3)
+            return f"source:{source_name}.{table}"
+        return node_id.split(".")[-1]
+
+    def _mount_catalog_incremental(
+        self, node_ids: list[str], defer: bool = False
+    ) -> dict[str, Any]:
+        """
+        Builds a catalog for `node_ids` from the catalog cache, introspecting only stale relations with a single partial `dbt docs generate`.
+        """
+        self.mount_manifest(defer=defer)
+        cache = CatalogCache(os.path.join(self.target_path, CATALOG_CACHE_FILENAME))
+        now = time.time()
+        node_ids = [
+            n
+            for n in node_ids
+            if n.split(".")[0] in ["model", "snapshot", "seed", "source"]
+            and self.get_manifest_node(n) is not None
+        ]
+        stale = cache.get_stale(self, node_ids, self._get_run_times(), now)
+        if stale:
+            _, _, success = self.dbt_docs_generate(
+                defer=defer,
+                partial=True,
+                partial_nodes=[self._get_selector(n) for n in stale],
+            )
+            if not success:
+                raise Exception("Failed to generate catalog")
+            cache.update(self, stale, load_orjson(self.catalog_path), now)
+            cache.save()
+
+        catalog = cache.to_catalog(node_ids)
+        deferral_catalog_path = (
+            os.path.join(self.deferral_target_path, "catalog.json")
+            if defer and self.deferral_target_path
+            else None
+        )
+        if deferral_catalog_path and os.path.exists(deferral_catalog_path):
+            # relations missing from the dev warehouse fall back to the deferred catalog
+            deferral_catalog = load_artifact(deferral_catalog_path)
+            for node_id in node_ids:
+                section = "sources" if node_id.startswith("source.") else "nodes"
+                if (
+                    node_id not in catalog[section]
+                    and node_id in deferral_catalog[section]
+                ):
+                    catalog[section][node_id] = deferral_catalog[section][node_id]
+        return catalog
+
+    def get_manifest_node(self, node_id: str, defer: bool = False) -> dict | None:
+        self.mount_manifest(defer=defer)
+        for key in ["nodes", "sources"]:
+            if node_id in self.manifest[key]:
+                return self.manifest[key][node_id]
+        return None
+
+    def get_catalog_node(self, node_id: str, defer: bool = False) -> dict | None:
+        self.mount_catalog(defer=defer)
+        for key in ["nodes", "sources"]:
+            if node_id in self.catalog[key]:
+                return self.catalog[key][node_id]
+        return None
+
+    def get_node_id_from_filepath(
+        self, filepath: str, defer: bool = False
+    ) -> str | None:
+        self.mount_manifest(defer=defer)
+        if isinstance(self.manifest, LazyArtifact):
+            # indexed lookup, so no node has to be deserialized
+            node_ids = self.manifest.store.find_by_path("nodes", filepath)
+            return node_ids[0] if node_ids else None
+        for node_id, node in self.manifest["nodes"].items():
+            if node["original_file_path"] == filepath:
+                return node_id
+        return None
+
     def get_project_yml_files(self):
         with open(os.path.join(self.dbt_project_dir, "dbt_project.yml"), "r") as f:
             self.dbt_project_yml = yaml.load(f, yaml.CLoader)
@@ -358,6 +809,63 @@ class DBTProject(object):
             if not current_dir or current_dir != orig_cwd:
                 os.chdir(orig_cwd)
 
+    @property
+    def use_worker_pool(self) -> bool:
+        return DBT_WORKER_POOL_ENABLED and self.can_use_dbt_api
+
+    def get_worker_pool(self) -> DBTWorkerPool:
+        return DBTWorkerPool.get(
+            getattr(self.version, "value", self.version),
+            getattr(self.dialect, "value", self.dialect),
+        )
+
+    def _get_worker_manifest_key(
+        self, command: list[str], defer: bool = False
+    ) -> str | None:
+        # workers only reuse a parsed manifest while nothing dbt parses has changed
+        if "--vars" in command:
+            return None
+        fingerprint = self.get_source_fingerprint(defer=defer)
+        if fingerprint is None:
+            return None
+        return f"{self.dbt_project_dir}:{self.target_path}:{defer}:{fingerprint}"
+
+    def dbt_pool_runner(
+        self, command: list[str], defer: bool = False
+    ) -> tuple[str, str, bool]:
+        env, _ = self._dbt_cli_env(full_os_env=False)
+        return self.get_worker_pool().run(
+            command, env, self._get_worker_manifest_key(command, defer)
+        )
+
+    def dbt_pool_stream(
+        self,
+        command: list[str],
+        should_terminate: Callable[[], bool] = None,
+        defer: bool = False,
+    ) -> Generator[str, None, None]:
+        env, _ = self._dbt_cli_env(full_os_env=False)
+        events = self.get_worker_pool().stream(
+            command,
+            env,
+            self._get_worker_manifest_key(command, defer),
+            should_terminate=should_terminate,
+        )
+        while True:
+            try:
+                event = next(events)
+            except StopIteration as e:
+                if e.value is None:
+                    # terminated before dbt finished
+                    return
+                stdout, stderr, success = e.value
+                break
+            yield event["msg"] + "\n"
+        if stderr:
+            yield stderr
+        success = success and self.check_command_success(stdout, stderr)
+        yield STREAM_SUCCESS_STRING if success else STREAM_ERROR_STRING
+
     def _dbt_cli_env(self, full_os_env: bool = True):
         env = self.env_vars.copy()
         if self.dbt_profiles_dir:
@@ -524,7 +1032,9 @@ class DBTProject(object):
             defer,
             defer_selection,
         )
-        if self.can_use_dbt_api and not force_terminal:
+        if self.use_worker_pool and not force_terminal:
+            return self.dbt_pool_runner(full_command, defer=defer)
+        elif self.can_use_dbt_api and not force_terminal:
             return self.dbt_runner(full_command)
 
         else:
@@ -550,7 +1060,11 @@ class DBTProject(object):
             defer_selection=defer_selection,
             use_colors=True,
         )
-        if self.can_use_dbt_api and not force_terminal:
+        if self.use_worker_pool and not force_terminal:
+            yield from self.dbt_pool_stream(
+                full_command, should_terminate=should_terminate, defer=defer
+            )
+        elif self.can_use_dbt_api and not force_terminal:
             # self.install_dbt_if_necessary()
             # TODO: make streaming work for python api
             yield from self.dbt_cli_stream(
@@ -562,10 +1076,20 @@ class DBTProject(object):
             )
 
     def dbt_parse(self, defer: bool = False) -> tuple[str, str, bool]:
+        # parses go to the worker pool when it's enabled, where later commands reuse the manifest
+        force_terminal = not self.use_worker_pool
         if self.dbt1_5:
-            return self.run_dbt_command(["parse"], write_json=True, defer=defer)
+            return self.run_dbt_command(
+                ["parse"],
+                write_json=True,
+                defer=defer,
+                force_terminal=force_terminal,
+            )
         return self.run_dbt_command(
-            ["parse", "--write-manifest"], write_json=True, defer=defer
+            ["parse", "--write-manifest"],
+            write_json=True,
+            defer=defer,
+            force_terminal=force_terminal,
         )
 
     def dbt_compile(
@@ -590,12 +1114,8 @@ class DBTProject(object):
             full_node_list = self.get_ancestors_and_descendants(
                 node_ids, predecessor_depth, successor_depth
             )
-            adj_full_node_list = []
             if fast_compile:
-                for node_id in full_node_list:
-                    sql = self.fast_compile_node(node_id)
-                    if sql is None:
-                        adj_full_node_list.append(node_id)
+                _, adj_full_node_list = self.fast_compile_nodes(full_node_list)
             else:
                 adj_full_node_list = full_node_list
 
@@ -628,6 +1148,7 @@ class DBTProject(object):
             command,
             write_json=write_json,
             dbt_cache=dbt_cache,
+            force_terminal=not self.use_worker_pool,
             defer=defer,
             defer_selection=defer_selection,
         )
@@ -899,89 +1420,15 @@ class DBTProject(object):
                 contents = orjson.loads(last_line)
             return contents["data"]["preview"] if data else contents["data"]["compiled"]
 
-    def _replace_sources_and_refs(self, contents):
-        self.mount_manifest()
-        self.get_project_yml_files()
-        try:
-            extracted = py_extract_from_source(contents)
-        except ExtractionError:
-            return contents
-
-        new_contents = contents
-        manifest_info = self.manifest
-        nodes = manifest_info["nodes"]
-        sources = manifest_info["sources"]
-        proj_name = self.dbt_project_yml["name"]
-        macro_dir = os.path.join(self.dbt_project_dir, "macros")
-        # check if user has custom ref macro
-        if not file_exists_in_directory("ref.sql", macro_dir):
-            for ref in extracted["refs"]:
-                model_name = ref["name"]
-                package_name = ref.get("package", proj_name)
-                base_pattern_list = [
-                    r"{{",
-                    r"ref",
-                    r"\(",
-                    r"[\"']",
-                    re.escape(model_name),
-                    r"[\"']",
-                    r"\)",
-                    r"}}",
-                ]
-                node_id = f"model.{package_name}.{model_name}"
-                if node_id in nodes:
-                    replacement = self.get_relation_name(node_id)
-                    new_contents = run_adjusted_replace(
-                        base_pattern_list, replacement, new_contents
-                    )
-
-        # check if user has custom source macro
-        if not file_exists_in_directory("source.sql", macro_dir):
-            for source in extracted["sources"]:
-                base_pattern_list = [
-                    r"{{",
-                    r"source",
-                    r"\(",
-                    r"[\"']",
-                    re.escape(source[0]),
-                    r"[\"']",
-                    r",",
-                    r"[\"']",
-                    re.escape(source[1]),
-                    r"[\"']",
-                    r"\)",
-                    r"}}",
-                ]
-                source_id = f"source.{proj_name}.{source[0]}.{source[1]}"
-                if source_id in sources:
-                    replacement = self.get_relation_name(source_id)
-                    new_contents = run_adjusted_replace(
-                        base_pattern_list, replacement, new_contents
-                    )
-        return new_contents
-
-    def _replace_configs_and_this(
-        self, contents: str, model_node_string: str | None = None
-    ):
+    def get_fast_compiler(self) -> FastCompiler:
         self.mount_manifest()
         self.get_project_yml_files()
-
-        new_contents = contents
-        pattern = r"{{\s*config\s*\([\s\S]*?\)\s*}}"
-        new_contents = re.sub(
-            pattern, lambda x: "", new_contents, flags=re.MULTILINE | re.DOTALL
-        )
-        if model_node_string is not None:
-            base_pattern_list = [
-                r"{{",
-                r"this",
-                r"}}",
-            ]
-            replacement = self.get_relation_name(model_node_string)
-            new_contents = run_adjusted_replace(
-                base_pattern_list, replacement, new_contents
-            )
-        return new_contents
+        # rebuilt whenever a new manifest is mounted
+        compiler = getattr(self, "_fast_compiler", None)
+        if compiler is None or compiler.manifest is not self.manifest:
+            compiler = FastCompiler(self)
+            self._fast_compiler = compiler
+        return compiler
 
     def fast_compile(self, dbt_sql: str):
         self.mount_manifest()
@@ -992,33 +1439,30 @@ class DBTProject(object):
 
         if not dbt_sql:
             raise ValueError("dbt_sql is empty")
-        contents = self._replace_sources_and_refs(dbt_sql)
-        contents = self._replace_configs_and_this(contents)
-        # if there are still jinja vars, then we failed to fast compile
-        if "{{" in contents:
-            return None
-        return contents
-
-    def fast_compile_node(self, node_id: str) -> str | None:
-        self.mount_manifest()
-        model_path = self.manifest["nodes"].get(node_id, {}).get("original_file_path")
-        if not model_path:
-            return None
-        model_abs_path = os.path.join(self.dbt_project_dir, model_path)
-        with open(model_abs_path, "r") as f:
-            dbt_sql = f.read()
-        sql = self.fast_compile(dbt_sql)
-        if sql:
+        return self.get_fast_compiler().compile(dbt_sql)
+
+    def fast_compile_nodes(
+        self, node_ids: list[str], max_workers: int | None = None
+    ) -> tuple[dict[str, str], list[str]]:
+        """
+        Fast compiles `node_ids` in one batch and writes the compiled files where `dbt compile` would. Returns the compiled sql by node id and the nodes that fell back.
+        """
+        compiler = self.get_fast_compiler()
+        compiled, fallbacks = compiler.compile_nodes(node_ids, max_workers=max_workers)
+        for node_id, sql in compiled.items():
             compiled_sql_abs_path = os.path.join(
                 self.compiled_sql_path,
                 node_id.split(".")[1],
-                model_path,
+                self.manifest["nodes"][node_id]["original_file_path"],
             )
-            print(compiled_sql_abs_path)
+            os.makedirs(os.path.dirname(compiled_sql_abs_path), exist_ok=True)
             with open(compiled_sql_abs_path, "w") as f:
                 f.write(sql)
-            return sql
-        return None
+        return compiled, fallbacks
+
+    def fast_compile_node(self, node_id: str) -> str | None:
+        compiled, _ = self.fast_compile_nodes([node_id])
+        return compiled.get(node_id)
 
     def get_introspective_models(self):
         self.build_macro_graph()
@@ -1070,8 +1514,13 @@ class DBTTransition:
         defer: bool = False,
         partial: bool = False,
         partial_nodes: list[str] | None = None,
+        incremental_nodes: list[str] | None = None,
     ):
-        self.before.mount_catalog()
+        if incremental_nodes is None:
+            self.before.mount_catalog()
+        elif not os.path.exists(self.before.catalog_path):
+            # incremental catalogs only read the deferred nodes they need, so it just has to exist
+            self.before.dbt_docs_generate()
         self.after.mount_catalog(
             read=read,
             force_run=force_run,
@@ -1079,4 +1528,5 @@ class DBTTransition:
             defer=defer,
             partial=partial,
             partial_nodes=partial_nodes,
+            incremental_nodes=incremental_nodes,
         )
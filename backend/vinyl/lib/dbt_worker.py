@@ -0,0 +1,298 @@
+## Pool of long-lived dbt processes driven over stdin/stdout. Run as `python -m vinyl.lib.dbt_worker <dialect>` to start a worker.
+import atexit
+import importlib
+import os
+import queue
+import subprocess
+import sys
+import threading
+from collections import OrderedDict
+from io import StringIO
+from typing import Any, Callable, Generator
+
+import orjson
+
+DBT_WORKER_POOL_ENABLED = os.getenv("DBT_WORKER_POOL", "false") == "true"
+DBT_WORKER_POOL_SIZE = int(os.getenv("DBT_WORKER_POOL_SIZE", 2))
+DBT_WORKER_MANIFEST_CACHE_SIZE = int(os.getenv("DBT_WORKER_MANIFEST_CACHE_SIZE", 4))
+
+# commands that can run against a manifest parsed by an earlier invocation
+MANIFEST_REUSE_COMMANDS = {
+    "build",
+    "compile",
+    "docs",
+    "list",
+    "ls",
+    "run",
+    "seed",
+    "show",
+    "snapshot",
+    "test",
+}
+STREAMED_LOG_LEVELS = {"info", "warn", "error"}
+
+
+def get_subcommand(command: list[str]) -> str | None:
+    for arg in command:
+        if not arg.startswith("-"):
+            return arg
+    return None
+
+
+class DBTWorkerError(Exception):
+    pass
+
+
+class DBTWorker:
+    """
+    A single dbt process that has already imported dbt and its adapter. Commands are sent as orjson lines on stdin and answered with `event` lines followed by one `result` line on stdout.
+    """
+
+    def __init__(self, dialect: str):
+        self.dialect = dialect
+        root = os.path.dirname(
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        )
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.pathsep.join(
+            [root, *filter(None, [env.get("PYTHONPATH")])]
+        )
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "vinyl.lib.dbt_worker", dialect],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def stop(self):
+        if self.is_alive():
+            self.process.kill()
+        self.process.wait()
+
+    def invoke(
+        self,
+        command: list[str],
+        env: dict[str, str],
+        manifest_key: str | None = None,
+        stream: bool = False,
+    ) -> Generator[dict[str, Any], None, tuple[str, str, bool]]:
+        request = {
+            "command": command,
+            "env": env,
+            "manifest_key": manifest_key,
+            "stream": stream,
+        }
+        try:
+            self.process.stdin.write(orjson.dumps(request) + b"\n")
+            self.process.stdin.flush()
+        except BrokenPipeError as e:
+            raise DBTWorkerError("dbt worker exited unexpectedly") from e
+
+        for line in self.process.stdout:
+            message = orjson.loads(line)
+            if message["type"] == "event":
+                yield message
+            elif message["type"] == "result":
+                return message["stdout"], message["stderr"], message["success"]
+        raise DBTWorkerError("dbt worker exited unexpectedly")
+
+
+class DBTWorkerPool:
+    """
+    Pre-warmed dbt workers for one dbt version and adapter. Each worker runs one command at a time, so concurrent callers never share the process-wide stream redirection that `dbtRunner` relies on.
+    """
+
+    _pools: dict[tuple[str, str], "DBTWorkerPool"] = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, dialect: str, size: int = DBT_WORKER_POOL_SIZE):
+        self.dialect = dialect
+        self.size = size
+        self._idle: queue.LifoQueue[DBTWorker] = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        # start one worker up front so the first command doesn't pay for the imports
+        self._idle.put(DBTWorker(dialect))
+
+    @classmethod
+    def get(cls, version: str, dialect: str) -> "DBTWorkerPool":
+        key = (version, dialect)
+        with cls._pools_lock:
+            if key not in cls._pools:
+                cls._pools[key] = cls(dialect)
+            return cls._pools[key]
+
+    @classmethod
+    def shutdown(cls):
+        with cls._pools_lock:
+            for pool in cls._pools.values():
+                pool.stop()
+            cls._pools.clear()
+
+    def stop(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().stop()
+
+    def _acquire(self) -> DBTWorker:
+        self._slots.acquire()
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            if worker.is_alive():
+                return worker
+            worker.stop()
+        try:
+            return DBTWorker(self.dialect)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, worker: DBTWorker, healthy: bool):
+        if healthy and worker.is_alive():
+            self._idle.put(worker)
+        else:
+            worker.stop()
+        self._slots.release()
+
+    def run(
+        self,
+        command: list[str],
+        env: dict[str, str],
+        manifest_key: str | None = None,
+    ) -> tuple[str, str, bool]:
+        worker = self._acquire()
+        healthy = False
+        try:
+            events = worker.invoke(command, env, manifest_key)
+            while True:
+                try:
+                    next(events)
+                except StopIteration as e:
+                    healthy = True
+                    return e.value
+        finally:
+            self._release(worker, healthy)
+
+    def stream(
+        self,
+        command: list[str],
+        env: dict[str, str],
+        manifest_key: str | None = None,
+        should_terminate: Callable[[], bool] | None = None,
+    ) -> Generator[dict[str, Any], None, tuple[str, str, bool] | None]:
+        worker = self._acquire()
+        healthy = False
+        try:
+            events = worker.invoke(command, env, manifest_key, stream=True)
+            while True:
+                if should_terminate is not None and should_terminate():
+                    # the worker is killed rather than returned mid-command
+                    return None
+                try:
+                    yield next(events)
+                except StopIteration as e:
+                    healthy = True
+                    return e.value
+        finally:
+            self._release(worker, healthy)
+
+
+atexit.register(DBTWorkerPool.shutdown)
+
+
+def _run_command(
+    runner_cls,
+    request: dict[str, Any],
+    manifests: OrderedDict,
+    send: Callable[[dict[str, Any]], None],
+):
+    from vinyl.lib.utils.env import set_env
+    from vinyl.lib.utils.patch import with_libyaml, with_orjson
+
+    command = request["command"]
+    manifest_key = request["manifest_key"]
+    subcommand = get_subcommand(command)
+    manifest = None
+    if manifest_key is not None and subcommand in MANIFEST_REUSE_COMMANDS:
+        manifest = manifests.get(manifest_key)
+
+    callbacks = []
+    if request["stream"]:
+
+        def forward_event(event):
+            if event.info.level in STREAMED_LOG_LEVELS and event.info.msg:
+                send(
+                    {
+                        "type": "event",
+                        "name": event.info.name,
+                        "level": event.info.level,
+                        "msg": event.info.msg,
+                    }
+                )
+
+        callbacks.append(forward_event)
+
+    stdout_buffer = StringIO()
+    stderr_buffer = StringIO()
+    orig_cwd = os.getcwd()
+    sys.stdout = stdout_buffer
+    sys.stderr = stderr_buffer
+    try:
+        with set_env(**request["env"]), with_orjson(), with_libyaml():
+            runner = runner_cls(manifest=manifest, callbacks=callbacks)
+            result = runner.invoke(command, send_anonymous_usage_stats=False)
+    except Exception as e:
+        stderr_buffer.write(f"{type(e).__name__}: {e}\n")
+        success = False
+    else:
+        success = result.success
+        if success and subcommand == "parse" and manifest_key is not None:
+            manifests[manifest_key] = result.result
+            manifests.move_to_end(manifest_key)
+            while len(manifests) > DBT_WORKER_MANIFEST_CACHE_SIZE:
+                manifests.popitem(last=False)
+    finally:
+        sys.stdout = sys.__stdout__
+        sys.stderr = sys.__stderr__
+        try:
+            current_dir = os.getcwd()
+        except OSError:
+            current_dir = None
+        if not current_dir or current_dir != orig_cwd:
+            os.chdir(orig_cwd)
+
+    send(
+        {
+            "type": "result",
+            "stdout": stdout_buffer.getvalue(),
+            "stderr": stderr_buffer.getvalue(),
+            "success": success,
+        }
+    )
+
+
+def main(dialect: str):
+    # keep a private handle on stdout for the protocol, and send anything else written to fd 1 (e.g. by subprocesses dbt starts) to stderr
+    protocol_out = os.fdopen(os.dup(1), "wb")
+    os.dup2(2, 1)
+    sys.__stdout__ = sys.stdout = os.fdopen(1, "w", closefd=False)
+
+    def send(message: dict[str, Any]):
+        protocol_out.write(orjson.dumps(message) + b"\n")
+        protocol_out.flush()
+
+    from dbt.cli.main import dbtRunner
+
+    try:
+        importlib.import_module(f"dbt.adapters.{dialect}")
+    except ImportError:
+        pass
+
+    manifests = OrderedDict()
+    for line in sys.stdin.buffer:
+        _run_command(dbtRunner, orjson.loads(line), manifests, send)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -1,3 +1,5 @@
+import copy
+import hashlib
 import json
 import re
 import typing as t
@@ -7,6 +9,7 @@ from typing import Any, Callable, Sequence
 import ibis.expr.datatypes as dt
 import ibis.expr.schema as sch
 import networkx as nx
+import sqlglot
 import sqlglot.expressions as sge
 from datahub.metadata.urns import DatasetUrn
 from sqlglot import Expression, exp
@@ -31,10 +34,13 @@ from sqlglot.optimizer.unnest_subqueries import unnest_subqueries
 from vinyl.lib.errors import VinylError, VinylErrorType
 from vinyl.lib.schema import VinylSchema
 from vinyl.lib.table import VinylTable
+from vinyl.lib.utils.cache import get_sqlast_cache
 from vinyl.lib.utils.graph import DAG
 from vinyl.lib.utils.text import _generate_random_ascii_string
 
 DIALECTS_ALLOWING_IMPLICIT_CATALOG = ["postgres", "clickhouse"]
+# bump when the shape of cached optimize or lineage entries changes
+SQLAST_CACHE_FORMAT_VERSION = 1
 
 
 class Catalog(dict[str, sch.Schema]):
@@ -241,6 +247,16 @@ def union_helper(ast, name_override: str | None = None):
         return [(name, new_ast)]
 
 
+def get_schema_fingerprint(schema: dict[exp.Table, VinylSchema]) -> list[Any]:
+    return sorted(
+        [
+            table.sql() if isinstance(table, exp.Expression) else str(table),
+            sorted((str(name), str(dtype)) for name, dtype in table_schema.items()),
+        ]
+        for table, table_schema in schema.items()
+    )
+
+
 class SQLAstNode:
     join_str = "_____"
 
@@ -269,6 +285,7 @@ class SQLAstNode:
         self.lineage = lineage
         self.use_datahub_nodes = use_datahub_nodes
         self.default_db = default_db
+        self.cache_key: str | None = None
         if append_key_casing != "upper":
             self.append_key = "_" + _generate_random_ascii_string(10)
         else:
@@ -385,9 +402,61 @@ class SQLAstNode:
             ]
         return self
 
+    def get_cache_key(self, rules: Sequence[Callable[..., Any]]) -> str:
+        payload = json.dumps(
+            [
+                self.ast.sql(dialect=self.dialect),
+                str(self.dialect),
+                self.id,
+                sorted(self.deps),
+                get_schema_fingerprint(self.schema),
+                get_schema_fingerprint(self.deps_schemas),
+                self.use_datahub_nodes,
+                self.default_db,
+                [rule.__name__ for rule in rules],
+                # cached asts are only readable by the sqlglot version that pickled them
+                sqlglot.__version__,
+                SQLAST_CACHE_FORMAT_VERSION,
+            ]
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
     def optimize(self, rules: Sequence[Callable[..., Any]] = RULES):
         if self.errors != []:
             return self
+        cache = get_sqlast_cache()
+        if cache is not None:
+            try:
+                self.cache_key = self.get_cache_key(rules)
+            except Exception:
+                self.cache_key = None
+        if cache is not None and self.cache_key is not None:
+            cached = cache.get(f"optimize:{self.cache_key}")
+            if cached is not None:
+                # the append key is baked into the cached ast, so it must be restored with it
+                self.ast = cached["ast"]
+                self.schema = cached["schema"]
+                self.deps_schemas = cached["deps_schemas"]
+                self.append_key = cached["append_key"]
+                self.errors += cached["errors"]
+                return self
+
+        self._optimize(rules)
+
+        if cache is not None and self.cache_key is not None:
+            cache.set(
+                f"optimize:{self.cache_key}",
+                {
+                    "ast": self.ast,
+                    "schema": self.schema,
+                    "deps_schemas": self.deps_schemas,
+                    "append_key": self.append_key,
+                    "errors": self.errors,
+                },
+            )
+        return self
+
+    def _optimize(self, rules: Sequence[Callable[..., Any]] = RULES):
         self = self.qualify()
         if self.errors != []:
             return self
@@ -445,12 +514,79 @@ class SQLAstNode:
                     tbl.set("alias", tbl.name)
         return sources
 
+    def _get_lineage_cache_key(self, lineage_filters: list[str]) -> str:
+        return f"lineage:{self.cache_key}:{','.join(sorted(lineage_filters))}"
+
+    def _get_cached_lineage(self, lineage_filters: list[str]) -> DAG | None:
+        cache = get_sqlast_cache()
+        if cache is None or self.cache_key is None:
+            return None
+        cached = cache.get(self._get_lineage_cache_key(lineage_filters))
+        if cached is None:
+            return None
+        self.lineage = DAG()
+        for node in cached["nodes"]:
+            self.lineage.add_node(node)
+        for u, v, data in cached["edges"]:
+            self.lineage.add_edge(u, v, data)
+        self.errors += cached["errors"]
+        return self.lineage
+
+    def _set_cached_lineage(self, lineage_filters: list[str], num_errors: int):
+        cache = get_sqlast_cache()
+        if cache is None or self.cache_key is None:
+            return
+        cache.set(
+            self._get_lineage_cache_key(lineage_filters),
+            {
+                "nodes": list(self.lineage.g.nodes()),
+                "edges": [
+                    (u, v, self.lineage.g.get_edge_data(ui, vi))
+                    for (u, v), (ui, vi) in zip(
+                        self.lineage.get_edge_tuples(), self.lineage.g.edge_list()
+                    )
+                ],
+                "errors": self.errors[num_errors:],
+            },
+        )
+
     def get_lineage(self, lineage_filters: list[str] = [], overwrite: bool = False):
         if self.lineage is not None and not overwrite:
             return self.lineage
 
-        self.lineage = DAG()
+        if (cached := self._get_cached_lineage(lineage_filters)) is not None:
+            return cached
+
+        num_errors = len(self.errors)
+        out = self.build_lineage(self.get_lineage_edges(), lineage_filters)
+        if isinstance(out, DAG):
+            self._set_cached_lineage(lineage_filters, num_errors)
+        return out
+
+    def get_lineages(self, lineage_filters_list: list[list[str]]) -> list["SQLAstNode"]:
+        """
+        Walks the ast once and returns a shallow copy of the node for each set of lineage filters, each with its lineage populated. Equivalent to deep copying the node and calling `get_lineage` once per set of filters.
+        """
+        nodes = []
+        lineage_edges = None
+        for lineage_filters in lineage_filters_list:
+            node = copy.copy(self)
+            node.errors = list(self.errors)
+            node.lineage = None
+            if node._get_cached_lineage(lineage_filters) is None:
+                if lineage_edges is None:
+                    lineage_edges = self.get_lineage_edges()
+                num_errors = len(node.errors)
+                if isinstance(node.build_lineage(lineage_edges, lineage_filters), DAG):
+                    node._set_cached_lineage(lineage_filters, num_errors)
+            nodes.append(node)
+        return nodes
 
+    def get_lineage_edges(self) -> list[tuple[str, str, str, str]]:
+        """
+        Walks the ast and returns every raw lineage edge as a `(from, to, ntype, category)` tuple, in the order they should be added to the lineage graph. `category` is the lineage filter that gates the edge, which can differ from its ntype (e.g. `having` edges are gated by `filter`).
+        """
+        edges = []
         sources = self.lineage_sources_helper()
 
         for k, cte in sources:
@@ -458,41 +594,53 @@ class SQLAstNode:
             if not scope:
                 continue
             # Get information for non-select columns
-            wheres = []
-            havings = []
-            qualifies = []
-            groupbys = []
-            joins = []
-            if not lineage_filters or "filter" in lineage_filters:
-                for li in scope.find_all(exp.Where):
-                    for lj in li.find_all(exp.Column):
-                        wheres += [lj.sql(dialect=self.dialect, comments=False)]
-
-                for li in scope.find_all(exp.Having):
-                    for lj in li.find_all(exp.Column):
-                        havings += [lj.sql(dialect=self.dialect, comments=False)]
-
-                for li in scope.find_all(exp.Qualify):
-                    for lj in li.find_all(exp.Column):
-                        qualifies += [lj.sql(dialect=self.dialect, comments=False)]
-            if not lineage_filters or "group_by" in lineage_filters:
-                for li in scope.find_all(exp.Group):
-                    for lj in li.find_all(exp.Column):
-                        groupbys += [lj.sql(dialect=self.dialect, comments=False)]
-            if not lineage_filters or "join_key" in lineage_filters:
-                for li in scope.find_all(exp.Join):
-                    if li.args.get("on") is not None:
-                        for lj in li.args.get("on").find_all(exp.Column):
-                            joins += [lj.sql(dialect=self.dialect, comments=False)]
-
-            non_select = wheres + groupbys + havings + qualifies + joins
-            non_select_type = (
-                ["filter" for i in wheres]
-                + ["group_by" for i in groupbys]
-                + ["having" for i in havings]
-                + ["qualify" for i in qualifies]
-                + ["join_key" for i in joins]
-            )
+            non_select = []
+            for li in scope.find_all(exp.Where):
+                for lj in li.find_all(exp.Column):
+                    non_select += [
+                        (
+                            lj.sql(dialect=self.dialect, comments=False),
+                            "filter",
+                            "filter",
+                        )
+                    ]
+            for li in scope.find_all(exp.Group):
+                for lj in li.find_all(exp.Column):
+                    non_select += [
+                        (
+                            lj.sql(dialect=self.dialect, comments=False),
+                            "group_by",
+                            "group_by",
+                        )
+                    ]
+            for li in scope.find_all(exp.Having):
+                for lj in li.find_all(exp.Column):
+                    non_select += [
+                        (
+                            lj.sql(dialect=self.dialect, comments=False),
+                            "having",
+                            "filter",
+                        )
+                    ]
+            for li in scope.find_all(exp.Qualify):
+                for lj in li.find_all(exp.Column):
+                    non_select += [
+                        (
+                            lj.sql(dialect=self.dialect, comments=False),
+                            "qualify",
+                            "filter",
+                        )
+                    ]
+            for li in scope.find_all(exp.Join):
+                if li.args.get("on") is not None:
+                    for lj in li.args.get("on").find_all(exp.Column):
+                        non_select += [
+                            (
+                                lj.sql(dialect=self.dialect, comments=False),
+                                "join_key",
+                                "join_key",
+                            )
+                        ]
 
             # get named windows
             named_windows_cols = {}
@@ -519,6 +667,7 @@ class SQLAstNode:
                 select_ = selects_[
                     0
                 ]  # removes everything but the pure select clause (e.g. filters)
+                from_ = (str(k) + "." + sel.alias_or_name).replace('"', "")
 
                 # get select col type
                 select_parse = find_characters_between_equal_and_parenthesis(
@@ -534,40 +683,36 @@ class SQLAstNode:
                     select_type = "as_is"
 
                 # build select graph
-                if not lineage_filters or select_type in lineage_filters:
-                    for c in select_.find_all(exp.Column):
-                        add_sel_edge(
-                            self.lineage,
-                            k,
-                            sel,
-                            c.sql(dialect=self.dialect, comments=False)
-                            .replace('"', "")
-                            .replace("`", ""),
-                            [select_type],
-                        )
+                for c in select_.find_all(exp.Column):
+                    to_ = (
+                        c.sql(dialect=self.dialect, comments=False)
+                        .replace('"', "")
+                        .replace("`", "")
+                    )
+                    edges.append((from_, to_, select_type, select_type))
 
                 # handle aliased windows
-                if not lineage_filters or "transform" in lineage_filters:
-                    for w in select_.find_all(exp.Window):
-                        if w.alias != "" and w.alias in named_windows_cols:
-                            for col_name in named_windows_cols[w.alias]:
-                                add_sel_edge(
-                                    self.lineage,
-                                    k,
-                                    sel,
-                                    col_name,
-                                    ["transform"],
-                                )
+                for w in select_.find_all(exp.Window):
+                    if w.alias != "" and w.alias in named_windows_cols:
+                        for col_name in named_windows_cols[w.alias]:
+                            edges.append((from_, col_name, "transform", "transform"))
 
                 # build non-select graph
-                for i, c2 in enumerate(non_select):
-                    add_sel_edge(
-                        self.lineage,
-                        k,
-                        sel,
-                        c2.replace('"', "").replace("`", ""),
-                        [non_select_type[i]],
-                    )
+                for c2, ntype, category in non_select:
+                    to_ = c2.replace('"', "").replace("`", "")
+                    edges.append((from_, to_, ntype, category))
+
+        return edges
+
+    def build_lineage(
+        self,
+        lineage_edges: list[tuple[str, str, str, str]],
+        lineage_filters: list[str] = [],
+    ):
+        self.lineage = DAG()
+        for from_, to_, ntype, category in lineage_edges:
+            if not lineage_filters or category in lineage_filters:
+                self.lineage.add_edge(from_, to_, {"ntype": {ntype}})
 
         # remove trivial nodes
         ids = [ix.this.this for ix in {**self.deps_schemas, **self.schema}]
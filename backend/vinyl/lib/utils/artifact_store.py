@@ -0,0 +1,282 @@
+import os
+import sqlite3
+import tempfile
+import threading
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+import ijson
+import orjson
+
+_STORE_SUFFIX = ".sqlite"
+_SCHEMA_VERSION = "1"
+_MAP_SECTION = object()
+_ITER_BATCH_SIZE = 1000
+
+
+def _get_artifact_stamp(artifact_path: str) -> str:
+    stat = os.stat(artifact_path)
+    return f"{_SCHEMA_VERSION}:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def _iter_artifact_items(f) -> Iterator[tuple[str, str | None, Any]]:
+    """
+    Streams `(section, key, value)` for every entry of every top-level object in a dbt artifact, without loading the whole file. Each section is announced with a key of None, whose value is `_MAP_SECTION` for objects and the full value otherwise.
+    """
+    events = ijson.parse(f, use_float=True)
+
+    def build(event, value):
+        if event not in ("start_map", "start_array"):
+            return value
+        builder = ijson.ObjectBuilder()
+        builder.event(event, value)
+        depth = 1
+        for _, event, value in events:
+            builder.event(event, value)
+            if event in ("start_map", "start_array"):
+                depth += 1
+            elif event in ("end_map", "end_array"):
+                depth -= 1
+                if depth == 0:
+                    break
+        return builder.value
+
+    section = None
+    for prefix, event, value in events:
+        if prefix == "" and event == "map_key":
+            section = value
+            _, event, value = next(events)
+            if event == "start_map":
+                yield section, None, _MAP_SECTION
+            else:
+                yield section, None, build(event, value)
+                section = None
+        elif section is not None and prefix == section and event == "map_key":
+            key = value
+            _, event, value = next(events)
+            yield section, key, build(event, value)
+
+
+def build_artifact_store(artifact_path: str, store_path: str):
+    # built in a temp file and swapped in so readers never see a partial store
+    directory = os.path.dirname(store_path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=_STORE_SUFFIX)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(temp_path)
+        conn.executescript(
+            """
+            create table sections (section text primary key, is_map integer, data blob);
+            create table items (section text, key text, path text, data blob, primary key (section, key));
+            create table meta (key text primary key, value text);
+            """
+        )
+
+        sections = []
+
+        def get_rows(f):
+            for section, key, value in _iter_artifact_items(f):
+                if key is None:
+                    is_map = value is _MAP_SECTION
+                    data = None if is_map else orjson.dumps(value)
+                    sections.append((section, is_map, data))
+                    continue
+                path = (
+                    value.get("original_file_path") if isinstance(value, dict) else None
+                )
+                yield section, key, path, orjson.dumps(value)
+
+        with open(artifact_path, "rb") as f:
+            conn.executemany("insert into items values (?, ?, ?, ?)", get_rows(f))
+        conn.executemany("insert into sections values (?, ?, ?)", sections)
+        conn.execute("create index items_path on items (path)")
+        conn.execute(
+            "insert into meta values ('stamp', ?)",
+            (_get_artifact_stamp(artifact_path),),
+        )
+        conn.commit()
+        conn.close()
+        os.replace(temp_path, store_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class ArtifactStore:
+    """
+    Read-only sqlite index over a dbt artifact such as `manifest.json` or `catalog.json`. Every entry of each top-level section is stored as its own orjson blob, so a lookup only deserializes the node it touches.
+    """
+
+    def __init__(self, store_path: str):
+        self.store_path = store_path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, artifact_path: str) -> "ArtifactStore":
+        """
+        Opens the store next to `artifact_path`, rebuilding it first if the artifact has changed since it was converted.
+        """
+        store_path = artifact_path + _STORE_SUFFIX
+        stamp = _get_artifact_stamp(artifact_path)
+        if cls._get_stamp(store_path) != stamp:
+            build_artifact_store(artifact_path, store_path)
+        return cls(store_path)
+
+    @staticmethod
+    def _get_stamp(store_path: str) -> str | None:
+        if not os.path.exists(store_path):
+            return None
+        try:
+            with sqlite3.connect(f"file:{store_path}?mode=ro", uri=True) as conn:
+                row = conn.execute(
+                    "select value from meta where key = 'stamp'"
+                ).fetchone()
+        except sqlite3.DatabaseError:
+            return None
+        return row[0] if row else None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        # opened on first use, so a closed store that is still referenced reopens instead of failing
+        if self._conn is None:
+            self._conn = sqlite3.connect(
+                f"file:{self.store_path}?mode=ro", uri=True, check_same_thread=False
+            )
+        return self._conn
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._get_conn().execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def sections(self) -> dict[str, bool]:
+        # maps each section to whether it is an object whose entries are stored individually
+        return {
+            r[0]: bool(r[1])
+            for r in self._query("select section, is_map from sections")
+        }
+
+    def get_section_value(self, section: str) -> Any:
+        rows = self._query("select data from sections where section = ?", (section,))
+        if not rows:
+            raise KeyError(section)
+        return orjson.loads(rows[0][0])
+
+    def get(self, section: str, key: str) -> Any:
+        rows = self._query(
+            "select data from items where section = ? and key = ?", (section, key)
+        )
+        if not rows:
+            raise KeyError(key)
+        return orjson.loads(rows[0][0])
+
+    def contains(self, section: str, key: str) -> bool:
+        return bool(
+            self._query(
+                "select 1 from items where section = ? and key = ?", (section, key)
+            )
+        )
+
+    def keys(self, section: str) -> list[str]:
+        return [
+            r[0]
+            for r in self._query(
+                "select key from items where section = ? order by rowid", (section,)
+            )
+        ]
+
+    def count(self, section: str) -> int:
+        return self._query("select count(*) from items where section = ?", (section,))[
+            0
+        ][0]
+
+    def iter_items(self, section: str) -> Iterator[tuple[str, Any]]:
+        # a single cursor is streamed in batches, and the lock is released between them so lookups can interleave
+        with self._lock:
+            cursor = self._get_conn().execute(
+                "select key, data from items where section = ? order by rowid",
+                (section,),
+            )
+        try:
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(_ITER_BATCH_SIZE)
+                if not rows:
+                    break
+                for key, data in rows:
+                    yield key, orjson.loads(data)
+        finally:
+            with self._lock:
+                cursor.close()
+
+    def find_by_path(self, section: str, path: str) -> list[str]:
+        return [
+            r[0]
+            for r in self._query(
+                "select key from items where section = ? and path = ? order by rowid",
+                (section, path),
+            )
+        ]
+
+
+class LazySection(Mapping):
+    def __init__(self, store: ArtifactStore, section: str):
+        self.store = store
+        self.section = section
+        # only entries that were actually touched are kept in memory
+        self._items: dict[str, Any] = {}
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._items:
+            self._items[key] = self.store.get(self.section, key)
+        return self._items[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._items or (
+            isinstance(key, str) and self.store.contains(self.section, key)
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.store.keys(self.section))
+
+    def __len__(self) -> int:
+        return self.store.count(self.section)
+
+    def items(self):
+        # full scans stream from the store rather than filling the cache
+        return self.store.iter_items(self.section)
+
+    def values(self):
+        return (v for _, v in self.store.iter_items(self.section))
+
+
+class LazyArtifact(Mapping):
+    """
+    Dict-like view over an `ArtifactStore`, so code written against the loaded json (e.g. `manifest["nodes"][node_id]`) works unchanged while reading one node at a time.
+    """
+
+    def __init__(self, store: ArtifactStore):
+        self.store = store
+        self._sections = {}
+        self._section_names = self.store.sections()
+
+    def __getitem__(self, section: str) -> Any:
+        if section not in self._section_names:
+            raise KeyError(section)
+        if section not in self._sections:
+            if self._section_names[section]:
+                self._sections[section] = LazySection(self.store, section)
+            else:
+                self._sections[section] = self.store.get_section_value(section)
+        return self._sections[section]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._section_names)
+
+    def __len__(self) -> int:
+        return len(self._section_names)
@@ -1,10 +1,16 @@
+import logging
 import os
+import pickle
+from functools import lru_cache
+from typing import Any
 
 import dill
 import diskcache as dc
 import msgpack
 import orjson
 
+logger = logging.getLogger(__name__)
+
 
 class DillDisk(dc.Disk):
     def __init__(self, directory, **kwargs):
@@ -98,3 +104,49 @@ def memoize(tag=None, ignore=()):
             return func
 
     return decorator
+
+
+SQLAST_CACHE_DIRECTORY = os.getenv("SQLAST_CACHE_DIRECTORY", ".cache/sqlast")
+SQLAST_CACHE_SIZE_LIMIT = int(os.getenv("SQLAST_CACHE_SIZE_LIMIT", 2**30))  # 1GB
+
+
+class SQLAstCache:
+    """Content-addressed cache for optimized sql asts and their lineage. Least recently used entries are evicted once `size_limit` bytes is reached."""
+
+    def __init__(self, directory: str, size_limit: int):
+        self.cache = dc.Cache(
+            directory=directory,
+            disk=DillDisk,
+            size_limit=size_limit,
+            eviction_policy="least-recently-used",
+        )
+        self.cache.stats(enable=True)
+
+    def get(self, key: str) -> Any | None:
+        try:
+            return self.cache.get(key)
+        except Exception:
+            # corrupt or incompatible entries are treated as misses
+            return None
+
+    def set(self, key: str, value: Any):
+        try:
+            self.cache.set(key, value)
+        except (RecursionError, pickle.PicklingError) as e:
+            # some asts are too deeply nested to serialize, skip caching them
+            logger.warning(f"Skipping sqlast cache entry {key}: {e!r}")
+
+    def stats(self) -> dict[str, int]:
+        hits, misses = self.cache.stats()
+        return {"hits": hits, "misses": misses}
+
+    def clear(self):
+        self.cache.clear()
+        self.cache.stats(reset=True)
+
+
+@lru_cache(maxsize=None)
+def get_sqlast_cache() -> SQLAstCache | None:
+    if os.getenv("SQLAST_CACHE", "true") != "true":
+        return None
+    return SQLAstCache(SQLAST_CACHE_DIRECTORY, SQLAST_CACHE_SIZE_LIMIT)
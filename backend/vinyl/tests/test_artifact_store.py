@@ -0,0 +1,71 @@
+import orjson
+from vinyl.lib.dbt import ManifestCache
+from vinyl.lib.utils.artifact_store import ArtifactStore, LazyArtifact, LazySection
+
+TEST_MANIFEST = {
+    "metadata": {"dbt_version": "1.8.0", "env": {}},
+    "nodes": {
+        "model.proj.orders": {
+            "original_file_path": "models/orders.sql",
+            "depends_on": {"nodes": ["source.proj.raw.orders"]},
+        },
+        "model.proj.customers": {
+            "original_file_path": "models/customers.sql",
+            "columns": {"id": {"description": None, "tests": [1, 2.5]}},
+        },
+    },
+    "sources": {"source.proj.raw.orders": {"original_file_path": "models/src.yml"}},
+    "semantic_models": {},
+    "errors": None,
+}
+
+
+def _to_dict(value):
+    if isinstance(value, LazySection):
+        return {k: _to_dict(v) for k, v in value.items()}
+    return value
+
+
+def test_lazy_artifact_matches_json(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_bytes(orjson.dumps(TEST_MANIFEST))
+
+    manifest = LazyArtifact(ArtifactStore.open(str(path)))
+    assert {k: _to_dict(manifest[k]) for k in manifest} == TEST_MANIFEST
+    assert "model.proj.orders" in manifest["nodes"]
+    assert manifest["nodes"].get("model.proj.missing") is None
+    assert len(manifest["semantic_models"]) == 0
+    assert manifest.store.find_by_path("nodes", "models/customers.sql") == [
+        "model.proj.customers"
+    ]
+
+
+def test_artifact_store_rebuilds_on_change(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_bytes(orjson.dumps(TEST_MANIFEST))
+    manifest = LazyArtifact(ArtifactStore.open(str(path)))
+    assert manifest["metadata"]["dbt_version"] == "1.8.0"
+
+    path.write_bytes(
+        orjson.dumps({**TEST_MANIFEST, "metadata": {"dbt_version": "1.9.0"}})
+    )
+    manifest = LazyArtifact(ArtifactStore.open(str(path)))
+    assert manifest["metadata"]["dbt_version"] == "1.9.0"
+
+
+def test_artifact_store_closed_on_manifest_cache_eviction(tmp_path):
+    path = tmp_path / "manifest.json"
+    path.write_bytes(orjson.dumps(TEST_MANIFEST))
+    manifest = LazyArtifact(ArtifactStore.open(str(path)))
+    assert list(manifest["nodes"].items()) == list(TEST_MANIFEST["nodes"].items())
+
+    cache = ManifestCache(max_size=1)
+    cache.set(("a",), manifest)
+    cache.set(("b",), {})
+    assert manifest.store._conn is None
+
+    # a manifest still referenced after eviction reopens its store
+    assert (
+        manifest["nodes"]["model.proj.orders"]
+        == (TEST_MANIFEST["nodes"]["model.proj.orders"])
+    )
@@ -1,4 +1,43 @@
+import copy
+
+import ibis
+import sqlglot
+from sqlglot import exp
+
+import vinyl.lib.sqlast as sqlast
 from vinyl.lib.project import Project
+from vinyl.lib.schema import VinylSchema
+from vinyl.lib.sqlast import SQLAstNode
+from vinyl.lib.utils.cache import SQLAstCache
+
+TEST_SQL = """
+select
+    o.customer_id,
+    sum(o.amount) as total
+from db.analytics.orders as o
+where o.status = 'complete'
+group by o.customer_id
+"""
+
+
+def make_test_sqlast_node() -> SQLAstNode:
+    return SQLAstNode(
+        id="db.analytics.customer_totals",
+        ast=sqlglot.parse_one(TEST_SQL, dialect="postgres"),
+        schema={
+            exp.to_table("db.analytics.customer_totals"): VinylSchema(
+                ibis.schema([("customer_id", str), ("total", str)])
+            )
+        },
+        deps=["db.analytics.orders"],
+        deps_schemas={
+            exp.to_table("db.analytics.orders"): VinylSchema(
+                ibis.schema([("customer_id", str), ("amount", str), ("status", str)])
+            )
+        },
+        errors=[],
+        dialect="postgres",
+    )
 
 
 def test_local_lineage():
@@ -13,3 +52,44 @@ def test_local_lineage():
     assert stitched != {}
     assert stitched["table_lineage"]["links"] != []
     assert stitched["column_lineage"]["links"] != []
+
+
+def test_sqlast_cache(tmp_path, monkeypatch):
+    cache = SQLAstCache(str(tmp_path), size_limit=2**20)
+    monkeypatch.setattr(sqlast, "get_sqlast_cache", lambda: cache)
+
+    uncached = make_test_sqlast_node().optimize()
+    uncached_edges = sorted(uncached.get_lineage().get_edge_tuples())
+    assert cache.stats() == {"hits": 0, "misses": 2}
+
+    cached = make_test_sqlast_node().optimize()
+    cached_edges = sorted(cached.get_lineage().get_edge_tuples())
+    assert cache.stats() == {"hits": 2, "misses": 2}
+    assert cached_edges == uncached_edges != []
+
+
+def get_edges_with_ntypes(lineage) -> list[tuple[str, str, list[str]]]:
+    return sorted(
+        (u, v, sorted(data["ntype"]))
+        for u, v, data in lineage.to_networkx().edges(data=True)
+    )
+
+
+def test_single_pass_lineages_match_per_filter_lineage(monkeypatch):
+    monkeypatch.setattr(sqlast, "get_sqlast_cache", lambda: None)
+    lineage_filters_list = [[], ["as_is", "transform"]]
+
+    node = make_test_sqlast_node().optimize()
+    expected = []
+    for lineage_filters in lineage_filters_list:
+        node_it = copy.deepcopy(node)
+        node_it.get_lineage(lineage_filters=lineage_filters)
+        expected.append(get_edges_with_ntypes(node_it.lineage))
+
+    single_pass = node.get_lineages(lineage_filters_list)
+    assert [get_edges_with_ntypes(n.lineage) for n in single_pass] == expected
+
+    # filter columns only show up when all connection types are included
+    all_edges, direct_edges = expected
+    assert any(u.endswith(".status") for u, _, _ in all_edges)
+    assert not any(u.endswith(".status") for u, _, _ in direct_edges)
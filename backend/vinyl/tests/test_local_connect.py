@@ -1,3 +1,7 @@
+import os
+from unittest.mock import patch
+
+import ibis
 import pytest
 from vinyl.lib.connect import DatabaseFileConnector, FileConnector
 
@@ -19,6 +23,68 @@ def test_connect_with_duckdb_file():
     )
 
 
+def test_bulk_sources_match_per_table_sources():
+    connector = DatabaseFileConnector(
+        path="../vinyl/tests/fixtures/test.duckdb", tables=["*.*.*"]
+    )
+    bulk_sources, bulk_errors = connector._list_sources(with_schema=True)
+    with patch.object(DatabaseFileConnector, "_bulk_columns_query", return_value=None):
+        table_sources, _ = connector._list_sources(with_schema=True)
+
+    assert not bulk_errors
+    assert "taxi_sample" in [s._name for s in bulk_sources]
+    assert {(s._location, s._name): s._schema for s in bulk_sources} == {
+        (s._location, s._name): s._schema for s in table_sources
+    }
+
+
+def test_generate_twins_resumes(tmp_path):
+    connector = DatabaseFileConnector(
+        path="../vinyl/tests/fixtures/test.duckdb", tables=["*.*.*"]
+    )
+    connector._connect()
+    twin_path = os.path.join(tmp_path, "twin.duckdb")
+    tables = [(connector._database, "main", "taxi_sample")]
+
+    assert connector._generate_twins(twin_path, tables, sample_row_count=100) == []
+    twin_count = (
+        ibis.duckdb.connect(twin_path)
+        .table("taxi_sample", database="main")
+        .count()
+        .execute()
+    )
+    # row sampling keeps each row with probability 100 / 100000, so the size is only close to 100
+    assert 50 <= twin_count <= 150
+
+    # finished tables are skipped on the next run
+    with patch.object(DatabaseFileConnector, "_sample_for_twin") as sample_for_twin:
+        assert connector._generate_twins(twin_path, tables, sample_row_count=100) == []
+        sample_for_twin.assert_not_called()
+
+
+def test_generate_twins_concurrently(tmp_path):
+    source_path = os.path.join(tmp_path, "source.duckdb")
+    source = ibis.duckdb.connect(source_path)
+    for i in range(8):
+        source.raw_sql(f"CREATE TABLE t{i} AS SELECT range AS id FROM range({i * 100})")
+    source.disconnect()
+
+    connector = DatabaseFileConnector(path=source_path, tables=["*.*.*"])
+    connector._connect()
+    twin_path = os.path.join(tmp_path, "twin.duckdb")
+    tables = [(connector._database, "main", f"t{i}") for i in range(8)]
+
+    assert (
+        connector._generate_twins(
+            twin_path, tables, sample_row_count=None, max_workers=4
+        )
+        == []
+    )
+    twin = ibis.duckdb.connect(twin_path)
+    for i in range(8):
+        assert twin.table(f"t{i}", database="main").count().execute() == i * 100
+
+
 def test_connect_with_filepath():
     conn = FileConnector(path="../vinyl/tests/fixtures/data/iris.parquet")._connect()
 
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import duckdb
+import psycopg
+import pytest
+from vinyl.infra.pg_proxy.backends.duckdb import DuckDBConnection
+from vinyl.infra.pg_proxy.postgres import AsyncProxyServer
+from vinyl.infra.pg_proxy.server import rewriter
+
+
+@pytest.fixture
+def proxy():
+    db = duckdb.connect()
+    server = AsyncProxyServer(
+        ("127.0.0.1", 0),
+        DuckDBConnection(db, pool_size=2),
+        rewriter=rewriter,
+        max_pending_writes=2,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join(timeout=5)
+    db.close()
+
+
+def connect(server: AsyncProxyServer) -> psycopg.Connection:
+    host, port = server.server_address
+    return psycopg.connect(
+        host=host,
+        port=port,
+        user="test",
+        dbname="test",
+        sslmode="disable",
+        autocommit=True,
+    )
+
+
+def test_simple_query(proxy):
+    # queries without parameters use the simple query protocol
+    with connect(proxy) as conn:
+        assert conn.execute("SELECT 1 AS one").fetchall() == [(1,)]
+
+
+def test_extended_query(proxy):
+    # parameters are sent with Parse, Bind, Describe, Execute and Sync
+    with connect(proxy) as conn:
+        assert conn.execute("SELECT %s::INTEGER + 1", [41]).fetchone() == (42,)
+        for i in range(3):
+            row = conn.execute("SELECT %s::INTEGER", [i], prepare=True).fetchone()
+            assert row == (i,)
+
+
+def test_large_result(proxy):
+    # far more data rows than the writer keeps pending at once
+    with connect(proxy) as conn:
+        rows = conn.execute("SELECT range AS i FROM range(200000)").fetchall()
+    assert len(rows) == 200000
+    assert rows[-1] == (199999,)
+
+
+def test_concurrent_clients(proxy):
+    results = {}
+
+    def run(i):
+        with connect(proxy) as conn:
+            results[i] = conn.execute(f"SELECT {i} AS i").fetchone()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert results == {i: (i,) for i in range(8)}
+
+
+def test_cancel_request(proxy):
+    with connect(proxy) as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+        conn.cancel()
+        # the cancel arrives on its own connection and closes this client's session
+        with pytest.raises(psycopg.Error):
+            for _ in range(50):
+                conn.execute("SELECT 1")
+                time.sleep(0.1)
+    assert not proxy.ctxts